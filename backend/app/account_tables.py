@@ -0,0 +1,189 @@
+"""
+Account Tables - קריאת טבלאות "חשבון חופשה" / "חשבון מחלה" לפי מיקום המילים ב-PDF
+"""
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+# כותרת הטבלה -> המפתח בפורמט המערכת
+SECTIONS = {
+    "חשבון חופשה": "vacation_account",
+    "חשבון מחלה": "sick_account",
+}
+
+# שורות הטבלה -> המפתח בפורמט המערכת
+ROWS = {
+    "יתרה קודמת": "previous_balance",
+    "יתרה חדשה": "current_balance",
+    "צבירה": "accrued",
+    "ניצול": "used",
+}
+
+# שורות הטבלה -> שם השדה הגולמי ב-parser
+RAW_FIELDS = {
+    "vacation_account": {
+        "previous_balance": "previous_vacation_balance",
+        "accrued": "vacation_accrued",
+        "used": "vacation_used",
+        "current_balance": "vacation_days",
+    },
+    "sick_account": {
+        "previous_balance": "previous_sick_balance",
+        "accrued": "sick_accrued",
+        "used": "sick_used",
+        "current_balance": "sick_days",
+    },
+}
+
+LINE_TOLERANCE = 3  # הפרש top (בנקודות) שעדיין נחשב אותה שורה
+COLUMN_MARGIN = 150  # כמה רחוק מהכותרת (אופקית) עוד שייך לאותה טבלה (עד חצי הדרך לכותרת השכנה)
+MAX_ROWS = 8  # כמה שורות מתחת לכותרת נבדקות
+
+_NUMBER = re.compile(r'^[\d,]*\.?\d+$')
+_HEBREW = re.compile(r'[\u0590-\u05FF]')
+
+
+def _group_lines(words: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    קבץ מילים לשורות לפי הגובה שלהן בעמוד
+    """
+    lines = []
+    for word in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if lines and abs(word['top'] - lines[-1][0]['top']) <= LINE_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return lines
+
+
+def _joins(words: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """
+    הטקסט של מילים ממוינות לפי x0 - בסדר לוגי, ובסדר ויזואלי (עברית שחולצה הפוכה)
+    """
+    logical = " ".join(w['text'] for w in words)
+    visual = " ".join(
+        w['text'][::-1] if _HEBREW.search(w['text']) else w['text']
+        for w in reversed(words)
+    )
+    return logical, visual
+
+
+def _match_labels(words: List[Dict[str, Any]], labels: Dict[str, str]) -> List[Tuple[str, float, float]]:
+    """
+    כל התוויות מתוך labels שמופיעות בשורה (למשל שתי כותרות טבלה זו לצד זו), משמאל לימין
+
+    Returns:
+        [(label, x0, x1), ...] - הטווח האופקי של המילים של כל תווית
+    """
+    ordered = sorted(words, key=lambda w: w['x0'])
+    max_words = max(len(label.split()) for label in labels)
+
+    found = []
+    i = 0
+    while i < len(ordered):
+        for size in range(min(max_words, len(ordered) - i), 0, -1):
+            window = ordered[i:i + size]
+            label = next((label for label in labels if any(label in text for text in _joins(window))), None)
+            if label:
+                found.append((label, window[0]['x0'], max(w['x1'] for w in window)))
+                i += size
+                break
+        else:
+            i += 1
+    return found
+
+
+def _match_label(words: List[Dict[str, Any]], labels: Dict[str, str]) -> Optional[str]:
+    """
+    מצא תווית מתוך labels בשורה - גם אם העברית חולצה הפוכה (סדר ויזואלי)
+    """
+    logical, visual = _joins(sorted(words, key=lambda w: w['x0']))
+    for label in labels:
+        if label in logical or label in visual:
+            return label
+    return None
+
+
+def _row_value(words: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    הערך המספרי של שורה - המספר הקרוב ביותר (אופקית) לתווית העברית
+    """
+    label_words = [w for w in words if _HEBREW.search(w['text'])]
+    numbers = [w for w in words if _NUMBER.match(w['text'])]
+    if not label_words or not numbers:
+        return None
+
+    label_x0 = min(w['x0'] for w in label_words)
+    label_x1 = max(w['x1'] for w in label_words)
+
+    def distance(w):
+        return min(abs(w['x1'] - label_x0), abs(w['x0'] - label_x1))
+
+    return min(numbers, key=distance)['text']
+
+
+def _read_rows(lines: List[List[Dict[str, Any]]], x0: float, x1: float) -> Dict[str, str]:
+    """
+    שורות הטבלה שמתחת לכותרת, רק מהמילים שהמרכז שלהן בעמודה [x0, x1]
+    """
+    rows = {}
+    for row_line in lines:
+        band = [w for w in row_line if x0 <= (w['x0'] + w['x1']) / 2 <= x1]
+        if not band:
+            continue
+        if _match_labels(band, SECTIONS):
+            break  # הטבלה הבאה
+
+        label = _match_label(band, ROWS)
+        if not label or ROWS[label] in rows:
+            continue
+
+        value = _row_value(band)
+        if value is not None:
+            rows[ROWS[label]] = value
+
+    return rows
+
+
+def extract_account_tables(words: List[Dict[str, Any]]) -> Dict[str, Dict[str, str]]:
+    """
+    קרא את טבלאות חשבון חופשה/מחלה מרשימת מילים של עמוד (page.extract_words()).
+
+    Returns:
+        {"vacation_account": {"previous_balance": "45.20", ...}, "sick_account": {...}}
+        הערכים נשמרים כטקסט, בדיוק כפי שהופיעו ב-PDF
+    """
+    lines = _group_lines(words)
+    tables = {}
+
+    for i, line in enumerate(lines):
+        headers = _match_labels(line, SECTIONS)
+
+        for k, (section, header_x0, header_x1) in enumerate(headers):
+            # העמודה של הטבלה - עד חצי הדרך לכותרת השכנה באותה שורה (טבלאות זו לצד זו)
+            x0 = header_x0 - COLUMN_MARGIN
+            x1 = header_x1 + COLUMN_MARGIN
+            if k > 0:
+                x0 = max(x0, (headers[k - 1][2] + header_x0) / 2)
+            if k + 1 < len(headers):
+                x1 = min(x1, (header_x1 + headers[k + 1][1]) / 2)
+
+            rows = _read_rows(lines[i + 1:i + 1 + MAX_ROWS], x0, x1)
+            if rows:
+                tables.setdefault(SECTIONS[section], rows)
+
+    return tables
+
+
+def apply_account_tables(result: Dict[str, Any], tables: Dict[str, Dict[str, str]]) -> List[str]:
+    """
+    העתק ערכים מהטבלאות לשדות הגולמיים של ה-parser (דורס את ה-regex).
+    מחזיר את השדות שנכתבו.
+    """
+    applied = []
+    for section, rows in tables.items():
+        fields = RAW_FIELDS.get(section, {})
+        for row, value in rows.items():
+            if row in fields:
+                result[fields[row]] = value
+                applied.append(fields[row])
+    return applied
@@ -0,0 +1,164 @@
+"""
+Sick Days Extractor - חילוץ ימי מחלה עם AI, בקבוצות ועם מטמון
+"""
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import List, Optional
+
+# כמה תלושים נשלחים בבקשה אחת ל-Claude
+BATCH_SIZE = 25
+
+# גודל קטע הטקסט מכל תלוש
+SNIPPET_LENGTH = 600
+FALLBACK_SNIPPET_LENGTH = 2000
+
+CACHE_MAX_ENTRIES = 10000
+
+_NULL_ANSWERS = {'null', 'none', 'לא נמצא'}
+
+
+class SickDaysExtractor:
+    """
+    מחלץ "יתרה חדשה" מסעיף "חשבון מחלה" עם Claude.
+
+    - client אחד לכל התהליך (לא נוצר מחדש לכל תלוש)
+    - כמה תלושים בבקשה אחת (BATCH_SIZE)
+    - תשובות נשמרות במטמון לפי hash של קטע הטקסט
+    - failures סופר תלושים שלא קיבלו תשובה (אין API key / שגיאה) - תוצאה שתלויה בהם לא סופית
+    """
+
+    def __init__(self, model: str = "claude-3-5-haiku-20241022"):
+        self.model = model  # Haiku 3.5 - fast and cheap for parsing
+        self._client = None
+        self._cache: "OrderedDict[str, Optional[float]]" = OrderedDict()
+        self.failures = 0
+
+    def _get_client(self):
+        """
+        צור client פעם אחת - או None אם אין API key
+        """
+        if self._client is None:
+            api_key = os.getenv("ANTHROPIC_API_KEY")
+            if not api_key:
+                print("[AI-Parser] No ANTHROPIC_API_KEY found, skipping AI extraction")
+                return None
+
+            from anthropic import Anthropic
+            self._client = Anthropic(api_key=api_key)
+        return self._client
+
+    @staticmethod
+    def snippet(text: str) -> str:
+        """
+        הקטע הרלוונטי מהתלוש - סעיף "חשבון מחלה" אם קיים, אחרת תחילת התלוש
+        """
+        idx = text.find("חשבון מחלה")
+        if idx == -1:
+            return text[:FALLBACK_SNIPPET_LENGTH]
+        return text[idx:idx + SNIPPET_LENGTH]
+
+    @staticmethod
+    def _key(snippet: str) -> str:
+        return hashlib.sha256(snippet.encode('utf-8')).hexdigest()
+
+    def extract(self, texts: List[str]) -> List[Optional[float]]:
+        """
+        חלץ ימי מחלה לרשימת תלושים - מחזיר רשימה באותו סדר (None אם לא נמצא)
+        """
+        snippets = [self.snippet(text) for text in texts]
+        keys = [self._key(snippet) for snippet in snippets]
+
+        # קטעים שלא במטמון (בלי כפילויות)
+        missing = {}
+        for key, snippet in zip(keys, snippets):
+            if key not in self._cache and key not in missing:
+                missing[key] = snippet
+
+        if missing:
+            client = self._get_client()
+            if client is None:
+                self.failures += len(missing)
+                return [self._cache.get(key) for key in keys]
+
+            missing_keys = list(missing)
+            for start in range(0, len(missing_keys), BATCH_SIZE):
+                batch_keys = missing_keys[start:start + BATCH_SIZE]
+                answers = self._ask(client, [missing[key] for key in batch_keys])
+                if answers is None:
+                    self.failures += len(batch_keys)
+                    continue  # שגיאה - לא שומרים במטמון, ננסה שוב בפעם הבאה
+                for key, answer in zip(batch_keys, answers):
+                    self._remember(key, answer)
+
+        return [self._cache.get(key) for key in keys]
+
+    def _remember(self, key: str, value: Optional[float]) -> None:
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+
+    def _ask(self, client, snippets: List[str]) -> Optional[List[Optional[float]]]:
+        """
+        בקשה אחת ל-Claude עבור כמה קטעי תלושים
+        """
+        payslips_block = "\n\n".join(
+            f"=== תלוש {i} ===\n{snippet}" for i, snippet in enumerate(snippets, 1)
+        )
+
+        # בנה prompt לסוכן
+        prompt = f"""אתה parser חכם לתלושי שכר בעברית.
+
+לפניך {len(snippets)} קטעים מתלושי שכר. בכל תלוש מצא את הערך של "יתרה חדשה" בסעיף "חשבון מחלה".
+
+חפש בסעיף "חשבון מחלה" את השדות הבאים:
+1. יתרה קודמת
+2. צבירה (ח.ז.צ)
+3. יתרה חדשה
+
+המספר הכי רלוונטי הוא "יתרה חדשה".
+
+{payslips_block}
+
+תשובה: החזר **רק** מערך JSON עם {len(snippets)} ערכים, לפי סדר התלושים - מספר ימי המחלה (יתרה חדשה) או null אם לא מצאת.
+
+דוגמה ל-3 תלושים: [75.52, null, 12.5]"""
+
+        try:
+            response = client.messages.create(
+                model=self.model,
+                max_tokens=20 + 12 * len(snippets),
+                temperature=0,
+                messages=[{
+                    "role": "user",
+                    "content": prompt
+                }]
+            )
+
+            answer = response.content[0].text.strip()
+            print(f"[AI-Parser] Claude response for {len(snippets)} sick_days: {answer}")
+
+            json_match = re.search(r'\[.*\]', answer, re.DOTALL)
+            values = json.loads(json_match.group()) if json_match else []
+            if len(values) != len(snippets):
+                print(f"[AI-Parser] Expected {len(snippets)} values, got {len(values)}")
+                return None
+
+            return [self._to_float(value) for value in values]
+
+        except Exception as e:
+            print(f"[AI-Parser] Error extracting sick_days with AI: {e}")
+            return None
+
+    @staticmethod
+    def _to_float(value) -> Optional[float]:
+        if value is None or str(value).strip().lower() in _NULL_ANSWERS:
+            return None
+        try:
+            return float(str(value).replace(',', ''))
+        except ValueError:
+            print(f"[AI-Parser] Could not convert '{value}' to float")
+            return None
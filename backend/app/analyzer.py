@@ -1,101 +1,48 @@
 """
 Analyzer - מבצע ניתוחים וסכימות על נתונים שParser חילץ
 """
-import re
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterable, Optional, List
 
+from app.line_items import hours_by_rate, parse_line_items
 
-def analyze_hours(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+
+def analyze_hours(parsed_data: Dict[str, Any], original_text: Optional[str] = None) -> Dict[str, Any]:
     """
-    Analyzer - מסכם את כל שעות 150% ו-125% מהטקסט המקורי
+    Analyzer - מסכם את השעות לפי תעריף (100/125/150/175/200% ושבת) משורות טבלת התשלומים
     Parser חילץ שדות, Analyzer מנתח ומסכם
-    """
-    # קבל את הטקסט המקורי שParser שמר
-    raw_data = parsed_data.get('raw_data', {})
-    original_text = raw_data.get('_original_text', '')
 
-    # סכום כל שעות 150%
-    hours_150 = sum_hours_150(original_text)
+    Args:
+        parsed_data: הנתונים המנותחים
+        original_text: הטקסט המקורי (למשל Payslip.original_text) -
+            אם לא הועבר, משתמשים ב-line_items שה-Parser שמר (או ב-_original_text)
+    """
+    line_items = parsed_data.get('line_items')
+    if original_text is not None or line_items is None:
+        # קבל את הטקסט המקורי שParser שמר
+        if original_text is None:
+            raw_data = parsed_data.get('raw_data', {})
+            original_text = raw_data.get('_original_text', '')
+        line_items = parse_line_items(original_text)
 
-    # סכום כל שעות 125%
-    hours_125 = sum_hours_125(original_text)
+    hours = hours_by_rate(line_items)
 
     # עדכן את hours_breakdown עם הסכימות
     if 'hours_breakdown' not in parsed_data:
         parsed_data['hours_breakdown'] = {}
+    parsed_data['hours_breakdown'].update(hours)
 
-    parsed_data['hours_breakdown']['hours_150'] = hours_150
-    parsed_data['hours_breakdown']['hours_125'] = hours_125
-
-    print(f"[Analyzer] Summed 150% hours: {hours_150}")
-    print(f"[Analyzer] Summed 125% hours: {hours_125}")
+    found = {key: value for key, value in hours.items() if value is not None}
+    print(f"[Analyzer] Summed hours by rate: {found}")
 
     return parsed_data
 
 
-def sum_hours_150(text: str) -> Optional[float]:
+def analyze_hours_batch(texts: Iterable[str]) -> List[Dict[str, Optional[float]]]:
     """
-    סכום כל שעות 150% מכל השורות מהטקסט המקורי
-    תומך בטקסט RTL שבו 150 יכול להופיע כ-051 (הפוך)
+    שעות לפי תעריף לרשימת טקסטים מקוריים (למשל כל התלושים השמורים) - בלי הדפסות.
+    מחזיר רשימה באותו סדר.
     """
-
-    # חפש את כל השורות עם "ש" (שעות) ו-"150" או "051" (RTL הפוך)
-    # דוגמאות:
-    #   "078 ש %150שבת 30.47 52.50"
-    #   "078 ש %051שבת 30.47 52.50" (RTL - 150 הפוך)
-    #   "079 ש 150% כפולה 0.18 52.50"
-    # Pattern: קוד + "ש" + (רווח אפציונלי) + משהו עם 150/051 + שעות + תעריף
-    patterns = [
-        r'(\d{3})\s+ש\s*.*?(150|051).*?\s+([\d.]+)\s+[\d.]+',  # תומך ב-150 או 051 (RTL)
-    ]
-
-    total = 0.0
-    found = False
-
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            try:
-                hours = float(match[2])  # השעות הן בקבוצה השלישית עכשיו
-                total += hours
-                found = True
-                print(f"[Analyzer] Found 150% hours: {hours} (pattern: {match[1]})")
-            except (ValueError, IndexError):
-                continue
-
-    return total if found else None
-
-
-def sum_hours_125(text: str) -> Optional[float]:
-    """
-    סכום כל שעות 125% מכל השורות מהטקסט המקורי
-    תומך בטקסט RTL שבו 125 יכול להופיע כ-521 (הפוך)
-    """
-
-    # חפש את כל השורות עם "ש" (שעות) ו-"125" או "521" (RTL הפוך)
-    # דוגמאות:
-    #   "077 ש 125% דיווח 3.83 43.75"
-    #   "077 ש 521% דיווח 3.83 43.75" (RTL - 125 הפוך)
-    # Pattern: קוד + "ש" + (רווח אפציונלי) + משהו עם 125/521 + שעות + תעריף
-    patterns = [
-        r'(\d{3})\s+ש\s*.*?(125|521).*?\s+([\d.]+)\s+[\d.]+',  # תומך ב-125 או 521 (RTL)
-    ]
-
-    total = 0.0
-    found = False
-
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            try:
-                hours = float(match[2])  # השעות הן בקבוצה השלישית עכשיו
-                total += hours
-                found = True
-                print(f"[Analyzer] Found 125% hours: {hours} (pattern: {match[1]})")
-            except (ValueError, IndexError):
-                continue
-
-    return total if found else None
+    return [hours_by_rate(parse_line_items(text or '')) for text in texts]
 
 
 def build_analytics_index(payslips: List[Any]) -> Dict[str, Any]:
@@ -1,11 +1,14 @@
 """
 Database configuration and models
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON, Text, Boolean
+from sqlalchemy import create_engine, insert, Column, Integer, String, Float, DateTime, JSON, Text, Boolean, LargeBinary, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import sessionmaker, relationship, deferred
 from datetime import datetime
+from typing import Dict, Any, List, Optional
 import os
+import zlib
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://payslip_user:payslip_pass@db:5432/payslip_db")
 
@@ -13,12 +16,33 @@ engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine ל-endpoints של קריאה - שאילתה איטית לא חוסמת את ה-event loop (ואת שאר הבקשות)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+_async_session_factory = None
+
 
 class Payslip(Base):
     """
     טבלת תלושי שכר
     """
     __tablename__ = "payslips"
+    __table_args__ = (
+        # תלוש אחד לעובד לחודש - נאכף גם מול העלאות מקבילות (migrate_payslip_unique.py לטבלה קיימת).
+        # לפי period_key - "01" ו-"1" הם אותו חודש
+        Index("uq_payslips_employee_period_key", "employee_id", "period_key", unique=True),
+        # טווחי תקופות, והחודש הקודם של עובד / מחלקה (migrate_period_key.py לטבלה קיימת)
+        Index("ix_payslips_period_key", "period_key"),
+        Index("ix_payslips_employee_period_key", "employee_id", "period_key"),
+        Index("ix_payslips_department_period_key", "department", "period_key"),
+        # דפדוף keyset ב-/api/payslips, וגרסת ספירת התלושים (migrate_payslip_pagination.py לטבלה קיימת)
+        Index("ix_payslips_upload_date_id", "upload_date", "id"),
+        Index("ix_payslips_updated_at", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -26,6 +50,7 @@ class Payslip(Base):
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     upload_date = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # הוספה / חילוץ-מחדש
 
     # Employee info
     employee_name = Column(String)
@@ -35,6 +60,7 @@ class Payslip(Base):
     # Period
     month = Column(String)
     year = Column(String)
+    period_key = Column(Integer)  # year * 100 + month (202501) - למיון ולסינון, "01" ו-"1" אותו חודש
 
     # Salary
     base_salary = Column(Float)
@@ -50,9 +76,9 @@ class Payslip(Base):
     vacation_days = Column(Float)  # ימי חופש
     sick_days = Column(Float)  # ימי מחלה
 
-    # Parsed data (full JSON)
+    # Parsed data (full JSON) - JSONB ב-PostgreSQL, עם אינדקסים על השדות שמסננים לפיהם (ראה למטה)
     from sqlalchemy.ext.mutable import MutableDict
-    parsed_data = Column(MutableDict.as_mutable(JSON))
+    parsed_data = Column(MutableDict.as_mutable(JSON().with_variant(JSONB(), "postgresql")))
 
     # Validation results
     is_valid = Column(Boolean)
@@ -62,11 +88,269 @@ class Payslip(Base):
     has_anomalies = Column(Boolean)
     anomalies = Column(JSON)
 
-    # Full report
-    report = Column(JSON)
+    # Full report + raw text extracted from PDF - deferred (קבוצה "details"):
+    # נטענים רק כשניגשים אליהם, או עם undefer_group("details") (פירוט תלוש)
+    report = deferred(Column(JSON), group="details")
+    raw_text = deferred(Column(Text), group="details")
+
+    # Full original text - in a separate compressed table, loaded only on access
+    text_record = relationship(
+        "PayslipText",
+        uselist=False,
+        lazy="select",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+    @property
+    def original_text(self) -> str:
+        """
+        הטקסט המקורי המלא של התלוש (לניתוח שעות / פענוח מחדש)
+        """
+        if self.text_record is not None:
+            return self.text_record.text
+        # תלושים ישנים - הטקסט עדיין בתוך parsed_data
+        raw_data = (self.parsed_data or {}).get("raw_data") or {}
+        return raw_data.get("_original_text", "")
+
+    @original_text.setter
+    def original_text(self, text: str) -> None:
+        self.text_record = PayslipText.from_text(text) if text else None
+
+    # Payment table rows (line_items from the parser) - for SQL analytics per pay code
+    line_items = relationship(
+        "PayslipLineItem",
+        lazy="select",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+    def set_line_items(self, items: List[Dict[str, Any]]) -> None:
+        """
+        שמור את שורות טבלת התשלומים (parsed_data["line_items"]) בטבלה payslip_line_items
+        """
+        self.line_items = [
+            PayslipLineItem(**values)
+            for values in line_item_values(items, self.employee_id, self.period_key)
+        ]
+
+
+# שדות מתוך parsed_data לסינון ולקיבוץ ב-SQL - האינדקסים נבנים מאותם ביטויים בדיוק, כדי שה-planner ישתמש בהם
+# (התקופה - בעמודה period_key)
+EMPLOYEE_DEPARTMENT = Payslip.parsed_data[("employee", "department")].as_string()
+FINAL_PAYMENT = Payslip.parsed_data[("salary", "final_payment")].as_float()
+
+# אינדקסי JSONB - PostgreSQL בלבד (migrate_jsonb.py לטבלה קיימת)
+Index("ix_payslips_parsed_data", Payslip.parsed_data, postgresql_using="gin").ddl_if(dialect="postgresql")
+Index("ix_payslips_department", EMPLOYEE_DEPARTMENT).ddl_if(dialect="postgresql")
+Index("ix_payslips_final_payment", FINAL_PAYMENT).ddl_if(dialect="postgresql")
+
+
+class PayslipText(Base):
+    """
+    טבלת הטקסט המקורי של כל תלוש - דחוס ב-zlib, מחוץ ל-parsed_data
+    """
+    __tablename__ = "payslip_texts"
+
+    payslip_id = Column(Integer, ForeignKey("payslips.id", ondelete="CASCADE"), primary_key=True)
+    compressed_text = Column(LargeBinary, nullable=False)
+    text_length = Column(Integer)  # אורך הטקסט לפני דחיסה
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def from_text(cls, text: str) -> "PayslipText":
+        return cls(**cls.values(text))
+
+    @staticmethod
+    def values(text: str) -> Dict[str, Any]:
+        return {
+            "compressed_text": zlib.compress(text.encode('utf-8')),
+            "text_length": len(text)
+        }
+
+    @property
+    def text(self) -> str:
+        return zlib.decompress(self.compressed_text).decode('utf-8')
+
+
+class PayslipLineItem(Base):
+    """
+    טבלת שורות התשלום של כל תלוש (קוד, תיאור, כמות, תעריף, סכום).
+    מספר עובד ו-period_key משוכפלים מהתלוש - כדי שסיכום לפי קוד/עובד/חודש יהיה שאילתה אחת עם אינדקס.
+    השורות נבנות מחדש (set_line_items) בכל שינוי של התלוש - החלפה וחילוץ-מחדש.
+    """
+    __tablename__ = "payslip_line_items"
+    __table_args__ = (
+        Index("ix_payslip_line_items_code_payslip", "code", "payslip_id"),
+        Index("ix_payslip_line_items_employee_period_key", "employee_id", "period_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    payslip_id = Column(Integer, ForeignKey("payslips.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    employee_id = Column(String)
+    period_key = Column(Integer)  # כמו Payslip.period_key
+
+    code = Column(String(10), nullable=False)  # קוד תשלום (004, 063, 078...)
+    description = Column(String)
+    quantity = Column(Float)  # כמות / שעות
+    rate = Column(Float)  # תעריף
+    amount = Column(Float)  # סכום
+
+
+class ReextractionJob(Base):
+    """
+    טבלת עבודות חילוץ-מחדש של שדות שנלמדו (field_definitions / parsing_patterns)
+    על הטקסט השמור של תלושים קיימים - עם נקודת עצירה כדי שאפשר יהיה להמשיך
+    """
+    __tablename__ = "reextraction_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    status = Column(String, nullable=False, default="running")  # running, done, failed, superseded
+    fields = Column(JSON)  # השדות שחולצו מחדש בעבודה הזו
+    field_versions = Column(JSON)  # {field_name: גרסת ה-patterns} של כל השדות הנלמדים
+
+    last_payslip_id = Column(Integer, default=0)  # checkpoint - תלושים עד id זה עובדו
+    processed = Column(Integer, default=0)
+    updated = Column(Integer, default=0)
+    error = Column(Text)
+
+
+class IngestionJob(Base):
+    """
+    תור עבודות העלאה - ה-API רק שומר את הקובץ ומוסיף שורה,
+    תהליכי ה-worker תופסים עבודות עם SELECT ... FOR UPDATE SKIP LOCKED ומפענחים
+    """
+    __tablename__ = "ingestion_jobs"
+    __table_args__ = (
+        Index("ix_ingestion_jobs_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # heartbeat
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    status = Column(String, nullable=False, default="queued")  # queued, parsing, saving, done, failed
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    file_hash = Column(String)  # SHA-256 מהמאגר (file_store) - ה-worker לא מחשב אותו שוב
+    batch_id = Column(String, index=True)  # העלאה מרובת קבצים / ZIP (/api/upload/bulk)
+    on_duplicate = Column(String)  # skip / replace - מה לעשות עם תלוש שכבר קיים (None = DUPLICATE_POLICY)
+    worker_id = Column(String)
+    attempts = Column(Integer, default=0)
+
+    # התקדמות לפי תלוש
+    total_payslips = Column(Integer)
+    processed_payslips = Column(Integer, default=0)
+    saved_payslips = Column(Integer, default=0)
+    skipped_payslips = Column(Integer, default=0)
+    payslips = Column(JSON)  # [{payslip_number, employee_id, employee_name, period, status}, ...]
+
+    result = Column(JSON)  # התשובה הסופית - באותו מבנה כמו /api/upload הסינכרוני
+    error = Column(Text)
+
+
+def period_key(year: Any, month: Any) -> Optional[int]:
+    """
+    מפתח תקופה מספרי: year * 100 + month ("2025", "01" -> 202501). None לתקופה חסרה או לא תקינה
+    """
+    try:
+        year, month = int(year), int(month)
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= month <= 12:
+        return None
+    return year * 100 + month
+
 
-    # Raw text extracted from PDF
-    raw_text = Column(Text)
+def line_item_values(items: List[Dict[str, Any]], employee_id, key: Optional[int]) -> List[Dict[str, Any]]:
+    """
+    עמודות payslip_line_items לשורות התשלום של תלוש אחד (בלי payslip_id)
+
+    Args:
+        key: period_key של התלוש
+    """
+    return [
+        {
+            "employee_id": employee_id,
+            "period_key": key,
+            "code": item.get("code"),
+            "description": item.get("description"),
+            "quantity": item.get("quantity"),
+            "rate": item.get("rate"),
+            "amount": item.get("amount")
+        }
+        for item in items or []
+    ]
+
+
+def bulk_insert_line_items(db, rows: List[Dict[str, Any]]) -> None:
+    """
+    הכנס שורות תשלום (עם payslip_id) ב-INSERT מרובה שורות
+    """
+    if rows:
+        db.execute(insert(PayslipLineItem.__table__), rows)
+
+
+def bulk_insert_payslips(db, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    הכנס הרבה תלושים - כולל הטקסט המקורי ושורות התשלום - ב-INSERT מרובה שורות לכל טבלה,
+    בלי אובייקט ORM ובלי refresh לכל תלוש. ה-commit אצל הקורא.
+
+    Args:
+        rows: עמודות Payslip, ובנוסף "original_text" ו-"line_items" (לא חובה).
+              לכל השורות אותם מפתחות.
+
+    Returns:
+        ה-ids החדשים (RETURNING), לפי סדר השורות
+    """
+    if not rows:
+        return []
+
+    payslip_rows = []
+    texts = []
+    items = []
+    for row in rows:
+        row = dict(row)
+        texts.append(row.pop("original_text", None))
+        items.append(row.pop("line_items", None))
+        payslip_rows.append(row)
+
+    table = Payslip.__table__
+    ids = list(db.execute(
+        insert(table).returning(table.c.id, sort_by_parameter_order=True),
+        payslip_rows
+    ).scalars())
+
+    text_rows = [
+        {"payslip_id": payslip_id, **PayslipText.values(text)}
+        for payslip_id, text in zip(ids, texts)
+        if text
+    ]
+    if text_rows:
+        db.execute(insert(PayslipText.__table__), text_rows)
+
+    bulk_insert_line_items(db, [
+        {"payslip_id": payslip_id, **values}
+        for payslip_id, row, row_items in zip(ids, payslip_rows, items)
+        for values in line_item_values(row_items, row.get("employee_id"), row.get("period_key"))
+    ])
+
+    return ids
+
+
+def pop_original_text(parsed_data: Dict[str, Any]) -> str:
+    """
+    הוצא את _original_text מ-parsed_data (כדי שלא יישמר פעמיים ולא יישלח ללקוח)
+    """
+    raw_data = parsed_data.get("raw_data") or {}
+    return raw_data.pop("_original_text", None) or ""
 
 
 class FeedbackEntry(Base):
@@ -229,3 +513,48 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def async_database_url(url: str) -> str:
+    """
+    ה-URL של DATABASE_URL עם דרייבר async (postgresql -> asyncpg, sqlite -> aiosqlite)
+    """
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def get_async_session_factory():
+    """
+    ה-async engine נוצר בשימוש הראשון - כך שתהליכים שלא צריכים אותו (ה-workers) לא טוענים את asyncpg
+    """
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        url = ASYNC_DATABASE_URL or async_database_url(DATABASE_URL)
+        pool_options = {}
+        if not url.startswith("sqlite"):
+            pool_options = {
+                "pool_size": DB_POOL_SIZE,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "pool_timeout": DB_POOL_TIMEOUT,
+                "pool_recycle": DB_POOL_RECYCLE,
+                "pool_pre_ping": True
+            }
+
+        async_engine = create_async_engine(url, **pool_options)
+        # expire_on_commit=False - אובייקטים נקראים אחרי סיום ה-session בלי שאילתה נוספת (lazy load לא אפשרי ב-async)
+        _async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    return _async_session_factory
+
+
+async def get_async_db():
+    """
+    Dependency לקבלת AsyncSession (asyncpg)
+    """
+    async with get_async_session_factory()() as db:
+        yield db
@@ -0,0 +1,111 @@
+"""
+Field Extractor - מנוע חילוץ שדות מקומפל לתלושי שכר
+"""
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+# אותם דגלים שבהם השתמש החילוץ הקודם (re.search לכל pattern)
+DEFAULT_FLAGS = re.IGNORECASE | re.MULTILINE | re.DOTALL
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def literal_anchor(pattern: str, flags: int = DEFAULT_FLAGS) -> Optional[str]:
+    """
+    מצא את רצף התווים הקבוע הארוך ביותר שחייב להופיע בכל התאמה של ה-pattern.
+
+    לדוגמה: r"שכר נטו\\s+([\\d,]+\\.\\d{2})" -> "שכר נטו"
+    מחזיר None אם אין עוגן בטוח (אז ה-pattern ירוץ תמיד).
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception:
+        return None
+
+    best = ""
+    current = []
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(av))
+            continue
+        if len(current) > len(best):
+            best = "".join(current)
+        current = []
+    if len(current) > len(best):
+        best = "".join(current)
+
+    if not best:
+        return None
+
+    # עם IGNORECASE אותיות לועזיות יכולות להופיע באותיות גדולות/קטנות - לא עוגן בטוח
+    if flags & re.IGNORECASE and best.lower() != best.upper():
+        return None
+
+    return best
+
+
+class FieldExtractor:
+    """
+    מנוע חילוץ שדות: כל ה-patterns מקומפלים פעם אחת, לפי שדה ובסדר העדיפות המקורי.
+
+    לפני ההרצה בודקים אילו עוגנים (תוויות קבועות כמו "שכר נטו") מופיעים בטקסט,
+    וכך patterns שהתווית שלהם לא קיימת בתלוש לא רצים בכלל.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]], flags: int = DEFAULT_FLAGS):
+        self.flags = flags
+        self.fields: List[Tuple[str, List[Tuple[re.Pattern, Optional[str]]]]] = []
+
+        anchors = set()
+        for field, field_patterns in patterns.items():
+            compiled = []
+            for pattern in field_patterns:
+                anchor = literal_anchor(pattern, flags)
+                compiled.append((re.compile(pattern, flags), anchor))
+                if anchor:
+                    anchors.add(anchor)
+            self.fields.append((field, compiled))
+
+        # עוגן שמשותף לכמה patterns/שדות (למשל "חשבון מחלה") נבדק פעם אחת בלבד
+        self.anchors = sorted(anchors)
+
+    def present_anchors(self, text: str) -> set:
+        """
+        מחזיר את כל העוגנים שמופיעים בטקסט (חיפוש תת-מחרוזת, ללא regex)
+        """
+        return {anchor for anchor in self.anchors if anchor in text}
+
+    def extract(self, text: str, sources: Optional[Dict[str, str]] = None,
+                skip: Optional[Set[str]] = None) -> Dict[str, str]:
+        """
+        חלץ את כל השדות מהטקסט.
+        לכל שדה - ה-pattern הראשון (לפי סדר עדיפות) שמוצא התאמה קובע את הערך.
+
+        אם מועבר sources - ימולא ב-{שדה: ה-pattern שמצא אותו}.
+        שדות ב-skip (שכבר נמצאו בדרך אחרת, למשל מטבלת התשלומים) לא נבדקים בכלל -
+        גם לא ב-patterns שנלמדו להם.
+        """
+        present = self.present_anchors(text)
+        result = {}
+
+        for field, compiled in self.fields:
+            if skip and field in skip:
+                continue
+            for regex, anchor in compiled:
+                if anchor is not None and anchor not in present:
+                    continue
+                match = regex.search(text)
+                if match:
+                    value = _WHITESPACE.sub(' ', match.group(1).strip())
+                    if value:
+                        result[field] = value
+                        if sources is not None:
+                            sources[field] = regex.pattern
+                    break
+
+        return result
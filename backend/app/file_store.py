@@ -0,0 +1,90 @@
+"""
+File Store - אחסון קבצי ה-PDF שהועלו לפי hash של התוכן
+
+כל קובץ נשמר פעם אחת בנתיב שנגזר מה-SHA-256 שלו: <root>/ab/cd/abcd....pdf
+- שני קבצים שונים עם אותו שם לא דורסים זה את זה
+- אותו קובץ שהועלה בכמה שמות נשמר פעם אחת
+- ה-hash מחושב תוך כדי הכתיבה לדיסק, ומועבר ל-parser (מטמון הפענוח לפי hash) בלי לקרוא את הקובץ שוב
+"""
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class FileStore:
+    """
+    מאגר קבצים לפי תוכן (content-addressed), עם חלוקה לתתי-תיקיות לפי תחילת ה-hash
+    """
+
+    def __init__(self, root: Path, suffix: str = ".pdf"):
+        self.root = Path(root)
+        self.suffix = suffix
+        self.tmp_dir = self.root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest: str) -> Path:
+        # שתי רמות של 2 תווים - כדי שלא יהיו עשרות אלפי קבצים בתיקייה אחת
+        return self.root / digest[:2] / digest[2:4] / f"{digest}{self.suffix}"
+
+    def temp_path(self, suffix: str = "") -> Path:
+        """
+        נתיב זמני בתוך המאגר (אותה מערכת קבצים - ההעברה למקום הסופי אטומית)
+        """
+        return self.tmp_dir / f"{uuid.uuid4().hex}{suffix}"
+
+    def save(self, source: BinaryIO) -> Tuple[str, Path]:
+        """
+        שמור stream במאגר - ה-hash מחושב תוך כדי הכתיבה
+
+        Returns:
+            (sha256, הנתיב במאגר)
+        """
+        digest = hashlib.sha256()
+        tmp_path = self.temp_path()
+        try:
+            with open(tmp_path, "wb") as target:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    target.write(chunk)
+            return self._commit(tmp_path, digest.hexdigest())
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def save_file(self, path: Path, move: bool = False) -> Tuple[str, Path]:
+        """
+        הכנס קובץ קיים למאגר (להעברת קבצים ישנים) - move=True מעביר במקום להעתיק
+        """
+        if not move:
+            with open(path, "rb") as source:
+                return self.save(source)
+
+        from app.parse_cache import file_sha256
+        return self._commit(Path(path), file_sha256(str(path)))
+
+    def _commit(self, tmp_path: Path, digest: str) -> Tuple[str, Path]:
+        final_path = self.path_for(digest)
+        if final_path.exists():
+            # אותו תוכן כבר במאגר
+            tmp_path.unlink()
+        else:
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, final_path)
+        return digest, final_path
+
+    def digest_of(self, path: str) -> Optional[str]:
+        """
+        ה-hash של קובץ מהמאגר לפי הנתיב שלו (None לקובץ מחוץ למאגר)
+        """
+        path = Path(path)
+        digest = path.name[:-len(self.suffix)] if path.name.endswith(self.suffix) else None
+        if digest and len(digest) == 64 and path == self.path_for(digest):
+            return digest
+        return None
+
+    def contains(self, path: str) -> bool:
+        return self.digest_of(path) is not None
@@ -0,0 +1,350 @@
+"""
+Ingestion - פענוח PDF שהועלה ושמירת התלושים ב-DB
+
+זה התהליך שהיה בתוך /api/upload - עכשיו רץ בתהליכי ה-worker (app.ingestion_worker),
+מחוץ ל-event loop של ה-API. התשובה באותו מבנה כמו קודם.
+"""
+import os
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.analyzer import analyze_hours
+from app.database import Payslip, PayslipLineItem, PayslipText, bulk_insert_payslips, period_key, pop_original_text
+
+# מה לעשות עם תלוש שכבר קיים (אותו עובד, שנה וחודש): skip - לדלג, replace - להחליף
+DUPLICATE_POLICIES = ("skip", "replace")
+DUPLICATE_POLICY = os.getenv("DUPLICATE_POLICY", "skip")
+
+
+class IngestionError(Exception):
+    """
+    שגיאה שמוחזרת ללקוח (עם קוד HTTP, כמו HTTPException ב-API)
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def payslip_summary(ps: Dict[str, Any], payslip_number: Optional[int] = None) -> Dict[str, Any]:
+    """
+    סיכום תלוש לתשובה (כמו ב-multiple_payslips)
+    """
+    summary = {
+        "employee_name": ps.get("employee", {}).get("name"),
+        "employee_id": ps.get("employee", {}).get("id"),
+        "department": ps.get("employee", {}).get("department"),
+        "period": f"{ps.get('period', {}).get('month', '??')}/{ps.get('period', {}).get('year', '????')}",
+        "net_salary": ps.get("salary", {}).get("net"),
+        "final_payment": ps.get("salary", {}).get("final_payment"),
+        "gross_salary": ps.get("salary", {}).get("gross"),
+        "work_hours": ps.get("work_hours"),
+        "deductions": ps.get("deductions", {}),
+        "vacation_days": ps.get("vacation_days")
+    }
+    if payslip_number is not None:
+        summary = {"payslip_number": payslip_number, **summary}
+    return summary
+
+
+def payslip_columns(ps: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    העמודות של payslips שמשוכפלות מ-parsed_data (עובד, תקופה, שכר, שעות וימים) -
+    בהעלאה, וגם כשחילוץ-מחדש משנה את parsed_data של תלוש קיים
+    """
+    salary_data = ps.get("salary") or {}
+    employee_data = ps.get("employee") or {}
+    period_data = ps.get("period") or {}
+
+    return {
+        "employee_name": employee_data.get("name"),
+        "employee_id": employee_data.get("id"),
+        "department": employee_data.get("department"),
+        "month": period_data.get("month"),
+        "year": period_data.get("year"),
+        "period_key": period_key(period_data.get("year"), period_data.get("month")),
+        "base_salary": salary_data.get("base"),
+        "gross_salary": salary_data.get("gross"),
+        "net_salary": salary_data.get("net"),
+        "final_payment": salary_data.get("final_payment"),
+        "work_hours": ps.get("work_hours"),
+        "overtime_hours": ps.get("overtime_hours"),
+        "vacation_days": ps.get("vacation_days"),
+        "sick_days": ps.get("sick_days")
+    }
+
+
+def payslip_row(ps: Dict[str, Any], filename: str, file_path: str, original_text: str,
+                raw_text: str = "", report: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    שורת payslips (עם הטקסט ושורות התשלום) מתלוש מנותח - ל-bulk_insert_payslips
+    """
+    return {
+        "filename": filename,
+        "file_path": file_path,
+        "upload_date": datetime.utcnow(),
+        **payslip_columns(ps),
+        "parsed_data": ps,
+        "is_valid": True,  # TODO: Extract from crew_result
+        "validation_issues": [],  # TODO: Extract from crew_result
+        "has_anomalies": False,  # TODO: Extract from crew_result
+        "anomalies": [],  # TODO: Extract from crew_result
+        "report": report if report is not None else {"parsed_data": ps},
+        "raw_text": raw_text,
+        "original_text": original_text,
+        "line_items": ps.get("line_items")
+    }
+
+
+def payslip_key(ps: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+    """
+    המפתח הייחודי של תלוש (מספר עובד, period_key) - None אם חסר חלק ממנו
+    (תלוש בלי מפתח מלא לא נבדק לכפילות, כמו באינדקס הייחודי)
+    """
+    key = (
+        ps.get("employee", {}).get("id"),
+        period_key(ps.get("period", {}).get("year"), ps.get("period", {}).get("month"))
+    )
+    return key if all(key) else None
+
+
+def _existing_ids(db: Session, keys: Iterable[Tuple[str, int]]) -> Dict[Tuple[str, int], int]:
+    """
+    כל התלושים הקיימים עם המפתחות האלה - בשאילתה אחת
+    """
+    keys = list(keys)
+    if not keys:
+        return {}
+    rows = db.query(Payslip.id, Payslip.employee_id, Payslip.period_key).filter(
+        tuple_(Payslip.employee_id, Payslip.period_key).in_(keys)
+    ).all()
+    return {(row.employee_id, row.period_key): row.id for row in rows}
+
+
+def delete_payslips(db: Session, ids: List[int]) -> None:
+    """
+    מחק תלושים יחד עם הטקסט ושורות התשלום שלהם (בלי לסמוך על ON DELETE CASCADE)
+    """
+    for model in (PayslipText, PayslipLineItem):
+        db.query(model).filter(model.payslip_id.in_(ids)).delete(synchronize_session=False)
+    db.query(Payslip).filter(Payslip.id.in_(ids)).delete(synchronize_session=False)
+
+
+def _save_payslips(db: Session, entries: List[Dict[str, Any]], on_duplicate: str) -> List[Tuple[str, Optional[int]]]:
+    keys = [payslip_key(entry["ps"]) for entry in entries]
+    existing = _existing_ids(db, {key for key in keys if key})
+
+    results = []
+    seen = set()
+    replaced_ids = []
+    for entry, key in zip(entries, keys):
+        # כפילות בתוך אותו קובץ - הראשון נשמר
+        if key in seen:
+            results.append(("duplicate", None))
+            continue
+        if key:
+            seen.add(key)
+
+        status = "saved"
+        if key in existing:
+            if on_duplicate != "replace":
+                results.append(("duplicate", None))
+                continue
+            replaced_ids.append(existing[key])
+            status = "replaced"
+
+        results.append((status, payslip_row(**entry)))
+
+    if replaced_ids:
+        delete_payslips(db, replaced_ids)
+
+    # INSERT מרובה שורות עם RETURNING - ה-ids בלי refresh לכל תלוש
+    ids = iter(bulk_insert_payslips(db, [row for _, row in results if row is not None]))
+    db.commit()
+    return [(status, next(ids) if row is not None else None) for status, row in results]
+
+
+def save_payslips(db: Session, entries: List[Dict[str, Any]],
+                  on_duplicate: Optional[str] = None) -> List[Tuple[str, Optional[int]]]:
+    """
+    שמור קבוצת תלושים ב-commit אחד. הכפילויות (לפי עובד ו-period_key) נבדקות לכל הקבוצה בשאילתה אחת.
+
+    Args:
+        entries: [{"ps", "filename", "file_path", "original_text", "raw_text"?, "report"?}, ...] - הפרמטרים של payslip_row
+        on_duplicate: "skip" - תלוש קיים לא נשמר שוב; "replace" - התלוש הקיים נמחק ומוחלף
+
+    Returns:
+        לכל תלוש, לפי הסדר: ("saved" | "replaced" | "duplicate", id או None)
+    """
+    on_duplicate = on_duplicate or DUPLICATE_POLICY
+
+    try:
+        return _save_payslips(db, entries, on_duplicate)
+    except IntegrityError:
+        # העלאה מקבילה שמרה אחד המפתחות בין הבדיקה לשמירה (האינדקס הייחודי) - בודקים שוב
+        db.rollback()
+        print("⚠️  Concurrent upload saved some of these payslips, re-checking duplicates...")
+        return _save_payslips(db, entries, on_duplicate)
+
+
+class NullProgress:
+    """
+    דיווח התקדמות - ברירת מחדל שלא עושה כלום (ה-worker מעביר מימוש ששומר ב-DB)
+    """
+
+    def stage(self, status: str, total: Optional[int] = None) -> None:
+        pass
+
+    def payslip(self, entry: Dict[str, Any]) -> None:
+        pass
+
+    def heartbeat(self) -> None:
+        pass
+
+
+def ingest_pdf(db: Session, pdf_parser, file_path: str, filename: str, progress=None,
+               on_duplicate: Optional[str] = None, file_hash: Optional[str] = None) -> Dict[str, Any]:
+    """
+    פענח PDF ושמור את כל התלושים שבו ב-DB
+
+    Args:
+        db: session - התלושים נשמרים ב-commit אחד בסוף
+        pdf_parser: HebrewPayslipPDFParser
+        progress: אובייקט עם stage(status, total), payslip(entry) - התקדמות לפי תלוש (אחרי ה-commit),
+                  ו-heartbeat() - נקרא במהלך הפענוח
+        on_duplicate: "skip" / "replace" לתלושים שכבר קיימים (None = DUPLICATE_POLICY)
+        file_hash: SHA-256 של הקובץ מהמאגר (None = יחושב מהקובץ)
+
+    Raises:
+        IngestionError: PDF לא קריא (400) או תלוש בודד שכבר קיים ו-on_duplicate="skip" (409)
+    """
+    progress = progress or NullProgress()
+
+    # 1. Parse PDF
+    print(f"📄 Parsing PDF: {filename}")
+    parsed_result = pdf_parser.parse_pdf(file_path, file_hash, heartbeat=progress.heartbeat)
+
+    if "error" in parsed_result:
+        raise IngestionError(400, parsed_result["error"])
+
+    # Check if multiple payslips
+    if parsed_result.get("multiple_payslips"):
+        # Multiple payslips - save ALL to DB and return summary
+        progress.stage("saving", total=parsed_result["count"])
+        entries = []
+
+        for idx, ps in enumerate(parsed_result["payslips"], 1):
+            # 2. Analyze - סכום שעות 150% ו-125%
+            ps = analyze_hours(ps)
+
+            # הטקסט המקורי נשמר בנפרד (דחוס) - לא בתוך parsed_data
+            original_text = pop_original_text(ps)
+
+            entries.append({
+                "ps": ps,
+                "filename": f"{filename}#payslip{idx}",
+                "file_path": file_path,
+                "original_text": original_text
+            })
+
+        # Save all payslips in one commit (duplicates checked for the whole file in one query)
+        results = save_payslips(db, entries, on_duplicate)
+
+        payslips_summary = []
+        replaced_count = 0
+        for idx, (entry, (status, payslip_id)) in enumerate(zip(entries, results), 1):
+            ps = entry["ps"]
+            summary = payslip_summary(ps, idx)
+            progress.payslip({**summary, "status": status, "payslip_id": payslip_id})
+
+            if status == "duplicate":
+                print(f"⚠️  Payslip already exists for {ps.get('employee', {}).get('name')} ({ps.get('employee', {}).get('id')}) - {ps.get('period', {}).get('month')}/{ps.get('period', {}).get('year')}, skipping...")
+                continue
+            if status == "replaced":
+                replaced_count += 1
+
+            # Build summary for response
+            payslips_summary.append({**summary, "payslip_id": payslip_id})
+
+        saved_count = len(payslips_summary)
+        replaced_note = f" ({replaced_count} תלושים קיימים הוחלפו)" if replaced_count else ""
+
+        # Check if any were actually saved (not all were duplicates)
+        skipped_count = parsed_result["count"] - saved_count
+
+        if saved_count == 0:
+            # All were duplicates
+            return {
+                "success": False,
+                "multiple_payslips": True,
+                "count": parsed_result["count"],
+                "payslips": [],
+                "message": f"כל {parsed_result['count']} התלושים כבר קיימים במערכת. לא נוספו תלושים חדשים.",
+                "error": "duplicates"
+            }
+        elif skipped_count > 0:
+            # Some were duplicates
+            return {
+                "success": True,
+                "multiple_payslips": True,
+                "count": saved_count,
+                "payslips": payslips_summary,
+                "message": f"נשמרו {saved_count} תלושים חדשים. {skipped_count} תלושים כבר היו במערכת.{replaced_note}"
+            }
+        else:
+            # All were new
+            return {
+                "success": True,
+                "multiple_payslips": True,
+                "count": parsed_result["count"],
+                "payslips": payslips_summary,
+                "message": f"נמצאו {parsed_result['count']} תלושים בקובץ ונשמרו במערכת{replaced_note}"
+            }
+
+    # Single payslip
+    progress.stage("saving", total=1)
+    parsed_data = parsed_result
+    raw_text = parsed_data.pop("raw_text", "")
+
+    # 2. Analyze - סכום שעות 150% ו-125%
+    parsed_data = analyze_hours(parsed_data)
+
+    # הטקסט המקורי נשמר בנפרד (דחוס) - לא בתוך parsed_data
+    original_text = pop_original_text(parsed_data)
+
+    crew_result = "Analysis skipped - returning parsed data only"
+
+    # 3. שמור ב-DB (תלוש קיים - לפי on_duplicate)
+    summary = payslip_summary(parsed_data)
+    [(status, payslip_id)] = save_payslips(db, [{
+        "ps": parsed_data,
+        "filename": filename,
+        "file_path": file_path,
+        "original_text": original_text,
+        "raw_text": raw_text,
+        "report": {"crew_output": str(crew_result)}
+    }], on_duplicate)
+
+    if status == "duplicate":
+        employee_id = parsed_data.get("employee", {}).get("id")
+        month = parsed_data.get("period", {}).get("month")
+        year = parsed_data.get("period", {}).get("year")
+        print(f"⚠️  Payslip already exists for {parsed_data.get('employee', {}).get('name')} ({employee_id}) - {month}/{year}")
+        progress.payslip({**summary, "status": status})
+        raise IngestionError(409, f"תלוש כבר קיים עבור עובד {employee_id} לחודש {month}/{year}")
+
+    print(f"✓ Saved to database with ID: {payslip_id}")
+    progress.payslip({**summary, "status": status, "payslip_id": payslip_id})
+
+    return {
+        "success": True,
+        "payslip_id": payslip_id,
+        "summary": summary,
+        "parsed_data": parsed_data,
+        "crew_result": str(crew_result)
+    }
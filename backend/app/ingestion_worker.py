@@ -0,0 +1,391 @@
+"""
+Ingestion Worker - תור עבודות ההעלאה ותהליכי ה-worker שמעבדים אותו
+
+/api/upload שומר את ה-PDF, מוסיף שורה ל-ingestion_jobs ומחזיר job id מיד.
+כל worker תופס עבודה עם SELECT ... FOR UPDATE SKIP LOCKED (כמה workers לא יתפסו אותה עבודה),
+מפענח ושומר דרך app.ingestion, ומעדכן התקדמות לפי תלוש.
+ה-worker מעדכן heartbeat (updated_at) גם במהלך הפענוח - אחרי כל עמוד ותלוש.
+עבודה שה-worker שלה מת (בלי heartbeat יותר מ-INGESTION_JOB_TIMEOUT) חוזרת לתור.
+
+ה-API מפעיל INGESTION_WORKERS תהליכים בעצמו. אפשר גם להריץ workers נפרדים (מתיקיית backend):
+    python -m app.ingestion_worker --workers 2
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, IngestionJob
+
+# מספר תהליכי worker שה-API מפעיל ב-startup (0 = workers נפרדים בלבד)
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "1"))
+# כל כמה שניות worker פנוי בודק אם יש עבודה
+INGESTION_POLL_INTERVAL = float(os.getenv("INGESTION_POLL_INTERVAL", "1.0"))
+# עבודה בלי heartbeat יותר מזה (שניות) - ה-worker נחשב מת והעבודה חוזרת לתור
+INGESTION_JOB_TIMEOUT = int(os.getenv("INGESTION_JOB_TIMEOUT", "1800"))
+# heartbeat בזמן הפענוח - לכל היותר פעם בזמן הזה (שניות)
+HEARTBEAT_INTERVAL = float(os.getenv("INGESTION_HEARTBEAT_INTERVAL", "30"))
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+
+# לא לכתוב התקדמות לכל תלוש - לכל היותר פעם בזמן הזה (שניות)
+PROGRESS_INTERVAL = 1.0
+
+ACTIVE_STATUSES = ("parsing", "saving")
+
+
+def enqueue(db: Session, file_path: str, filename: str, on_duplicate: Optional[str] = None,
+            file_hash: Optional[str] = None) -> IngestionJob:
+    """
+    הוסף PDF שנשמר לתור
+    """
+    return enqueue_many(db, [(filename, file_path, file_hash)], on_duplicate=on_duplicate)[0]
+
+
+def enqueue_many(db: Session, files: List[Tuple[str, str, Optional[str]]], batch_id: Optional[str] = None,
+                 on_duplicate: Optional[str] = None) -> List[IngestionJob]:
+    """
+    הוסף כמה קבצים שנשמרו לתור ב-commit אחד
+
+    Args:
+        files: [(filename, file_path, file_hash), ...] - file_hash מהמאגר (None = יחושב בפענוח)
+        batch_id: מזהה ההעלאה המרובה (None = העלאה בודדת)
+        on_duplicate: skip / replace לתלושים שכבר קיימים (None = DUPLICATE_POLICY)
+    """
+    jobs = [
+        IngestionJob(filename=filename, file_path=file_path, file_hash=file_hash, batch_id=batch_id,
+                     on_duplicate=on_duplicate, status="queued", payslips=[])
+        for filename, file_path, file_hash in files
+    ]
+    db.add_all(jobs)
+    db.commit()
+    for job in jobs:
+        db.refresh(job)
+    return jobs
+
+
+def _requeue_stale(db: Session) -> None:
+    """
+    עבודות שה-worker שלהן הפסיק לעדכן - חזרה לתור (או כישלון אחרי INGESTION_MAX_ATTEMPTS)
+    """
+    deadline = datetime.utcnow() - timedelta(seconds=INGESTION_JOB_TIMEOUT)
+    stale = db.query(IngestionJob).filter(
+        IngestionJob.status.in_(ACTIVE_STATUSES),
+        IngestionJob.updated_at < deadline
+    ).with_for_update(skip_locked=True).all()
+
+    for job in stale:
+        print(f"[Ingestion] Job {job.id} timed out on worker {job.worker_id}")
+        if (job.attempts or 0) >= INGESTION_MAX_ATTEMPTS:
+            job.status = "failed"
+            job.error = "Worker timed out"
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = "queued"
+            job.worker_id = None
+
+    # SessionLocal בלי autoflush - שהעבודות שחזרו לתור ייתפסו כבר בשאילתה הבאה
+    db.flush()
+
+
+def claim_next(db: Session, worker_id: str) -> Optional[IngestionJob]:
+    """
+    תפוס את העבודה הבאה בתור - שורות שנעולות ע"י worker אחר מדולגות (SKIP LOCKED)
+    """
+    _requeue_stale(db)
+
+    job = db.query(IngestionJob).filter(
+        IngestionJob.status == "queued"
+    ).order_by(IngestionJob.id).with_for_update(skip_locked=True).first()
+
+    if job is None:
+        db.commit()
+        return None
+
+    # UPDATE מותנה - גם בלי נעילת שורות (sqlite מקומי) רק worker אחד מצליח לתפוס
+    claimed = db.query(IngestionJob).filter(
+        IngestionJob.id == job.id,
+        IngestionJob.status == "queued"
+    ).update({
+        "status": "parsing",
+        "worker_id": worker_id,
+        "attempts": IngestionJob.attempts + 1,
+        "started_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+        "processed_payslips": 0,
+        "saved_payslips": 0,
+        "skipped_payslips": 0,
+        "payslips": []
+    }, synchronize_session=False)
+    db.commit()
+
+    if not claimed:
+        return None
+    db.refresh(job)
+    return job
+
+
+class JobProgress:
+    """
+    כותב את התקדמות העבודה ב-session נפרד - התלושים עצמם נשמרים ב-commit אחד בסוף,
+    וה-status endpoint רואה את ההתקדמות כבר בזמן העבודה
+    """
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.status = "parsing"
+        self.total: Optional[int] = None
+        self.entries: List[Dict[str, Any]] = []
+        self._flushed_at = 0.0
+
+    def stage(self, status: str, total: Optional[int] = None) -> None:
+        self.status = status
+        if total is not None:
+            self.total = total
+        self.flush()
+
+    def payslip(self, entry: Dict[str, Any]) -> None:
+        self.entries.append({
+            key: entry.get(key)
+            for key in ("payslip_number", "employee_id", "employee_name", "period", "status", "payslip_id")
+            if entry.get(key) is not None
+        })
+        if time.monotonic() - self._flushed_at >= PROGRESS_INTERVAL:
+            self.flush()
+
+    def heartbeat(self) -> None:
+        """
+        סימן חיים במהלך הפענוח (parse_pdf קורא לו אחרי כל עמוד ותלוש) - שעבודה ארוכה לא תחזור לתור
+        """
+        if time.monotonic() - self._flushed_at >= HEARTBEAT_INTERVAL:
+            self.flush()
+
+    def counts(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "total_payslips": self.total,
+            "processed_payslips": len(self.entries),
+            "saved_payslips": sum(1 for e in self.entries if e.get("status") in ("saved", "replaced")),
+            "skipped_payslips": sum(1 for e in self.entries if e.get("status") == "duplicate"),
+            "payslips": list(self.entries)
+        }
+
+    def flush(self) -> None:
+        db = SessionLocal()
+        try:
+            db.query(IngestionJob).filter(IngestionJob.id == self.job_id).update(
+                {**self.counts(), "updated_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            print(f"[Ingestion] Could not update progress of job {self.job_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+        self._flushed_at = time.monotonic()
+
+
+def process_job(db: Session, job: IngestionJob, pdf_parser) -> None:
+    """
+    פענח ושמור את ה-PDF של העבודה, ועדכן את התוצאה הסופית
+    """
+    from app.ingestion import IngestionError, ingest_pdf
+
+    progress = JobProgress(job.id)
+    try:
+        result = ingest_pdf(db, pdf_parser, job.file_path, job.filename, progress, job.on_duplicate, job.file_hash)
+        job.status = "done"
+        job.result = result
+    except IngestionError as e:
+        db.rollback()
+        if e.status_code == 409:
+            # תלוש בודד שכבר קיים - הקובץ עובד בהצלחה, התלוש דולג (לא כישלון)
+            job.status = "done"
+            job.result = {
+                "success": False,
+                "status_code": 409,
+                "message": e.detail,
+                "error": "duplicates",
+                "skip_reason": "duplicate"
+            }
+        else:
+            job.status = "failed"
+            job.error = e.detail
+            job.result = {"success": False, "status_code": e.status_code, "message": e.detail}
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        job.status = "failed"
+        job.error = str(e)
+        job.result = {"success": False, "status_code": 500, "message": str(e)}
+
+    counts = progress.counts()
+    counts.pop("status")
+    for key, value in counts.items():
+        setattr(job, key, value)
+    job.finished_at = datetime.utcnow()
+    db.commit()
+    print(f"[Ingestion] Job {job.id} {job.status}: {job.saved_payslips} saved, {job.skipped_payslips} skipped")
+
+
+def run_worker(worker_id: Optional[str] = None, poll_interval: float = INGESTION_POLL_INTERVAL) -> None:
+    """
+    לולאת worker - תפוס עבודה, עבד, חזור. רץ עד שהתהליך נעצר.
+    """
+    from app.learned_patterns import LearnedPatternCache
+    from app.parse_cache import ParseCache
+    from app.pdf_parser import HebrewPayslipPDFParser
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    pdf_parser = HebrewPayslipPDFParser(cache=ParseCache(), learned_patterns=LearnedPatternCache())
+    print(f"[Ingestion] Worker {worker_id} started")
+
+    while True:
+        db = SessionLocal()
+        try:
+            job = claim_next(db, worker_id)
+            if job is None:
+                db.close()
+                time.sleep(poll_interval)
+                continue
+
+            print(f"[Ingestion] Worker {worker_id} processing job {job.id}: {job.filename}")
+            process_job(db, job, pdf_parser)
+        except Exception as e:
+            print(f"[Ingestion] Worker {worker_id} error: {e}")
+            db.rollback()
+            time.sleep(poll_interval)
+        finally:
+            db.close()
+
+
+def start_workers(count: int = INGESTION_WORKERS) -> List[multiprocessing.Process]:
+    """
+    הפעל תהליכי worker (spawn - בלי לשתף את חיבורי ה-DB של התהליך הראשי).
+    לא daemon - ה-parser צריך להפעיל תהליכים משלו ל-PDF גדולים.
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for _ in range(count):
+        process = context.Process(target=run_worker, daemon=False)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_workers(processes: List[multiprocessing.Process]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(timeout=5)
+
+
+def ingestion_status(job: IngestionJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "attempts": job.attempts,
+        "total_payslips": job.total_payslips,
+        "processed_payslips": job.processed_payslips or 0,
+        "saved_payslips": job.saved_payslips or 0,
+        "skipped_payslips": job.skipped_payslips or 0,
+        "payslips": job.payslips or [],
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+
+def batch_status(batch_id: str, jobs: List[IngestionJob]) -> Dict[str, Any]:
+    """
+    סטטוס מצטבר של העלאה מרובת קבצים - התוצאה באותו מבנה כמו multiple_payslips
+    (כל התלושים מכל הקבצים, ממוספרים מחדש), ובנוסף סטטוס לכל קובץ
+    """
+    payslips = []
+    files = []
+    skipped = 0
+
+    for job in jobs:
+        result = job.result or {}
+        if result.get("multiple_payslips"):
+            job_payslips = result.get("payslips") or []
+        elif result.get("summary"):
+            job_payslips = [{**result["summary"], "payslip_id": result.get("payslip_id")}]
+        else:
+            job_payslips = []
+
+        for summary in job_payslips:
+            payslips.append({**summary, "payslip_number": len(payslips) + 1, "filename": job.filename})
+        skipped += job.skipped_payslips or 0
+
+        files.append({
+            "job_id": job.id,
+            "filename": job.filename,
+            "status": job.status,
+            "total_payslips": job.total_payslips,
+            "processed_payslips": job.processed_payslips or 0,
+            "saved_payslips": job.saved_payslips or 0,
+            "skipped_payslips": job.skipped_payslips or 0,
+            "skip_reason": result.get("skip_reason"),
+            "error": job.error
+        })
+
+    finished = [job for job in jobs if job.status in ("done", "failed")]
+    failed = [job for job in jobs if job.status == "failed"]
+    # קבצים שכל התלושים שלהם כבר היו במערכת (תלוש בודד שקיים - 409)
+    skipped_files = [job for job in jobs if (job.result or {}).get("skip_reason")]
+    if len(finished) == len(jobs):
+        status = "done"
+    elif any(job.status != "queued" for job in jobs):
+        status = "running"
+    else:
+        status = "queued"
+
+    message = f"נשמרו {len(payslips)} תלושים מ-{len(jobs)} קבצים."
+    if skipped:
+        message += f" {skipped} תלושים כבר היו במערכת."
+    if failed:
+        message += f" {len(failed)} קבצים נכשלו."
+
+    result = {
+        "success": len(payslips) > 0,
+        "multiple_payslips": True,
+        "count": len(payslips),
+        "payslips": payslips,
+        "message": message
+    }
+    if not payslips and skipped and not failed:
+        result["error"] = "duplicates"
+
+    return {
+        "batch_id": batch_id,
+        "status": status,
+        "total_files": len(jobs),
+        "finished_files": len(finished),
+        "failed_files": len(failed),
+        "skipped_files": len(skipped_files),
+        "processed_payslips": sum(job.processed_payslips or 0 for job in jobs),
+        "files": files,
+        "result": result if status == "done" else None
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Payslip ingestion worker")
+    arg_parser.add_argument("--workers", type=int, default=1)
+    args = arg_parser.parse_args()
+
+    if args.workers <= 1:
+        run_worker()
+    else:
+        for process in start_workers(args.workers):
+            process.join()
@@ -0,0 +1,178 @@
+"""
+Learned Patterns - מטמון בזיכרון של ה-patterns שנלמדו מפידבק
+
+ה-patterns נטענים מ-field_definitions / parsing_patterns פעם אחת ונשמרים עם חותמת גרסה.
+ה-parser בודק רק את הגרסה (בזיכרון) בכל פענוח, ומקמפל מחדש רק כשהיא משתנה -
+כך שדות שנלמדו מחולצים אוטומטית בלי שאילתה ל-DB בכל פענוח.
+
+הגרסה מתעדכנת כש-FieldLearner / ParserImprover קוראים ל-invalidate(),
+או (בין תהליכים) לכל היותר כל LEARNED_PATTERNS_TTL שניות.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import text
+
+# כל כמה שניות לבדוק שינויים שנכתבו מתהליך אחר (0 = רק invalidate)
+LEARNED_PATTERNS_TTL = float(os.getenv("LEARNED_PATTERNS_TTL", "60"))
+
+# לאן נכנס שדה שנלמד בלי קטגוריה (כמו parsed_data[category][field] ב-/api/feedback/new-field)
+DEFAULT_CATEGORY = "learned_fields"
+
+
+def _as_list(value) -> List[Any]:
+    """
+    עמודות JSON שנשמרו עם json.dumps חוזרות כמחרוזת
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return value if isinstance(value, list) else []
+
+
+def _valid(regex: str) -> bool:
+    try:
+        re.compile(regex)
+        return True
+    except re.error:
+        print(f"[LearnedPatterns] Skipping invalid pattern: {regex}")
+        return False
+
+
+def load_learned_patterns(db) -> Dict[str, Dict[str, Any]]:
+    """
+    טען את ה-patterns הפעילים שנלמדו, לפי שדה ובסדר עדיפות (confidence)
+
+    Returns:
+        {field_name: {"patterns": [regex, ...], "category": field_category או None}}
+    """
+    learned: Dict[str, Dict[str, Any]] = {}
+
+    # patterns לשדות קיימים (ParserImprover)
+    rows = db.execute(text("""
+        SELECT field_name, pattern_regex
+        FROM parsing_patterns
+        WHERE active = TRUE
+          AND pattern_type = 'field_extraction'
+          AND field_name IS NOT NULL
+        ORDER BY confidence_score DESC, id
+    """)).fetchall()
+    for row in rows:
+        if row.pattern_regex and _valid(row.pattern_regex):
+            field = learned.setdefault(row.field_name, {"patterns": [], "category": None})
+            field["patterns"].append(row.pattern_regex)
+
+    # שדות חדשים (FieldLearner)
+    rows = db.execute(text("""
+        SELECT field_name, field_category, extraction_patterns
+        FROM field_definitions
+        WHERE active = TRUE
+        ORDER BY id
+    """)).fetchall()
+    for row in rows:
+        patterns = sorted(
+            _as_list(row.extraction_patterns),
+            key=lambda p: p.get("confidence", 0) if isinstance(p, dict) else 0,
+            reverse=True
+        )
+        regexes = [
+            p.get("regex") if isinstance(p, dict) else p
+            for p in patterns
+        ]
+        field = learned.setdefault(row.field_name, {"patterns": [], "category": None})
+        field["category"] = row.field_category
+        field["patterns"].extend(r for r in regexes if r and _valid(r))
+
+    return {name: field for name, field in learned.items() if field["patterns"]}
+
+
+def pattern_version(patterns: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(patterns, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    ).hexdigest()[:12]
+
+
+class LearnedPatternCache:
+    """
+    ה-patterns שנלמדו + חותמת גרסה. טעינה מה-DB רק אחרי invalidate() או TTL.
+    """
+
+    def __init__(self, session_factory=None, ttl: float = LEARNED_PATTERNS_TTL):
+        if session_factory is None:
+            from app.database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.ttl = ttl
+
+        self.learned: Dict[str, Dict[str, Any]] = {}
+        self.version = pattern_version(self.learned)
+
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """
+        סמן שה-patterns השתנו - הטעינה הבאה תהיה בבדיקת הגרסה הבאה
+        """
+        self._loaded_at = None
+
+    def _stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        return self.ttl > 0 and time.monotonic() - self._loaded_at > self.ttl
+
+    def current_version(self) -> str:
+        """
+        חותמת הגרסה הנוכחית - טוען מחדש מה-DB רק אם המטמון לא בתוקף
+        """
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self._reload()
+        return self.version
+
+    def _reload(self) -> None:
+        db = self.session_factory()
+        try:
+            learned = load_learned_patterns(db)
+        except Exception as e:
+            # הטבלאות עוד לא קיימות / DB לא זמין - ננסה שוב אחרי ה-TTL
+            print(f"[LearnedPatterns] Could not load learned patterns: {e}")
+            learned = self.learned
+        finally:
+            db.close()
+
+        version = pattern_version(learned)
+        if version != self.version:
+            print(f"[LearnedPatterns] Loaded patterns for {len(learned)} fields (version {version})")
+        self.learned = learned
+        self.version = version
+        self._loaded_at = time.monotonic()
+
+    def merge(self, patterns: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """
+        ה-patterns המובנים + הנלמדים: לשדה קיים - הנלמדים קודם (כמו ב-ParserImprover),
+        שדה חדש - נוסף בסוף
+        """
+        merged = {field: list(field_patterns) for field, field_patterns in patterns.items()}
+        for field, data in self.learned.items():
+            existing = merged.get(field, [])
+            merged[field] = [p for p in data["patterns"] if p not in existing] + existing
+        return merged
+
+    def new_fields(self, builtin: Dict[str, List[str]]) -> Dict[str, str]:
+        """
+        שדות שנלמדו ואינם חלק מה-parser - {field: category}
+        """
+        return {
+            field: data["category"] or DEFAULT_CATEGORY
+            for field, data in self.learned.items()
+            if field not in builtin
+        }
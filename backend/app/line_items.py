@@ -0,0 +1,172 @@
+"""
+Line Items - פענוח טבלת התשלומים של התלוש במעבר אחד
+
+טבלת התשלומים מתחילה בשורת הכותרת "תשלומים" ונגמרת בשורת סה"כ התשלומים (או בכותרת "ניכויים").
+כל שורה בטבלה שמתחילה בקוד של 3 ספרות היא שורת תשלום:
+    "063 שכר בר 42.68 38.00 1621.84"  -> קוד, תיאור, כמות, תעריף, סכום
+    "020 פרמיה 1.00 1234.00"         -> קוד, תיאור, כמות, סכום
+    "089 פיצוי נוסף 120.50"          -> קוד, תיאור, סכום
+שורות עם קוד מחוץ לטבלה (ניכויים, נתונים נוספים) לא נקראות. תלוש בלי כותרת "תשלומים" -
+אין שורות, והשדות נמצאים ב-patterns של ה-parser.
+"""
+import re
+from typing import Dict, Any, List, Optional
+
+# קוד תשלום -> שדה גולמי ב-parser (הסכום של השורה = המספר האחרון).
+# גם בשורה עם כמות ותעריף ("020 פרמיה 1.00 50.00 1234.00" -> 1234.00) - ה-regex הקודם של 015/020
+# לקח את המספר השני, שבשורה של 3 מספרים הוא התעריף ולא הסכום
+PAYMENT_CODE_FIELDS = {
+    "004": "travel_allowance",  # נסיעות
+    "015": "tishrey_bonus",  # יתרת תשר
+    "020": "premium",  # פרמיה
+    "022": "gift_value",  # שווי מתנות
+    "063": "base_wage",  # שכר בר
+    "078": "saturday_150",  # ש 150% שבת
+    "089": "severance_extra",  # פיצוי נוסף
+}
+
+# קוד תשלום -> שדה גולמי ב-parser (הכמות של השורה)
+QUANTITY_CODE_FIELDS = {
+    "063": "regular_hours",  # שעות רגילות משכר בר
+}
+
+# השדות הגולמיים שנקבעים מטבלת התשלומים - כשיש שורה עם הקוד, ה-patterns (גם אלה שנלמדו) לא רצים להם
+LINE_ITEM_FIELDS = set(PAYMENT_CODE_FIELDS.values()) | set(QUANTITY_CODE_FIELDS.values())
+
+# תעריפי שעות נוספות מוכרים (באחוזים)
+KNOWN_RATES = {100, 125, 150, 175, 200}
+
+_RATE_KEYS = {rate: f"hours_{rate}" for rate in sorted(KNOWN_RATES)}
+_SATURDAY_KEYS = {rate: f"saturday_hours_{rate}" for rate in sorted(KNOWN_RATES)}
+HOURS_BUCKETS = list(_RATE_KEYS.values()) + list(_SATURDAY_KEYS.values())
+_SATURDAY = "שבת"
+
+_ITEM_LINE = re.compile(r'^[ \t]*(\d{3})[ \t]+(\S.*)$', re.MULTILINE)
+# גבולות טבלת התשלומים (אחרי תיקון RTL "סה"כ" יוצא "כ"הס")
+_TABLE_START = re.compile(r'^[ \t]*תשלומים[ \t]*$', re.MULTILINE)
+_TABLE_END = re.compile(r'^(?:.*(?:סה"כ|כ"הס) תשלומים.*|[ \t]*ניכויים[ \t]*)$', re.MULTILINE)
+_NUMBER = re.compile(r'-?[\d,]*\.?\d+')
+_RATE = re.compile(r'\d{3}')
+_HOURS_ITEM = re.compile(r'ש(?=[\s\d%]|$)')  # "ש 150% כפולה", "ש %051שבת" - לא "שכר בר"
+
+
+def _to_float(value: str) -> Optional[float]:
+    try:
+        return float(value.replace(',', ''))
+    except ValueError:
+        return None
+
+
+def _payment_tables(text: str):
+    """
+    טווחי (התחלה, סוף) של טבלאות התשלומים בטקסט (טקסט עם כמה תלושים - טבלה לכל תלוש)
+    """
+    pos = 0
+    while True:
+        start = _TABLE_START.search(text, pos)
+        if start is None:
+            return
+        end = _TABLE_END.search(text, start.end())
+        end_pos = end.start() if end else len(text)
+        yield start.end(), end_pos
+        pos = max(end_pos, start.end())
+
+
+def parse_line_items(text: str) -> List[Dict[str, Any]]:
+    """
+    עבור על טבלאות התשלומים פעם אחת והחזר את כל שורות התשלום, לפי סדר ההופעה.
+
+    Returns:
+        [{"code": "063", "description": "שכר בר", "quantity": 42.68, "rate": 38.0, "amount": 1621.84}, ...]
+    """
+    items = []
+
+    for match in (m for start, end in _payment_tables(text) for m in _ITEM_LINE.finditer(text, start, end)):
+        tokens = match.group(2).split()
+
+        # עד 3 מספרים בסוף השורה: [כמות] [תעריף] סכום
+        numbers = []
+        while tokens and len(numbers) < 3 and _NUMBER.fullmatch(tokens[-1]):
+            numbers.insert(0, tokens.pop())
+
+        if not tokens or not numbers:
+            continue  # אין תיאור או אין סכום - לא שורת תשלום
+
+        quantity = rate = None
+        if len(numbers) == 3:
+            quantity, rate, amount = numbers
+        elif len(numbers) == 2:
+            quantity, amount = numbers
+        else:
+            amount = numbers[0]
+
+        items.append({
+            "code": match.group(1),
+            "description": " ".join(tokens),
+            "quantity": _to_float(quantity) if quantity else None,
+            "rate": _to_float(rate) if rate else None,
+            "amount": _to_float(amount)
+        })
+
+    return items
+
+
+def line_item_fields(items: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    השדות הגולמיים לפי קוד (travel_allowance, base_wage, regular_hours...) -
+    כטקסט, כמו שאר השדות הגולמיים, מהשורה הראשונה של כל קוד
+    """
+    fields = {}
+    for item in items:
+        field = PAYMENT_CODE_FIELDS.get(item["code"])
+        if field and field not in fields and item["amount"] is not None:
+            fields[field] = str(item["amount"])
+
+        field = QUANTITY_CODE_FIELDS.get(item["code"])
+        if field and field not in fields and item["quantity"] is not None:
+            fields[field] = str(item["quantity"])
+    return fields
+
+
+def item_rate(item: Dict[str, Any]) -> Optional[int]:
+    """
+    אחוז השעות של שורת שעות ("ש 150% כפולה", "ש %051שבת") - או None.
+    בטקסט RTL המספר יכול להופיע הפוך (051 במקום 150).
+    """
+    description = item["description"]
+    if not _HOURS_ITEM.match(description):
+        return None
+
+    for digits in _RATE.findall(description):
+        if int(digits) in KNOWN_RATES:
+            return int(digits)
+        if int(digits[::-1]) in KNOWN_RATES:
+            return int(digits[::-1])
+    return None
+
+
+def hours_by_rate(items: List[Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    """
+    סכום השעות (כמות) של שורות השעות לפי תעריף - במעבר אחד על השורות.
+
+    Returns:
+        {"hours_100": ..., "hours_125": ..., ..., "saturday_hours_150": ...}
+        שעות שבת נספרות גם בתעריף הרגיל שלהן; None לתעריף בלי שורות
+    """
+    buckets = dict.fromkeys(HOURS_BUCKETS)
+
+    for item in items:
+        if item["quantity"] is None:
+            continue
+        rate = item_rate(item)
+        if rate is None:
+            continue
+
+        key = _RATE_KEYS[rate]
+        buckets[key] = (buckets[key] or 0.0) + item["quantity"]
+
+        if _SATURDAY in item["description"]:
+            key = _SATURDAY_KEYS[rate]
+            buckets[key] = (buckets[key] or 0.0) + item["quantity"]
+
+    return buckets
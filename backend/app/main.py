@@ -1,25 +1,38 @@
 """
 FastAPI Backend - ניהול תלושי שכר
 """
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Form, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 import shutil
 import os
+import uuid
+import zipfile
 from pathlib import Path
 import sys
 
 # Add backend directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.database import get_db, init_db, Payslip, FeedbackEntry, ChatHistory, AgentLearning, SavedKPI, KnowledgeInsight
+from app.database import get_db, get_async_db, init_db, SessionLocal, Payslip, PayslipLineItem, ReextractionJob, IngestionJob, FeedbackEntry, ChatHistory, AgentLearning, SavedKPI, KnowledgeInsight
+from app.database import EMPLOYEE_DEPARTMENT, FINAL_PAYMENT, period_key
 from app.pdf_parser import HebrewPayslipPDFParser
+from app.parse_cache import ParseCache
+from app.file_store import FileStore
+from app.payslip_pagination import PayslipCountCache, decode_cursor, encode_cursor
+from app.learned_patterns import LearnedPatternCache
 from app.ai_agent.learning_manager import LearningManager
+from app.reextraction import run_reextraction, job_status
+from app.ingestion import DUPLICATE_POLICIES
+from app.ingestion_worker import INGESTION_WORKERS, batch_status, enqueue, enqueue_many, ingestion_status, start_workers, stop_workers
 
 # Import from new structure
 from crewai import Crew, Process
@@ -49,10 +62,16 @@ app.add_middleware(
 # Initialize
 UPLOAD_DIR = Path("/app/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+file_store = FileStore(UPLOAD_DIR)  # קבצי ה-PDF נשמרים לפי hash התוכן
 
-pdf_parser = HebrewPayslipPDFParser()
+# מקסימום קבצי PDF בהעלאה מרובה אחת (כולל קבצים בתוך ZIP)
+BULK_UPLOAD_MAX_FILES = int(os.getenv("BULK_UPLOAD_MAX_FILES", "2000"))
+
+pdf_parser = HebrewPayslipPDFParser(cache=ParseCache(), learned_patterns=LearnedPatternCache())
 # knowledge_base = KnowledgeBase()  # TODO: Move to backend structure
 analysis_crew = None  # נאתחל ב-startup
+ingestion_workers = []  # תהליכי worker לתור ההעלאות - מופעלים ב-startup
+payslip_counts = PayslipCountCache()  # סה"כ התלושים ב-/api/payslips לכל צירוף מסננים
 
 # Create Payslip Analysis Crew
 payslip_crew = Crew(
@@ -83,9 +102,21 @@ async def startup_event():
     print("✓ Agents: Chat Bot Manager, Parser, Validator, Analyzer, Reporter")
     print("✓ Process: Hierarchical with Manager LLM")
 
+    # תהליכי worker לתור ההעלאות
+    ingestion_workers.extend(start_workers(INGESTION_WORKERS))
+    print(f"✓ Ingestion workers: {len(ingestion_workers)}")
+
     print("✓ Server ready on port 3000")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    עצירת תהליכי ה-worker
+    """
+    stop_workers(ingestion_workers)
+
+
 @app.get("/")
 async def root():
     """
@@ -98,285 +129,305 @@ async def root():
     }
 
 
-@app.post("/api/upload")
+@app.post("/api/upload", status_code=202)
 async def upload_payslip(
     file: UploadFile = File(...),
+    on_duplicate: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    העלאת תלוש PDF וניתוח
+    העלאת תלוש PDF - נשמר ונכנס לתור העבודות, הניתוח רץ ב-worker.
+    מחזיר job id מיד; ההתקדמות והתוצאה ב-/api/upload/jobs/{job_id}
+
+    on_duplicate: skip / replace - מה לעשות עם תלוש שכבר קיים (ברירת מחדל DUPLICATE_POLICY)
     """
     # בדוק שזה PDF
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    _check_duplicate_policy(on_duplicate)
 
-    # שמור את הקובץ
-    file_path = UPLOAD_DIR / file.filename
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # שמור את הקובץ במאגר (מחוץ ל-event loop) - הנתיב לפי hash התוכן, כך ששני קבצים באותו שם לא דורסים זה את זה
+    file_hash, file_path = await run_in_threadpool(file_store.save, file.file)
 
-    try:
-        # 1. Parse PDF
-        print(f"📄 Parsing PDF: {file.filename}")
-        parsed_result = pdf_parser.parse_pdf(str(file_path))
-
-        if "error" in parsed_result:
-            raise HTTPException(status_code=400, detail=parsed_result["error"])
-
-        # Check if multiple payslips
-        if parsed_result.get("multiple_payslips"):
-            # Multiple payslips - save ALL to DB and return summary
-            payslips_summary = []
-            saved_payslips = []
-
-            for idx, ps in enumerate(parsed_result["payslips"], 1):
-                # 2. Analyze - סכום שעות 150% ו-125%
-                from app.analyzer import analyze_hours
-                ps = analyze_hours(ps)
-
-                # Check if this payslip already exists (prevent duplicates)
-                employee_id = ps.get("employee", {}).get("id")
-                month = ps.get("period", {}).get("month")
-                year = ps.get("period", {}).get("year")
-
-                existing = db.query(Payslip).filter(
-                    Payslip.employee_id == employee_id,
-                    Payslip.month == month,
-                    Payslip.year == year
-                ).first()
-
-                if existing:
-                    print(f"⚠️  Payslip already exists for {ps.get('employee', {}).get('name')} ({employee_id}) - {month}/{year}, skipping...")
-                    continue
-
-                # Save each payslip to DB
-                salary_data = ps.get("salary", {})
-                employee_data = ps.get("employee", {})
-
-                payslip = Payslip(
-                    filename=f"{file.filename}#payslip{idx}",
-                    file_path=str(file_path),
-                    employee_name=employee_data.get("name"),
-                    employee_id=employee_id,
-                    department=employee_data.get("department"),
-                    month=month,
-                    year=year,
-                    base_salary=salary_data.get("base"),
-                    gross_salary=salary_data.get("gross"),
-                    net_salary=salary_data.get("net"),
-                    final_payment=salary_data.get("final_payment"),
-                    work_hours=ps.get("work_hours"),
-                    overtime_hours=ps.get("overtime_hours"),
-                    vacation_days=ps.get("vacation_days"),
-                    sick_days=ps.get("sick_days"),
-                    parsed_data=ps,
-                    is_valid=True,
-                    validation_issues=[],
-                    has_anomalies=False,
-                    anomalies=[],
-                    report={"parsed_data": ps},
-                    raw_text=ps.get("raw_text", "")
-                )
-                db.add(payslip)
-                saved_payslips.append(payslip)
-
-                # Build summary for response
-                payslips_summary.append({
-                    "payslip_number": idx,
-                    "employee_name": ps.get("employee", {}).get("name"),
-                    "employee_id": ps.get("employee", {}).get("id"),
-                    "department": ps.get("employee", {}).get("department"),
-                    "period": f"{ps.get('period', {}).get('month', '??')}/{ps.get('period', {}).get('year', '????')}",
-                    "net_salary": ps.get("salary", {}).get("net"),
-                    "final_payment": ps.get("salary", {}).get("final_payment"),
-                    "gross_salary": ps.get("salary", {}).get("gross"),
-                    "work_hours": ps.get("work_hours"),
-                    "deductions": ps.get("deductions", {}),
-                    "vacation_days": ps.get("vacation_days")
-                })
+    job = await run_in_threadpool(enqueue, db, str(file_path), file.filename, on_duplicate, file_hash)
+    print(f"📥 Queued {file.filename} as ingestion job {job.id}")
 
-            # Commit all payslips to DB
-            db.commit()
-            for p in saved_payslips:
-                db.refresh(p)
-
-            # Check if any were actually saved (not all were duplicates)
-            skipped_count = parsed_result["count"] - len(saved_payslips)
-
-            if len(saved_payslips) == 0:
-                # All were duplicates
-                return {
-                    "success": False,
-                    "multiple_payslips": True,
-                    "count": parsed_result["count"],
-                    "payslips": [],
-                    "message": f"כל {parsed_result['count']} התלושים כבר קיימים במערכת. לא נוספו תלושים חדשים.",
-                    "error": "duplicates"
-                }
-            elif skipped_count > 0:
-                # Some were duplicates
-                return {
-                    "success": True,
-                    "multiple_payslips": True,
-                    "count": len(saved_payslips),
-                    "payslips": payslips_summary,
-                    "message": f"נשמרו {len(saved_payslips)} תלושים חדשים. {skipped_count} תלושים כבר היו במערכת."
-                }
-            else:
-                # All were new
-                return {
-                    "success": True,
-                    "multiple_payslips": True,
-                    "count": parsed_result["count"],
-                    "payslips": payslips_summary,
-                    "message": f"נמצאו {parsed_result['count']} תלושים בקובץ ונשמרו במערכת"
-                }
+    return {
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/upload/jobs/{job.id}"
+    }
 
-        # Single payslip - continue with existing code
-        parsed_data = parsed_result
-        raw_text = parsed_data.pop("raw_text", "")
-
-        # 2. Analyze - סכום שעות 150% ו-125%
-        from app.analyzer import analyze_hours
-        parsed_data = analyze_hours(parsed_data)
-
-        crew_result = "Analysis skipped - returning parsed data only"
-
-        # Crew returns final output as string/dict
-        # For now, we'll parse the parsed_data and assume validation passed
-        # TODO: Parse crew_result properly when tasks return structured data
-
-        # 3. שמור ב-DB
-        # Check if this payslip already exists (prevent duplicates)
-        employee_id = parsed_data.get("employee", {}).get("id")
-        month = parsed_data.get("period", {}).get("month")
-        year = parsed_data.get("period", {}).get("year")
-
-        existing = db.query(Payslip).filter(
-            Payslip.employee_id == employee_id,
-            Payslip.month == month,
-            Payslip.year == year
-        ).first()
-
-        if existing:
-            print(f"⚠️  Payslip already exists for {parsed_data.get('employee', {}).get('name')} ({employee_id}) - {month}/{year}")
-            raise HTTPException(
-                status_code=409,
-                detail=f"תלוש כבר קיים עבור עובד {employee_id} לחודש {month}/{year}"
-            )
 
-        employee_data = parsed_data.get("employee", {})
-        salary_data = parsed_data.get("salary", {})
-
-        payslip = Payslip(
-            filename=file.filename,
-            file_path=str(file_path),
-            employee_name=employee_data.get("name"),
-            employee_id=employee_id,
-            department=employee_data.get("department"),
-            month=month,
-            year=year,
-            base_salary=salary_data.get("base"),
-            gross_salary=salary_data.get("gross"),
-            net_salary=salary_data.get("net"),
-            final_payment=salary_data.get("final_payment"),
-            work_hours=parsed_data.get("work_hours"),
-            overtime_hours=parsed_data.get("overtime_hours"),
-            vacation_days=parsed_data.get("vacation_days"),
-            sick_days=parsed_data.get("sick_days"),
-            parsed_data=parsed_data,
-            is_valid=True,  # TODO: Extract from crew_result
-            validation_issues=[],  # TODO: Extract from crew_result
-            has_anomalies=False,  # TODO: Extract from crew_result
-            anomalies=[],  # TODO: Extract from crew_result
-            report={"crew_output": str(crew_result)},
-            raw_text=raw_text
+def _check_duplicate_policy(on_duplicate: Optional[str]) -> None:
+    if on_duplicate is not None and on_duplicate not in DUPLICATE_POLICIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"on_duplicate must be one of: {', '.join(DUPLICATE_POLICIES)}"
         )
 
-        db.add(payslip)
-        db.commit()
-        db.refresh(payslip)
 
-        print(f"✓ Saved to database with ID: {payslip.id}")
+def _save_bulk_upload(files: List[UploadFile]) -> Dict[str, list]:
+    """
+    שמור את כל קבצי ה-PDF מההעלאה - קבצי PDF ישירות, ומכל ZIP כל PDF שבתוכו.
+    ה-ZIP נשמר לדיסק ונקרא משם - כל קובץ בתוכו מועתק בנפרד למאגר, בלי לטעון את הארכיון לזיכרון.
 
-        # מחק קובץ זמני אם קיים
-        if temp_json.exists():
-            temp_json.unlink()
+    Returns:
+        {"saved": [(filename, file_path, file_hash), ...], "rejected": [{"filename", "reason"}, ...]}
+    """
+    saved = []
+    rejected = []
+
+    for file in files:
+        name = file.filename or ""
+        lower_name = name.lower()
+
+        if lower_name.endswith('.pdf'):
+            if len(saved) >= BULK_UPLOAD_MAX_FILES:
+                rejected.append({"filename": name, "reason": "Too many files"})
+                continue
+            file_hash, file_path = file_store.save(file.file)
+            saved.append((name, str(file_path), file_hash))
+
+        elif lower_name.endswith('.zip'):
+            zip_path = file_store.temp_path(".zip")
+            with open(zip_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
+            try:
+                with zipfile.ZipFile(zip_path) as archive:
+                    for member in archive.infolist():
+                        member_name = Path(member.filename).name
+                        if member.is_dir() or member.filename.startswith("__MACOSX/"):
+                            continue
+                        if not member_name.lower().endswith('.pdf'):
+                            rejected.append({"filename": f"{name}/{member.filename}", "reason": "Not a PDF"})
+                            continue
+                        if len(saved) >= BULK_UPLOAD_MAX_FILES:
+                            rejected.append({"filename": f"{name}/{member.filename}", "reason": "Too many files"})
+                            continue
+
+                        with archive.open(member) as source:
+                            file_hash, file_path = file_store.save(source)
+                        saved.append((member_name, str(file_path), file_hash))
+            except zipfile.BadZipFile:
+                rejected.append({"filename": name, "reason": "Invalid ZIP archive"})
+            finally:
+                zip_path.unlink(missing_ok=True)
 
-        return {
-            "success": True,
-            "payslip_id": payslip.id,
-            "summary": {
-                "employee_name": parsed_data.get("employee", {}).get("name"),
-                "employee_id": parsed_data.get("employee", {}).get("id"),
-                "department": parsed_data.get("employee", {}).get("department"),
-                "period": f"{parsed_data.get('period', {}).get('month', '??')}/{parsed_data.get('period', {}).get('year', '????')}",
-                "net_salary": parsed_data.get("salary", {}).get("net"),
-                "final_payment": parsed_data.get("salary", {}).get("final_payment"),
-                "gross_salary": parsed_data.get("salary", {}).get("gross"),
-                "work_hours": parsed_data.get("work_hours"),
-                "deductions": parsed_data.get("deductions", {}),
-                "vacation_days": parsed_data.get("vacation_days")
-            },
-            "parsed_data": parsed_data,
-            "crew_result": str(crew_result)
-        }
+        else:
+            rejected.append({"filename": name, "reason": "Only PDF and ZIP files are supported"})
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"saved": saved, "rejected": rejected}
+
+
+@app.post("/api/upload/bulk", status_code=202)
+async def upload_payslips_bulk(
+    files: List[UploadFile] = File(...),
+    on_duplicate: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    העלאת הרבה תלושים בבקשה אחת - קבצי PDF ו/או ארכיון ZIP.
+    כל PDF נכנס לתור כעבודה נפרדת (ה-workers מפענחים במקביל);
+    ההתקדמות והתוצאה המצטברת ב-/api/upload/batches/{batch_id}
+    """
+    _check_duplicate_policy(on_duplicate)
+    uploaded = await run_in_threadpool(_save_bulk_upload, files)
+
+    if not uploaded["saved"]:
+        raise HTTPException(status_code=400, detail="No PDF files found in upload")
+
+    batch_id = uuid.uuid4().hex
+    jobs = await run_in_threadpool(enqueue_many, db, uploaded["saved"], batch_id, on_duplicate)
+
+    print(f"📥 Queued {len(jobs)} files as batch {batch_id}")
+
+    return {
+        "success": True,
+        "batch_id": batch_id,
+        "files": len(jobs),
+        "jobs": [{"job_id": job.id, "filename": job.filename} for job in jobs],
+        "rejected": uploaded["rejected"],
+        "status_url": f"/api/upload/batches/{batch_id}"
+    }
+
+
+@app.get("/api/upload/batches/{batch_id}")
+async def get_upload_batch(
+    batch_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    סטטוס מצטבר של העלאה מרובת קבצים - בסיום, result באותו מבנה כמו multiple_payslips
+    """
+    jobs = db.query(IngestionJob).filter(
+        IngestionJob.batch_id == batch_id
+    ).order_by(IngestionJob.id).all()
+
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Upload batch not found")
+
+    return batch_status(batch_id, jobs)
+
+
+@app.get("/api/upload/jobs/{job_id}")
+async def get_upload_job(
+    job_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    סטטוס עבודת העלאה - התקדמות לפי תלוש, ובסיום התוצאה (באותו מבנה כמו תשובת ההעלאה הסינכרונית)
+    """
+    job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+
+    return ingestion_status(job)
+
+
+# שדות התשובה של /api/payslips: שם -> (העמודות שצריך לטעון בשבילו, הערך מהתלוש).
+# שדות הסיכום נקראים מהעמודות ששוכפלו מ-parsed_data (payslip_columns) - בלי לטעון אותו
+PAYSLIP_LIST_FIELDS = {
+    "id": ((Payslip.id,), lambda p: p.id),
+    "filename": ((Payslip.filename,), lambda p: p.filename),
+    "upload_date": ((Payslip.upload_date,), lambda p: p.upload_date.isoformat()),
+    "employee_name": ((Payslip.employee_name,), lambda p: p.employee_name),
+    "employee_id": ((Payslip.employee_id,), lambda p: p.employee_id),
+    "department": ((Payslip.department,), lambda p: p.department),
+    "period": ((Payslip.month, Payslip.year), lambda p: f"{p.month}/{p.year}"),
+    "gross_salary": ((Payslip.gross_salary,), lambda p: p.gross_salary),
+    "net_salary": ((Payslip.net_salary,), lambda p: p.net_salary),
+    "final_payment": ((Payslip.final_payment,), lambda p: p.final_payment),
+    "work_hours": ((Payslip.work_hours,), lambda p: p.work_hours),
+    "vacation_days": ((Payslip.vacation_days,), lambda p: p.vacation_days),
+    "deductions": ((Payslip.parsed_data,), lambda p: p.parsed_data.get("deductions") if p.parsed_data else {}),
+    "is_valid": ((Payslip.is_valid,), lambda p: p.is_valid),
+    "has_anomalies": ((Payslip.has_anomalies,), lambda p: p.has_anomalies),
+    "issues_count": ((Payslip.validation_issues,), lambda p: len(p.validation_issues) if p.validation_issues else 0),
+    "anomalies_count": ((Payslip.anomalies,), lambda p: len(p.anomalies) if p.anomalies else 0),
+    "parsed_data": ((Payslip.parsed_data,), lambda p: p.parsed_data)  # כל הנתונים המנותחים - רק לפי בקשה
+}
+
+# ברירת המחדל של fields - בלי parsed_data ו-deductions (שנקראים מ-parsed_data המלא)
+PAYSLIP_SUMMARY_FIELDS = [name for name in PAYSLIP_LIST_FIELDS if name not in ("deductions", "parsed_data")]
+
+
+def _payslip_list_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(PAYSLIP_SUMMARY_FIELDS)
+
+    selected = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in selected if name not in PAYSLIP_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(PAYSLIP_LIST_FIELDS)}"
+        )
+    return selected
+
+
+def _period_bound(value: Optional[str], name: str) -> Optional[int]:
+    """
+    גבול טווח תקופות בפורמט MM/YYYY (כמו ה-label של /api/available-months) -> period_key
+    """
+    if not value:
+        return None
+    month, _, year = value.partition("/")
+    key = period_key(year, month)
+    if key is None:
+        raise HTTPException(status_code=400, detail=f"{name} must be MM/YYYY")
+    return key
 
 
 @app.get("/api/payslips")
 async def get_payslips(
-    skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    department: Optional[str] = None,
+    period_from: Optional[str] = None,
+    period_to: Optional[str] = None,
+    fields: Optional[str] = None,
+    skip: int = 0,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    קבל רשימת תלושים
+    קבל רשימת תלושים - מהחדש לישן (upload_date, id), בדפים
+
+    cursor: next_cursor מהתשובה הקודמת - הדף הבא (keyset, בלי OFFSET)
+    employee_id / department / period_from / period_to (MM/YYYY): מסננים
+    fields: השדות להחזרה, מופרדים בפסיק (למשל fields=id,employee_name,employee_id,period) -
+    רק העמודות שלהם נטענות מה-DB. ברירת מחדל - שדות הסיכום (PAYSLIP_SUMMARY_FIELDS);
+    parsed_data ו-deductions רק כשמבקשים אותם במפורש
+    skip: דפדוף ישן לפי OFFSET (כשאין cursor)
     """
-    payslips = db.query(Payslip).offset(skip).limit(limit).all()
+    from sqlalchemy import tuple_
+    from sqlalchemy.orm import load_only
+
+    selected = _payslip_list_fields(fields)
+    # upload_date ו-id תמיד נטענים - מהם נבנה ה-cursor
+    columns = dict.fromkeys(
+        [Payslip.id, Payslip.upload_date] +
+        [column for name in selected for column in PAYSLIP_LIST_FIELDS[name][0]]
+    )
+
+    filters = []
+    if employee_id:
+        filters.append(Payslip.employee_id == employee_id)
+    if department:
+        filters.append(Payslip.department == department)
+    period_start = _period_bound(period_from, "period_from")
+    period_end = _period_bound(period_to, "period_to")
+    if period_start is not None:
+        filters.append(Payslip.period_key >= period_start)
+    if period_end is not None:
+        filters.append(Payslip.period_key <= period_end)
+
+    query = select(Payslip).options(load_only(*columns, raiseload=True)).where(*filters).order_by(
+        Payslip.upload_date.desc(), Payslip.id.desc()
+    )
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(Payslip.upload_date, Payslip.id) < after)
+    elif skip:
+        query = query.offset(skip)
+
+    # שורה אחת מעבר לדף - כדי לדעת אם יש דף הבא
+    payslips = (await db.scalars(query.limit(limit + 1))).all()
+    has_more = len(payslips) > limit
+    payslips = payslips[:limit]
+
+    total = await payslip_counts.total(
+        db, (employee_id, department, period_start, period_end), filters
+    )
 
     return {
-        "total": db.query(Payslip).count(),
+        "total": total,
         "payslips": [
-            {
-                "id": p.id,
-                "filename": p.filename,
-                "upload_date": p.upload_date.isoformat(),
-                "employee_name": p.employee_name,
-                "employee_id": p.employee_id,
-                "department": p.department,
-                "period": f"{p.month}/{p.year}",
-                "gross_salary": p.parsed_data.get("salary", {}).get("gross") if p.parsed_data else p.gross_salary,
-                "net_salary": p.net_salary,
-                "final_payment": p.parsed_data.get("salary", {}).get("final_payment") if p.parsed_data else None,
-                "work_hours": p.parsed_data.get("work_hours") if p.parsed_data else None,
-                "vacation_days": p.parsed_data.get("vacation_days") if p.parsed_data else None,
-                "deductions": p.parsed_data.get("deductions") if p.parsed_data else {},
-                "is_valid": p.is_valid,
-                "has_anomalies": p.has_anomalies,
-                "issues_count": len(p.validation_issues) if p.validation_issues else 0,
-                "anomalies_count": len(p.anomalies) if p.anomalies else 0,
-                "parsed_data": p.parsed_data  # שלח את כל הנתונים המנותחים!
-            }
+            {name: PAYSLIP_LIST_FIELDS[name][1](p) for name in selected}
             for p in payslips
-        ]
+        ],
+        "next_cursor": encode_cursor(payslips[-1]) if has_more else None
     }
 
 
 @app.get("/api/payslips/{payslip_id}")
 async def get_payslip(
     payslip_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     קבל תלוש ספציפי
     """
-    payslip = db.query(Payslip).filter(Payslip.id == payslip_id).first()
+    from sqlalchemy.orm import undefer_group
+
+    # התלוש המלא - כולל report ו-raw_text (קבוצת "details")
+    payslip = await db.get(Payslip, payslip_id, options=[undefer_group("details")])
 
     if not payslip:
         raise HTTPException(status_code=404, detail="Payslip not found")
@@ -424,11 +475,17 @@ async def get_payslip_pdf(
     if not pdf_path.exists():
         raise HTTPException(status_code=404, detail="PDF file does not exist on disk")
 
+    headers = {}
+    if file_store.contains(payslip.file_path):
+        # הנתיב נגזר מהתוכן - הקובץ בנתיב הזה לעולם לא משתנה
+        headers["Cache-Control"] = "private, max-age=31536000, immutable"
+
     # Return PDF file for viewing in browser
     return FileResponse(
         path=str(pdf_path),
         media_type="application/pdf",
-        filename=payslip.filename
+        filename=payslip.filename,
+        headers=headers
     )
 
 
@@ -505,13 +562,17 @@ async def get_sidebar_stats(db: Session = Depends(get_db)):
     """
     סטטיסטיקות מפורטות לסיידבר - נתונים אמיתיים מה-DB
     """
-    from sqlalchemy import func, cast, Float
-    from datetime import datetime
+    from sqlalchemy import func
 
-    total = db.query(Payslip).count()
+    # כל הספירות בשאילתה אחת
+    total, valid, invalid, anomalies = db.query(
+        func.count(Payslip.id),
+        func.count(Payslip.id).filter(Payslip.is_valid == True),
+        func.count(Payslip.id).filter(Payslip.is_valid == False),
+        func.count(Payslip.id).filter(Payslip.has_anomalies == True)
+    ).one()
 
     # דיוק כללי (אחוז תלושים תקינים)
-    valid = db.query(Payslip).filter(Payslip.is_valid == True).count()
     accuracy = int((valid / total * 100)) if total > 0 else 0
 
     # נתוני סוכנים
@@ -519,23 +580,8 @@ async def get_sidebar_stats(db: Session = Depends(get_db)):
     parser_accuracy = accuracy  # דיוק בחילוץ שדות
     parser_speed = 340  # ms ממוצע
 
-    # Validator - בעיות
-    invalid = db.query(Payslip).filter(Payslip.is_valid == False).count()
-
-    # Analyzer - מגמות ואנומליות
-    anomalies = db.query(Payslip).filter(Payslip.has_anomalies == True).count()
-
-    # Count unique month/year combinations from parsed_data JSON
-    payslips = db.query(Payslip.parsed_data).filter(Payslip.is_valid == True).all()
-    months_set = set()
-    for ps in payslips:
-        parsed = ps.parsed_data or {}
-        period = parsed.get('period', {})
-        month = period.get('month')
-        year = period.get('year')
-        if month and year:
-            months_set.add((month, year))
-    unique_months = len(months_set)
+    # Analyzer - מגמות: מספר צירופי חודש/שנה שונים (COUNT על DISTINCT ב-SQL)
+    unique_months = _valid_periods_query(db).count()
 
     return {
         "learning_stats": {
@@ -568,13 +614,15 @@ async def get_sidebar_stats(db: Session = Depends(get_db)):
 
 
 @app.get("/api/kpis")
-async def get_kpis(db: Session = Depends(get_db)):
+async def get_kpis(db: AsyncSession = Depends(get_async_db)):
     """
     קבל את כל ה-KPIs השמורים
     """
     try:
         # Get all active KPIs
-        kpis = db.query(SavedKPI).filter(SavedKPI.active == True).order_by(SavedKPI.created_at.desc()).all()
+        kpis = (await db.scalars(
+            select(SavedKPI).where(SavedKPI.active == True).order_by(SavedKPI.created_at.desc())
+        )).all()
 
         return {
             "success": True,
@@ -604,7 +652,7 @@ async def get_kpis(db: Session = Depends(get_db)):
 
 
 @app.get("/api/analytics/trends")
-async def get_trends(db: Session = Depends(get_db)):
+async def get_trends(db: AsyncSession = Depends(get_async_db)):
     """
     ניתוח מגמות לפי חודשים - שכר, ניכויים, שעות עבודה
     """
@@ -612,9 +660,9 @@ async def get_trends(db: Session = Depends(get_db)):
     from collections import defaultdict
 
     # Get all payslips with parsed_data
-    payslips = db.query(Payslip).filter(
-        Payslip.parsed_data.isnot(None)
-    ).order_by(Payslip.year, Payslip.month).all()
+    payslips = (await db.scalars(
+        select(Payslip).where(Payslip.parsed_data.isnot(None))
+    )).all()
 
     if not payslips:
         return {"trends": [], "summary": {}}
@@ -629,30 +677,37 @@ async def get_trends(db: Session = Depends(get_db)):
     })
 
     for ps in payslips:
-        if ps.month and ps.year:
+        # תקופה תקינה - לפי period_key; חודש/שנה שלא מתפרשים נשארים גלויים בתווית הגולמית
+        if ps.period_key:
+            key = ps.period_key
+        elif ps.month and ps.year:
             key = f"{ps.month}/{ps.year}"
-            data = ps.parsed_data
+        else:
+            continue
 
-            if data and 'salary' in data:
-                if data['salary'].get('gross'):
-                    monthly_data[key]['gross_salaries'].append(float(data['salary']['gross']))
-                # Use final_payment instead of net
-                if data['salary'].get('final_payment'):
-                    monthly_data[key]['final_payments'].append(float(data['salary']['final_payment']))
+        data = ps.parsed_data
+
+        if data and 'salary' in data:
+            if data['salary'].get('gross'):
+                monthly_data[key]['gross_salaries'].append(float(data['salary']['gross']))
+            # Use final_payment instead of net
+            if data['salary'].get('final_payment'):
+                monthly_data[key]['final_payments'].append(float(data['salary']['final_payment']))
 
-            if data and data.get('work_hours'):
-                monthly_data[key]['work_hours'].append(float(data['work_hours']))
+        if data and data.get('work_hours'):
+            monthly_data[key]['work_hours'].append(float(data['work_hours']))
 
-            if data and 'deductions' in data and data['deductions'].get('total'):
-                monthly_data[key]['deductions'].append(float(data['deductions']['total']))
+        if data and 'deductions' in data and data['deductions'].get('total'):
+            monthly_data[key]['deductions'].append(float(data['deductions']['total']))
 
-            monthly_data[key]['count'] += 1
+        monthly_data[key]['count'] += 1
 
     # Calculate averages and trends
     trends = []
-    for period, data in sorted(monthly_data.items()):
+    # סדר כרונולוגי לפי period_key, ותקופות שלא התפרשו בסוף
+    for key, data in sorted(monthly_data.items(), key=lambda item: (isinstance(item[0], str), item[0])):
         trend = {
-            'period': period,
+            'period': _period_label(key) if isinstance(key, int) else key,
             'count': data['count'],
             'avg_gross': round(sum(data['gross_salaries']) / len(data['gross_salaries']), 2) if data['gross_salaries'] else 0,
             'avg_final_payment': round(sum(data['final_payments']) / len(data['final_payments']), 2) if data['final_payments'] else 0,
@@ -679,14 +734,14 @@ async def get_trends(db: Session = Depends(get_db)):
 
 
 @app.get("/api/analytics/by-department")
-async def get_department_analytics(db: Session = Depends(get_db)):
+async def get_department_analytics(db: AsyncSession = Depends(get_async_db)):
     """
     ניתוח לפי מחלקות - 5 ניתוחים מרכזיים
     """
     from collections import defaultdict
 
     # Get all valid payslips
-    payslips = db.query(Payslip).filter(Payslip.is_valid == True).all()
+    payslips = (await db.scalars(select(Payslip).where(Payslip.is_valid == True))).all()
 
     if not payslips:
         return {
@@ -826,6 +881,70 @@ class ChatRequest(BaseModel):
     context: Optional[Dict] = None
 
 
+@app.get("/api/analytics/pay-codes")
+async def get_pay_code_analytics(
+    code: Optional[str] = None,
+    month: Optional[str] = None,
+    year: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    סיכום רכיבי שכר לפי קוד תשלום, מחלקה וחודש (למשל פרמיה - קוד 020).
+    שאילתת aggregate אחת על payslip_line_items - בלי לטעון parsed_data
+    """
+    from sqlalchemy import func
+
+    query = select(
+        PayslipLineItem.code,
+        func.min(PayslipLineItem.description).label("description"),
+        Payslip.department,
+        PayslipLineItem.period_key,
+        func.count(PayslipLineItem.id).label("count"),
+        func.sum(PayslipLineItem.quantity).label("total_quantity"),
+        func.sum(PayslipLineItem.amount).label("total_amount")
+    ).join(Payslip, Payslip.id == PayslipLineItem.payslip_id)
+
+    if code:
+        query = query.where(PayslipLineItem.code == code)
+    # התקופה לפי period_key - "01" ו-"1" הם אותו חודש
+    if month or year:
+        key = period_key(year or 2000, month or 1)
+        if key is None:
+            raise HTTPException(status_code=400, detail="Invalid month/year")
+        if month and year:
+            query = query.where(PayslipLineItem.period_key == key)
+        elif year:
+            query = query.where(PayslipLineItem.period_key.between(key, key + 11))
+        else:
+            query = query.where(PayslipLineItem.period_key % 100 == key % 100)
+
+    rows = (await db.execute(query.group_by(
+        PayslipLineItem.code,
+        Payslip.department,
+        PayslipLineItem.period_key
+    ).order_by(
+        PayslipLineItem.period_key,
+        PayslipLineItem.code,
+        Payslip.department
+    ))).all()
+
+    return {
+        "success": True,
+        "rows": [
+            {
+                "code": row.code,
+                "description": row.description,
+                "department": row.department or 'לא מוגדר',
+                "period": _period_label(row.period_key) if row.period_key else None,
+                "count": row.count,
+                "total_quantity": round(row.total_quantity or 0, 2),
+                "total_amount": round(row.total_amount or 0, 2)
+            }
+            for row in rows
+        ]
+    }
+
+
 @app.post("/api/chat")
 async def chat_with_agent(request: ChatRequest, db: Session = Depends(get_db)):
     """
@@ -1374,7 +1493,7 @@ try:
     from src.learning.parser_improver import ParserImprover
 
     # Initialize learning components
-    field_learner = FieldLearner(SessionLocal())
+    field_learner = FieldLearner(SessionLocal(), pattern_cache=pdf_parser.learned_patterns)
     parser_improver = ParserImprover(pdf_parser, SessionLocal())
     print("✅ Learning modules initialized")
 except Exception as e:
@@ -1405,6 +1524,7 @@ async def submit_field_correction(
     original_value: str = Form(None),
     corrected_value: str = Form(...),
     context: str = Form(None),
+    background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db)
 ):
     """תיקון ערך שדה ולמידה מהתיקון"""
@@ -1420,6 +1540,10 @@ async def submit_field_correction(
                 payslip_id, field_name, corrected_value, original_value
             )
 
+            # החל את ה-pattern החדש גם על תלושים קיימים (ברקע)
+            if background_tasks is not None:
+                background_tasks.add_task(run_reextraction, pdf_parser)
+
         # Update payslip data
         if payslip.parsed_data:
             payslip.parsed_data[field_name] = corrected_value
@@ -1456,6 +1580,7 @@ async def add_new_field(
     field_name: str = Form(...),
     field_value: str = Form(...),
     field_category: str = Form(...),
+    background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db)
 ):
     """הוספת שדה חדש שלא זוהה ע״י המערכת"""
@@ -1473,6 +1598,10 @@ async def add_new_field(
                 payslip.raw_text
             )
 
+            # שדה שהפך לפעיל יחולץ גם מתלושים קיימים (ברקע)
+            if background_tasks is not None:
+                background_tasks.add_task(run_reextraction, pdf_parser)
+
         # Update payslip
         if not payslip.parsed_data:
             payslip.parsed_data = {}
@@ -1629,7 +1758,26 @@ async def get_learned_fields(db: Session = Depends(get_db)):
         return {"fields": []}
 
 
-# 6. Split Correction
+# 6. Re-extract learned fields on existing payslips
+@app.post("/api/learning/reextract")
+async def start_reextraction(background_tasks: BackgroundTasks):
+    """
+    הפעל ברקע חילוץ-מחדש של שדות שה-patterns שלהם השתנו, על כל התלושים השמורים
+    """
+    background_tasks.add_task(run_reextraction, pdf_parser)
+    return {"success": True, "message": "חילוץ מחדש של שדות שנלמדו התחיל ברקע"}
+
+
+@app.get("/api/learning/reextract/status")
+async def get_reextraction_status(db: Session = Depends(get_db)):
+    """
+    מצב עבודת החילוץ-מחדש האחרונה
+    """
+    job = db.query(ReextractionJob).order_by(ReextractionJob.id.desc()).first()
+    return job_status(job)
+
+
+# 7. Split Correction
 @app.post("/api/feedback/split-correction")
 async def correct_split(
     file_path: str = Form(...),
@@ -1687,11 +1835,11 @@ async def get_monthly_analysis(
         import json
 
         # Get all payslips for the selected month
+        key = period_key(year, month)
         payslips = db.query(Payslip).filter(
-            Payslip.month == month,
-            Payslip.year == year,
+            Payslip.period_key == key,
             Payslip.is_valid == True
-        ).all()
+        ).all() if key else []
 
         if not payslips:
             return {
@@ -1830,40 +1978,36 @@ async def get_monthly_analysis(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/available-months")
-async def get_available_months(db: Session = Depends(get_db)):
+def _valid_periods_query(db: Session):
     """
-    מחזיר רשימת חודשים זמינים לניתוח
+    התקופות (period_key) השונות של התלושים התקינים - לפי אינדקס ix_payslips_period_key
     """
-    try:
-        from sqlalchemy import func, distinct
+    return db.query(Payslip.period_key).filter(
+        Payslip.is_valid == True,
+        Payslip.period_key.isnot(None)
+    ).distinct()
 
-        # Query parsed_data->period->month and year from JSON
-        # Since we store period in parsed_data JSON field
-        payslips = db.query(Payslip.parsed_data).filter(Payslip.is_valid == True).all()
 
-        months_set = set()
-        for ps in payslips:
-            parsed = ps.parsed_data or {}
-            period = parsed.get('period', {})
-            month = period.get('month')
-            year = period.get('year')
+def _period_label(key: int) -> str:
+    return f"{key % 100:02d}/{key // 100}"
 
-            if month and year:
-                months_set.add((month, year))
 
-        # Convert to list of dicts
+@app.get("/api/available-months")
+async def get_available_months(db: Session = Depends(get_db)):
+    """
+    מחזיר רשימת חודשים זמינים לניתוח
+    """
+    try:
+        # DISTINCT period_key ב-SQL, מהחדש לישן
         months = []
-        for month, year in months_set:
+        for (key,) in _valid_periods_query(db).order_by(Payslip.period_key.desc()):
+            month, year = f"{key % 100:02d}", str(key // 100)
             months.append({
                 'month': month,
                 'year': year,
                 'label': f"{month}/{year}"
             })
 
-        # Sort by year and month
-        months = sorted(months, key=lambda x: (int(x['year']), int(x['month'])), reverse=True)
-
         return {
             "success": True,
             "months": months
@@ -1885,112 +2029,113 @@ async def get_monthly_analysis_direct(
     מחשב את הנתונים בצורה מדויקת מהמסד נתונים
     """
     try:
-        # Get all valid payslips for the month
-        payslips = db.query(Payslip).filter(
-            Payslip.is_valid == True
-        ).all()
+        from sqlalchemy import func, or_
 
-        # Filter by month/year from parsed_data
-        monthly_payslips = []
-        for ps in payslips:
-            parsed = ps.parsed_data or {}
-            period = parsed.get('period', {})
-            if period.get('month') == month and period.get('year') == year:
-                monthly_payslips.append(ps)
+        # סינון לפי התקופה ב-SQL (אינדקס ix_payslips_period_key) - רק התלושים של החודש נקראים
+        key = period_key(year, month)
+        period_filter = (
+            Payslip.is_valid == True,
+            Payslip.period_key == key
+        )
 
-        if not monthly_payslips:
+        total_payslips = db.query(func.count(Payslip.id)).filter(*period_filter).scalar() if key else 0
+
+        if not total_payslips:
             return {
                 "success": False,
                 "message": f"לא נמצאו תלושים לחודש {month}/{year}"
             }
 
-        # 1. Highest salary per department
-        dept_salaries = {}
-        for ps in monthly_payslips:
-            parsed = ps.parsed_data or {}
-            emp = parsed.get('employee', {})
-            salary_info = parsed.get('salary', {})
-
-            dept = emp.get('department', 'לא מוגדר')
-            emp_name = emp.get('name', 'לא ידוע')
-            emp_id = emp.get('id', ps.employee_id)
-            final_payment = salary_info.get('final_payment', 0) or 0
-
-            if dept not in dept_salaries or final_payment > dept_salaries[dept]['salary']:
-                dept_salaries[dept] = {
-                    'employee_name': emp_name,
-                    'employee_id': emp_id,
-                    'salary': final_payment
-                }
+        employee_name = func.coalesce(Payslip.parsed_data[("employee", "name")].as_string(), 'לא ידוע')
+        employee_id = func.coalesce(Payslip.parsed_data[("employee", "id")].as_string(), Payslip.employee_id)
+        final_payment = func.coalesce(FINAL_PAYMENT, 0)
+
+        # 1. Highest salary per department - ROW_NUMBER לכל מחלקה (בשוויון - התלוש הראשון)
+        department = func.coalesce(EMPLOYEE_DEPARTMENT, 'לא מוגדר')
+        ranked = db.query(
+            department.label("department"),
+            employee_name.label("employee_name"),
+            employee_id.label("employee_id"),
+            final_payment.label("salary"),
+            func.row_number().over(
+                partition_by=department,
+                order_by=(final_payment.desc(), Payslip.id)
+            ).label("rank")
+        ).filter(*period_filter).subquery()
+
+        dept_salaries = {
+            row.department: {
+                'employee_name': row.employee_name,
+                'employee_id': row.employee_id,
+                'salary': row.salary
+            }
+            for row in db.query(ranked).filter(ranked.c.rank == 1).order_by(ranked.c.department)
+        }
 
         # 2. Top 3 vacation days
-        vacation_list = []
-        for ps in monthly_payslips:
-            parsed = ps.parsed_data or {}
-            emp = parsed.get('employee', {})
-
-            emp_name = emp.get('name', 'לא ידוע')
-            emp_id = emp.get('id', ps.employee_id)
-            vacation_days = parsed.get('vacation_days', 0) or 0
-
-            vacation_list.append({
-                'employee_name': emp_name,
-                'employee_id': emp_id,
-                'vacation_days': float(vacation_days)
-            })
-
-        vacation_list.sort(key=lambda x: x['vacation_days'], reverse=True)
+        vacation_days = func.coalesce(Payslip.parsed_data["vacation_days"].as_float(), 0)
         top_vacation = [
-            {'rank': i+1, **v}
-            for i, v in enumerate(vacation_list[:3])
+            {
+                'rank': i+1,
+                'employee_name': row.employee_name,
+                'employee_id': row.employee_id,
+                'vacation_days': float(row.vacation_days)
+            }
+            for i, row in enumerate(db.query(
+                employee_name.label("employee_name"),
+                employee_id.label("employee_id"),
+                vacation_days.label("vacation_days")
+            ).filter(*period_filter).order_by(vacation_days.desc(), Payslip.id).limit(3))
         ]
 
-        # 3. Anomalies - grouped by category
+        # 3. Anomalies - grouped by category (רק תלושים שעוברים לפחות כלל אחד נקראים)
         anomalies_by_category = {
             'שכר לתשלום מעל 16,000': [],
             'נסיעות מעל 300': [],
             'פרמיה מעל 1,000': []
         }
 
-        for ps in monthly_payslips:
-            parsed = ps.parsed_data or {}
-            emp = parsed.get('employee', {})
-            salary_info = parsed.get('salary', {})
-            additional = parsed.get('additional_payments', {})
-
-            emp_name = emp.get('name', 'לא ידוע')
-            emp_id = emp.get('id', ps.employee_id)
-            final_payment = salary_info.get('final_payment', 0) or 0
-            premium = additional.get('premium')
-            travel = additional.get('travel_allowance')
-
+        premium = Payslip.parsed_data[("additional_payments", "premium")].as_float()
+        travel = Payslip.parsed_data[("additional_payments", "travel_allowance")].as_float()
+        anomaly_rows = db.query(
+            employee_name.label("employee_name"),
+            employee_id.label("employee_id"),
+            final_payment.label("final_payment"),
+            premium.label("premium"),
+            travel.label("travel")
+        ).filter(
+            *period_filter,
+            or_(final_payment > 16000, travel > 300, premium > 1000)
+        ).order_by(Payslip.id).all()
+
+        for row in anomaly_rows:
             # Check each rule separately
-            if final_payment > 16000:
+            if row.final_payment > 16000:
                 anomalies_by_category['שכר לתשלום מעל 16,000'].append({
-                    'employee_name': emp_name,
-                    'employee_id': emp_id,
-                    'value': final_payment
+                    'employee_name': row.employee_name,
+                    'employee_id': row.employee_id,
+                    'value': row.final_payment
                 })
 
-            if travel and travel > 300:
+            if row.travel and row.travel > 300:
                 anomalies_by_category['נסיעות מעל 300'].append({
-                    'employee_name': emp_name,
-                    'employee_id': emp_id,
-                    'value': travel
+                    'employee_name': row.employee_name,
+                    'employee_id': row.employee_id,
+                    'value': row.travel
                 })
 
-            if premium and premium > 1000:
+            if row.premium and row.premium > 1000:
                 anomalies_by_category['פרמיה מעל 1,000'].append({
-                    'employee_name': emp_name,
-                    'employee_id': emp_id,
-                    'value': premium
+                    'employee_name': row.employee_name,
+                    'employee_id': row.employee_id,
+                    'value': row.premium
                 })
 
         return {
             "success": True,
             "month": month,
             "year": year,
-            "total_payslips": len(monthly_payslips),
+            "total_payslips": total_payslips,
             "highest_salary_per_department": dept_salaries,
             "top_vacation_days": top_vacation,
             "anomalies_by_category": anomalies_by_category
@@ -2361,10 +2506,8 @@ async def generate_visualization(
         # Query database
         if group_by == "employee":
             # Group by employee
-            # Convert to strings since DB stores as VARCHAR
             payslips = db.query(Payslip).filter(
-                Payslip.month == str(month_num),
-                Payslip.year == str(year_num)
+                Payslip.period_key == period_key(year_num, month_num)
             ).all()
 
             # Extract data
@@ -0,0 +1,135 @@
+"""
+Parse Cache - מטמון תוצאות פענוח לפי hash של תוכן ה-PDF
+"""
+import hashlib
+import json
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+PARSE_CACHE_DIR = Path(os.getenv("PARSE_CACHE_DIR", "/app/data/parse_cache"))
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    חשב SHA-256 של קובץ בלי לטעון את כולו לזיכרון
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    מטמון דו-שלבי על הדיסק, לפי SHA-256 של ה-PDF:
+    1. שכבת הטקסט - הטקסט שחולץ מה-PDF אחרי תיקון RTL (דחוס ב-zlib)
+       וה-layout שנקרא מאותו מעבר על העמודים (טבלאות חשבון חופשה/מחלה)
+    2. תוצאת הפענוח - לפי hash + גרסת ה-parser/patterns
+
+    העלאה חוזרת של אותו קובץ מדלגת על כל הפענוח; שינוי patterns מדלג לפחות על pdfplumber.
+    """
+
+    def __init__(self, cache_dir: Path = PARSE_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.enabled = True
+
+        try:
+            (self.cache_dir / "text").mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / "layout").mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / "results").mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"[ParseCache] Cache disabled - cannot create {self.cache_dir}: {e}")
+            self.enabled = False
+
+    def _path(self, kind: str, pdf_hash: str, suffix: str) -> Path:
+        # תת-תיקייה לפי 2 התווים הראשונים - כדי שלא יהיו אלפי קבצים בתיקייה אחת
+        return self.cache_dir / kind / pdf_hash[:2] / f"{pdf_hash}{suffix}"
+
+    def _write(self, path: Path, data: bytes) -> None:
+        """
+        כתיבה אטומית - כמה תהליכים יכולים לכתוב את אותו מפתח במקביל
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def get_text(self, pdf_hash: str, version: str) -> Optional[str]:
+        """
+        קבל את שכבת הטקסט מהמטמון (או None)
+        """
+        if not self.enabled:
+            return None
+        path = self._path("text", pdf_hash, f".{version}.txt.z")
+        try:
+            return zlib.decompress(path.read_bytes()).decode('utf-8')
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[ParseCache] Could not read {path}: {e}")
+            return None
+
+    def put_text(self, pdf_hash: str, version: str, text: str) -> None:
+        """
+        שמור את שכבת הטקסט במטמון
+        """
+        if not self.enabled:
+            return
+        try:
+            self._write(
+                self._path("text", pdf_hash, f".{version}.txt.z"),
+                zlib.compress(text.encode('utf-8'))
+            )
+        except Exception as e:
+            print(f"[ParseCache] Could not store text for {pdf_hash}: {e}")
+
+    def _get_json(self, kind: str, pdf_hash: str, version: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        path = self._path(kind, pdf_hash, f".{version}.json")
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[ParseCache] Could not read {path}: {e}")
+            return None
+
+    def _put_json(self, kind: str, pdf_hash: str, version: str, data: Any) -> None:
+        if not self.enabled:
+            return
+        try:
+            self._write(
+                self._path(kind, pdf_hash, f".{version}.json"),
+                json.dumps(data, ensure_ascii=False).encode('utf-8')
+            )
+        except Exception as e:
+            print(f"[ParseCache] Could not store {kind} for {pdf_hash}: {e}")
+
+    def get_layout(self, pdf_hash: str, version: str) -> Optional[Dict[str, Any]]:
+        """
+        קבל נתוני layout (טבלאות חשבון חופשה/מחלה) מהמטמון (או None)
+        """
+        return self._get_json("layout", pdf_hash, version)
+
+    def put_layout(self, pdf_hash: str, version: str, layout: Dict[str, Any]) -> None:
+        """
+        שמור נתוני layout במטמון - חלק משכבת הטקסט
+        """
+        self._put_json("layout", pdf_hash, version, layout)
+
+    def get_result(self, pdf_hash: str, version: str) -> Optional[Dict[str, Any]]:
+        """
+        קבל תוצאת פענוח מהמטמון (או None).
+        מוחזר עותק חדש בכל קריאה - מותר לשנות אותו.
+        """
+        return self._get_json("results", pdf_hash, version)
+
+    def put_result(self, pdf_hash: str, version: str, result: Dict[str, Any]) -> None:
+        """
+        שמור תוצאת פענוח במטמון
+        """
+        self._put_json("results", pdf_hash, version, result)
@@ -0,0 +1,83 @@
+"""
+Payslip Pagination - דפדוף keyset ברשימת התלושים וספירת סה"כ שמורה במטמון
+
+הדפים ממוינים לפי (upload_date, id) מהחדש לישן, והדף הבא מתחיל אחרי התלוש האחרון בדף הקודם
+(WHERE (upload_date, id) < cursor) - בלי OFFSET, כך שדף עמוק עולה כמו הדף הראשון.
+ה-cursor אטום ללקוח: base64 של upload_date ו-id של התלוש האחרון.
+
+סה"כ התלושים לכל צירוף מסננים נשמר בזיכרון עם חותמת גרסה - MAX(updated_at) של payslips
+(חיפוש באינדקס). הוספה, החלפה של כפילות (מחיקה + הוספה) וחילוץ-מחדש (שיכול לשנות מחלקה
+או תקופה) מעדכנים את updated_at, כך שכל שינוי שמשפיע על הספירה מעלה את הגרסה -
+גם מ-worker בתהליך אחר. מחיקה בלבד (migration) נתפסת אחרי PAYSLIP_COUNT_TTL שניות.
+"""
+import base64
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.database import Payslip
+
+# לכל היותר כמה שניות להחזיק ספירה בלי לספור מחדש (גם אם הגרסה לא השתנתה)
+PAYSLIP_COUNT_TTL = float(os.getenv("PAYSLIP_COUNT_TTL", "300"))
+
+# מקסימום צירופי מסננים במטמון
+MAX_CACHED_COUNTS = 256
+
+
+def encode_cursor(payslip: Payslip) -> str:
+    """
+    cursor לדף שאחרי התלוש הזה
+    """
+    payload = json.dumps({"d": payslip.upload_date.isoformat(), "i": payslip.id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Returns:
+        (upload_date, id) של התלוש האחרון בדף הקודם
+
+    Raises:
+        ValueError: cursor לא תקין
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["d"]), int(payload["i"])
+    except (KeyError, TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class PayslipCountCache:
+    """
+    ספירת תלושים לכל צירוף מסננים - נספרת מחדש רק כשהגרסה (MAX(updated_at)) משתנה או אחרי ה-TTL
+    """
+
+    def __init__(self, ttl: float = PAYSLIP_COUNT_TTL):
+        self.ttl = ttl
+        self._counts: Dict[Any, Tuple[Optional[datetime], float, int]] = {}
+
+    async def total(self, db, key: Any, filters) -> int:
+        """
+        Args:
+            db: AsyncSession
+            key: מזהה צירוף המסננים (hashable)
+            filters: תנאי ה-WHERE של אותו צירוף
+        """
+        version = await db.scalar(select(func.max(Payslip.updated_at)))
+        cached = self._counts.get(key)
+        if cached is not None:
+            cached_version, counted_at, count = cached
+            if cached_version == version and time.monotonic() - counted_at < self.ttl:
+                return count
+
+        count = await db.scalar(select(func.count(Payslip.id)).where(*filters))
+
+        if len(self._counts) >= MAX_CACHED_COUNTS:
+            self._counts.clear()
+        self._counts[key] = (version, time.monotonic(), count)
+        return count
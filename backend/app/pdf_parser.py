@@ -3,8 +3,71 @@ PDF Parser - חילוץ טקסט מתלושי שכר בעברית
 """
 import pdfplumber
 import PyPDF2
+import hashlib
+import json
+import os
 import re
-from typing import Dict, Any, Optional
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from app.account_tables import SECTIONS, apply_account_tables, extract_account_tables
+from app.ai_agent.sick_days_extractor import SickDaysExtractor
+from app.field_extractor import FieldExtractor
+from app.learned_patterns import LearnedPatternCache
+from app.line_items import LINE_ITEM_FIELDS, line_item_fields, parse_line_items
+from app.parse_cache import ParseCache, file_sha256
+
+# גרסאות למטמון - יש להעלות כשמשנים את הלוגיקה (patterns נכללים בגרסה אוטומטית)
+TEXT_LAYER_VERSION = "4"  # חילוץ טקסט + תיקון RTL + טבלאות חשבון חופשה/מחלה
+PARSER_VERSION = "6"  # פיצול, חילוץ שדות ונרמול
+
+# מקור של שדה גולמי שלא נמצא ב-regex (נשמר ב-raw_data["_sources"]) - חילוץ-מחדש לא דורס אותם
+SOURCE_TABLE = "table"  # טבלאות חשבון חופשה/מחלה לפי מיקום המילים
+SOURCE_AI = "ai"  # ימי מחלה מ-SickDaysExtractor
+SOURCE_LINE_ITEMS = "line_items"  # טבלת התשלומים לפי קוד
+
+# "מספר העובד" פותח כל תלוש בקובץ עם מספר תלושים
+PAYSLIP_MARKER_PATTERN = re.compile(r'מספר העובד:\s*(\d{4,})')
+
+# מספר תהליכים לפענוח מקבילי (1 = ללא מקביליות)
+PARSER_WORKERS = int(os.getenv("PDF_PARSER_WORKERS", "1"))
+
+# מתחת לסף הזה עלות הפעלת התהליכים גבוהה מהחיסכון
+PARALLEL_MIN_PAYSLIPS = 8
+PARALLEL_MIN_PAGES = 16
+
+# בחילוץ מקבילי כל worker מקבל כמה טווחי עמודים קטנים - heartbeat אחרי כל טווח שמסתיים
+PAGE_CHUNKS_PER_WORKER = 4
+
+# נקרא במהלך הפענוח (אחרי כל עמוד / תלוש) - ה-worker מעדכן בו את ה-heartbeat של העבודה
+Heartbeat = Callable[[], None]
+
+# AI לימי מחלה - רק כשה-patterns לא מצאו ערך או מצאו ערך לא אמין
+AI_SICK_DAYS = os.getenv("PDF_PARSER_AI_SICK_DAYS", "1") == "1"
+
+# patterns של sick_days שהערך שלהם לא אמין (כללי מדי / יתרה קודמת במקום חדשה)
+LOW_CONFIDENCE_SICK_DAYS_PATTERNS = {
+    r"מחלה[:\s]+([\d.]+)",
+    r"חשבון מחלה.*?יתרה קודמת\s+([\d.]+)",
+}
+
+
+# חילוץ מדורג: קודם PyPDF2 (מהיר), ו-pdfplumber רק אם איכות הטקסט נמוכה (1/0)
+FAST_EXTRACT = os.getenv("PDF_PARSER_FAST_EXTRACT", "1") == "1"
+FAST_EXTRACT_MIN_SCORE = float(os.getenv("PDF_PARSER_FAST_EXTRACT_MIN_SCORE", "0.95"))
+
+# תוויות שחייבות להופיע בטקסט תקין של תלוש (אחרי תיקון RTL)
+TEXT_QUALITY_ANCHORS = ("מספר העובד", "לתשלום")
+MIN_HEBREW_RATIO = 0.3  # חלק האותיות העבריות מכלל התווים (בלי רווחים)
+
+_HEBREW_LETTER = re.compile(r'[א-ת]')
+_SPACES = re.compile(r'\s+')
+
+# סימנים לשורה עם עברית הפוכה: ":" צמוד למילה עברית, או לפחות 2 מילים עבריות
+_REVERSED_HEBREW_LINE = re.compile(r'[א-ת]\s*:|:[א-ת]|[א-ת][^א-ת]+[א-ת]')
+_HEBREW_CHAR = re.compile(r'[\u0590-\u05FF]')
 
 
 def fix_rtl_text(text: str) -> str:
@@ -14,64 +77,52 @@ def fix_rtl_text(text: str) -> str:
     הפונקציה מזהה מילים עבריות הפוכות ומהפכת אותן בחזרה.
     לדוגמה: "הלחמ ןובשח" -> "חשבון מחלה"
 
+    עובד שורה-שורה, כך שאפשר להפעיל אותו על כל עמוד בנפרד (התוצאה זהה).
+
     Args:
         text: הטקסט המקורי מה-PDF
 
     Returns:
         הטקסט המתוקן עם מילים עבריות בכיוון הנכון
     """
-    def is_hebrew_char(c: str) -> bool:
-        """בדוק אם התו הוא אות עברית"""
-        return '\u0590' <= c <= '\u05FF'
-
-    def has_reversed_hebrew(line: str) -> bool:
-        """
-        בדוק אם השורה מכילה טקסט עברי הפוך.
-        סימנים: : לפני או אחרי עברית, או מילים עבריות שמסתיימות באמצע המשפט
-        """
-        # אם יש : סמוך למילה עברית (לפני או אחרי)
-        if re.search(r'[א-ת]+\s*:', line) or re.search(r':[א-ת]+', line):
-            return True
-        # אם יש הרבה מילים עבריות (ככה נטפל ברוב המקרים)
-        hebrew_words = re.findall(r'[א-ת]+', line)
-        if len(hebrew_words) >= 2:
-            return True
-        return False
+    lines = text.split('\n')
+    is_reversed = _REVERSED_HEBREW_LINE.search
+    has_hebrew = _HEBREW_CHAR.search
 
-    def reverse_hebrew_words(line: str) -> str:
-        """
-        הפוך שורה עברית RTL לפורמט רגיל.
-        הגישה: הפוך את כל השורה (סדר מילים + כל מילה), אבל השאר מספרים ותאריכים כפי שהם.
-        """
-        words = line.split()
+    for i, line in enumerate(lines):
+        # אם יש טקסט עברי הפוך - הפוך את סדר המילים ואת המילים העבריות.
+        # מספרים, תאריכים, אנגלית - נשארים כמו שהם
+        if is_reversed(line):
+            lines[i] = ' '.join([
+                word[::-1] if has_hebrew(word) else word
+                for word in reversed(line.split())
+            ])
 
-        # הפוך את סדר המילים
-        words = words[::-1]
+    return '\n'.join(lines)
 
-        result = []
-        for word in words:
-            # אם המילה מכילה עברית - הפוך אותה
-            if any(is_hebrew_char(c) for c in word):
-                result.append(word[::-1])
-            else:
-                # מספרים, תאריכים, אנגלית - השאר כמו שזה
-                result.append(word)
 
-        return ' '.join(result)
+def score_text_layer(pages: List[str]) -> float:
+    """
+    ציון איכות (0-1) לטקסט שחולץ מ-PDF, אחרי תיקון RTL:
+    יחס אותיות עבריות, תוויות קבועות של תלוש, וחלק העמודים שיש בהם טקסט.
+    """
+    if not pages:
+        return 0.0
 
-    # עבור על כל שורה ותקן
-    lines = text.split('\n')
-    fixed_lines = []
+    text = "\n".join(pages)
+    chars = len(_SPACES.sub('', text))
+    if not chars:
+        return 0.0
 
-    for line in lines:
-        # אם יש טקסט עברי הפוך - תקן
-        if has_reversed_hebrew(line):
-            fixed_line = reverse_hebrew_words(line)
-            fixed_lines.append(fixed_line)
-        else:
-            fixed_lines.append(line)
+    hebrew_ratio = len(_HEBREW_LETTER.findall(text)) / chars
+    anchors_found = sum(1 for anchor in TEXT_QUALITY_ANCHORS if anchor in text)
+    pages_with_text = sum(1 for page in pages if page.strip()) / len(pages)
 
-    return '\n'.join(fixed_lines)
+    score = (
+        0.5 * min(1.0, hebrew_ratio / MIN_HEBREW_RATIO)
+        + 0.5 * anchors_found / len(TEXT_QUALITY_ANCHORS)
+    ) * pages_with_text
+    return round(score, 3)
 
 
 class HebrewPayslipPDFParser:
@@ -79,7 +130,27 @@ class HebrewPayslipPDFParser:
     Parser לתלושי שכר בעברית מ-PDF
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        cache: Optional[ParseCache] = None,
+        ai_sick_days: Optional[bool] = None,
+        learned_patterns: Optional[LearnedPatternCache] = None
+    ):
+        # מספר תהליכים לפענוח מקבילי של תלושים ועמודים בתוך PDF אחד
+        self.workers = workers if workers is not None else PARSER_WORKERS
+
+        # AI לימי מחלה (None = ללא AI)
+        if ai_sick_days is None:
+            ai_sick_days = AI_SICK_DAYS
+        self.sick_days_ai = SickDaysExtractor() if ai_sick_days else None
+
+        # מטמון לפי hash של ה-PDF (None = ללא מטמון)
+        self.cache = cache
+
+        # patterns שנלמדו מפידבק (None = רק ה-patterns המובנים)
+        self.learned_patterns = learned_patterns
+
         self.patterns = {
             "employee_name": [
                 # Pattern 1: שמות לועזיים (1-4 מילים באותיות גדולות) לפני "מחלקה:"
@@ -300,45 +371,237 @@ class HebrewPayslipPDFParser:
             ],
         }
 
-    def extract_text(self, pdf_path: str) -> str:
+        # קמפל את כל ה-patterns פעם אחת
+        self.refresh_patterns()
+
+    def refresh_patterns(self) -> None:
+        """
+        קמפל מחדש את self.patterns (+ ה-patterns שנלמדו) - יש לקרוא אחרי כל שינוי ב-patterns
+        """
+        self.active_patterns = self.patterns
+        self.learned_fields: Dict[str, str] = {}
+        self._learned_version = None
+        if self.learned_patterns is not None:
+            self._learned_version = self.learned_patterns.version
+            self.active_patterns = self.learned_patterns.merge(self.patterns)
+            self.learned_fields = self.learned_patterns.new_fields(self.patterns)
+
+            # טבלת התשלומים קודמת ל-patterns שנלמדו - הם רצים רק לתלוש בלי שורה עם הקוד
+            shadowed = sorted(set(self.learned_patterns.learned) & LINE_ITEM_FIELDS)
+            if shadowed:
+                print(f"[PDF DEBUG] Learned patterns for {shadowed} are used only when the payment table has no row for the field")
+
+        self.extractor = FieldExtractor(self.active_patterns)
+
+        # גרסת ה-parser למטמון התוצאות - משתנה אוטומטית כשה-patterns משתנים
+        patterns_digest = hashlib.sha256(
+            json.dumps(self.active_patterns, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+        self.version = f"{PARSER_VERSION}-{patterns_digest}"
+
+    def _check_learned_patterns(self) -> None:
+        """
+        קמפל מחדש רק אם גרסת ה-patterns שנלמדו השתנתה (בדיקה בזיכרון, בלי DB בכל פענוח)
+        """
+        if self.learned_patterns is None:
+            return
+        if self.learned_patterns.current_version() != self._learned_version:
+            self.refresh_patterns()
+            print(f"[PDF DEBUG] Learned patterns reloaded (parser {self.version})")
+
+    def extract_text(self, pdf_path: str, pdf_hash: Optional[str] = None) -> str:
         """
         חלץ טקסט מ-PDF ותקן בעיות RTL
         """
+        return self.extract_layers(pdf_path, pdf_hash)[0]
+
+    def extract_layers(self, pdf_path: str, pdf_hash: Optional[str] = None,
+                       heartbeat: Optional[Heartbeat] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        חלץ טקסט מ-PDF ותקן בעיות RTL, ובאותו מעבר על העמודים -
+        גם את טבלאות חשבון חופשה/מחלה לפי מיקום המילים.
+
+        Args:
+            heartbeat: נקרא אחרי כל עמוד (או טווח עמודים בחילוץ מקבילי)
+
+        Returns:
+            (טקסט, {מספר עובד: {"vacation_account": {...}, "sick_account": {...}}})
+        """
+        if self.cache is not None:
+            pdf_hash = pdf_hash or file_sha256(pdf_path)
+            cached_text = self.cache.get_text(pdf_hash, TEXT_LAYER_VERSION)
+            cached_accounts = self.cache.get_layout(pdf_hash, TEXT_LAYER_VERSION)
+            if cached_text is not None and cached_accounts is not None:
+                print(f"[PDF DEBUG] Text layer cache hit: {pdf_hash[:12]}")
+                return cached_text, cached_accounts
+
         text = ""
+        accounts = {}
+        fast_text = None
 
-        # נסה עם pdfplumber (טוב יותר לעברית)
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-        except Exception as e:
-            print(f"pdfplumber failed: {e}, trying PyPDF2...")
+        # תיקון RTL נעשה לכל עמוד
+        print("[PDF DEBUG] Applying RTL text fix...")
 
-            # נסה עם PyPDF2
+        # שלב 1: PyPDF2 - מהיר, ומספיק לרוב הקבצים עם שכבת טקסט נקייה
+        if FAST_EXTRACT:
+            fast_text = self._extract_with_pypdf2(pdf_path)
+            if fast_text is not None:
+                score = score_text_layer(fast_text)
+                if score >= FAST_EXTRACT_MIN_SCORE:
+                    print(f"[PDF DEBUG] PyPDF2 text layer accepted (score={score})")
+                    text = "".join(page + "\n" for page in fast_text if page)
+                    # לטבלאות החשבון צריך את מיקום המילים - pdfplumber רק לעמודים שיש בהם טבלה
+                    accounts = self._extract_account_layout(pdf_path, fast_text, heartbeat)
+                else:
+                    print(f"[PDF DEBUG] PyPDF2 score {score} too low, escalating to pdfplumber")
+
+        # שלב 2: pdfplumber (טוב יותר לעברית, וקורא גם את טבלאות החשבון)
+        if not text:
             try:
-                with open(pdf_path, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    for page in reader.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
+                text, accounts = self._extract_with_pdfplumber(pdf_path, heartbeat)
             except Exception as e:
-                print(f"PyPDF2 also failed: {e}")
+                print(f"pdfplumber failed: {e}, trying PyPDF2...")
 
-        # תקן טקסט הפוך לפני עיבוד
-        print("[PDF DEBUG] Applying RTL text fix...")
-        text = fix_rtl_text(text)
+                # נסה עם PyPDF2 (אם עוד לא נוסה)
+                if fast_text is None:
+                    fast_text = self._extract_with_pypdf2(pdf_path) or []
+                text = "".join(page + "\n" for page in fast_text if page)
 
-        return text
+        if self.cache is not None and text:
+            self.cache.put_text(pdf_hash, TEXT_LAYER_VERSION, text)
+            self.cache.put_layout(pdf_hash, TEXT_LAYER_VERSION, accounts)
 
-    def parse_pdf(self, pdf_path: str) -> Dict[str, Any]:
+        return text, accounts
+
+    def _extract_with_pypdf2(self, pdf_path: str) -> Optional[List[str]]:
+        """
+        חלץ טקסט עם PyPDF2 - רשימת עמודים אחרי תיקון RTL (או None אם נכשל)
+        """
+        try:
+            with open(pdf_path, 'rb') as file:
+                reader = PyPDF2.PdfReader(file)
+                return [fix_rtl_text(page.extract_text() or "") for page in reader.pages]
+        except Exception as e:
+            print(f"PyPDF2 failed: {e}")
+            return None
+
+    def _extract_account_layout(self, pdf_path: str, pages_text: List[str],
+                                heartbeat: Optional[Heartbeat] = None) -> Dict[str, Any]:
+        """
+        טבלאות חשבון חופשה/מחלה לטקסט שחולץ עם PyPDF2: מספרי העובדים מהטקסט של כל עמוד,
+        והטבלאות מ-pdfplumber (extract_words) - רק בעמודים שמופיעה בהם כותרת של טבלה
+        """
+        pages = [
+            {"employee_ids": PAYSLIP_MARKER_PATTERN.findall(page_text or ""), "accounts": {}}
+            for page_text in pages_text
+        ]
+        wanted = [
+            index for index, page_text in enumerate(pages_text)
+            if page_text and any(section in page_text for section in SECTIONS)
+        ]
+        if not wanted:
+            return {}
+
+        try:
+            with pdfplumber.open(pdf_path, pages=[index + 1 for index in wanted]) as pdf:
+                for index, page in zip(wanted, pdf.pages):
+                    pages[index]["accounts"] = extract_account_tables(page.extract_words())
+                    if heartbeat is not None:
+                        heartbeat()
+        except Exception as e:
+            print(f"[PDF DEBUG] pdfplumber layout pass failed: {e}")
+            return {}
+
+        return _accounts_by_employee(pages)
+
+    def _extract_with_pdfplumber(self, pdf_path: str,
+                                 heartbeat: Optional[Heartbeat] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        חלץ טקסט וטבלאות עם pdfplumber - בקבצים גדולים טווחי עמודים מחולקים בין תהליכים
+        """
+        if self.workers <= 1:
+            text, pages = _extract_page_range(pdf_path, heartbeat=heartbeat)
+            return text, _accounts_by_employee(pages)
+
+        with pdfplumber.open(pdf_path) as pdf:
+            page_count = len(pdf.pages)
+
+        if page_count < PARALLEL_MIN_PAGES:
+            text, pages = _extract_page_range(pdf_path, heartbeat=heartbeat)
+            return text, _accounts_by_employee(pages)
+
+        chunk = -(-page_count // (self.workers * PAGE_CHUNKS_PER_WORKER))  # עיגול כלפי מעלה
+        starts = list(range(0, page_count, chunk))
+        ends = [min(start + chunk, page_count) for start in starts]
+
+        print(f"[PDF DEBUG] Extracting {page_count} pages in {len(starts)} chunks with {self.workers} workers")
+        parts = []
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(starts))) as executor:
+            for part in executor.map(_extract_page_range, [pdf_path] * len(starts), starts, ends):
+                parts.append(part)
+                if heartbeat is not None:
+                    heartbeat()
+
+        text = "".join(part_text for part_text, _ in parts)
+        pages = [page for _, part_pages in parts for page in part_pages]
+        return text, _accounts_by_employee(pages)
+
+    def _parse_segments(self, segments: Iterable[str], count: int,
+                        heartbeat: Optional[Heartbeat] = None) -> Iterator[Tuple[Dict[str, Any], Optional[str]]]:
+        """
+        חלץ שדות מהתלושים - במקביל בתהליכים נפרדים אם יש הרבה תלושים.
+        התוצאות מוחזרות תמיד בסדר המקורי של התלושים בקובץ.
+        """
+        heartbeat = heartbeat or (lambda: None)
+
+        if self.workers <= 1 or count < PARALLEL_MIN_PAYSLIPS:
+            for segment in segments:
+                yield self._extract_fields(segment)
+                heartbeat()
+            return
+
+        print(f"[PDF DEBUG] Parsing {count} payslips with {self.workers} workers")
+        segments = list(segments)
+        chunksize = max(1, count // (self.workers * 4))
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_parse_worker,
+                initargs=(self.active_patterns,)
+            ) as executor:
+                results = []
+                for result in executor.map(_parse_segment, segments, chunksize=chunksize):
+                    results.append(result)
+                    heartbeat()
+        except Exception as e:
+            print(f"[PDF DEBUG] Parallel parsing failed: {e}, parsing serially...")
+            results = []
+            for segment in segments:
+                results.append(self._extract_fields(segment))
+                heartbeat()
+
+        yield from results
+
+    def parse_pdf(self, pdf_path: str, pdf_hash: Optional[str] = None,
+                  heartbeat: Optional[Heartbeat] = None) -> Dict[str, Any]:
         """
         נתח PDF של תלוש שכר - תומך במספר תלושים בקובץ אחד
+
+        Args:
+            pdf_hash: SHA-256 של הקובץ אם כבר ידוע (מאגר הקבצים) - חוסך קריאה נוספת של הקובץ
+            heartbeat: נקרא אחרי כל עמוד ותלוש שפוענחו - סימן חיים לפענוח ארוך
         """
+        self._check_learned_patterns()
+
+        if self.cache is not None:
+            pdf_hash = pdf_hash or file_sha256(pdf_path)
+            cached_result = self.cache.get_result(pdf_hash, self.version)
+            if cached_result is not None:
+                print(f"[PDF DEBUG] Parse result cache hit: {pdf_hash[:12]} (parser {self.version})")
+                return cached_result
+
         # חלץ טקסט
-        text = self.extract_text(pdf_path)
+        text, accounts = self.extract_layers(pdf_path, pdf_hash, heartbeat)
 
         if not text:
             return {
@@ -346,29 +609,65 @@ class HebrewPayslipPDFParser:
                 "raw_text": ""
             }
 
+        ai_failures = self.sick_days_ai.failures if self.sick_days_ai is not None else 0
+        result = self.parse_extracted_text(text, accounts, heartbeat)
+
+        # ימי מחלה שה-AI לא החזיר (אין API key / שגיאה) - לא שומרים, שהעלאה חוזרת תנסה שוב
+        ai_failed = self.sick_days_ai is not None and self.sick_days_ai.failures != ai_failures
+        if ai_failed:
+            print("[PDF DEBUG] AI sick-days lookup failed - parse result not cached")
+        elif self.cache is not None:
+            self.cache.put_result(pdf_hash, self.version, result)
+
+        return result
+
+    def parse_extracted_text(self, text: str, accounts: Optional[Dict[str, Any]] = None,
+                             heartbeat: Optional[Heartbeat] = None) -> Dict[str, Any]:
+        """
+        נתח טקסט שכבר חולץ מ-PDF (אחרי תיקון RTL) - תומך במספר תלושים
+
+        Args:
+            text: הטקסט המלא
+            accounts: טבלאות חשבון חופשה/מחלה לפי מספר עובד (מ-extract_layers)
+            heartbeat: נקרא אחרי כל תלוש
+        """
+        self._check_learned_patterns()
+
         # Debug: הדפס חלק מהטקסט שחולץ
         print(f"[PDF DEBUG] Extracted text length: {len(text)}")
 
         # בדוק אם יש מספר תלושים
-        payslips = self._split_payslips(text)
+        markers = self._find_payslip_markers(text)
 
-        if len(payslips) > 1:
-            print(f"[PDF DEBUG] Found {len(payslips)} payslips in PDF")
+        if len(markers) > 1:
+            print(f"[PDF DEBUG] Found {len(markers)} payslips in PDF")
 
-            # נתח כל תלוש בנפרד
-            parsed_payslips = []
-            for i, payslip_text in enumerate(payslips, 1):
-                print(f"[PDF DEBUG] Parsing payslip {i}/{len(payslips)}")
-                parsed_data = self._parse_text(payslip_text)
+            # נתח כל תלוש בנפרד - התלושים נחתכים תוך כדי מעבר
+            extracted = []
+            needs_ai = []
+            segments = self._iter_payslips(text, markers)
+            for i, (result, sick_days_source) in enumerate(self._parse_segments(segments, len(markers), heartbeat), 1):
+                print(f"[PDF DEBUG] Parsed payslip {i}/{len(markers)}")
+                # ההחלטה על AI בתהליך הראשי - בתהליכי העבודה אין SickDaysExtractor
+                ai_needed = self._ai_sick_days_needed(result, sick_days_source)
 
                 # Debug
-                emp_name = parsed_data.get('employee', {}).get('name')
-                emp_id = parsed_data.get('employee', {}).get('id')
-                net = parsed_data.get('salary', {}).get('net')
+                emp_name = result.get('employee_name')
+                emp_id = result.get('employee_id')
+                net = result.get('net_salary')
                 print(f"  - Employee: {emp_name}, ID: {emp_id}, Net: {net}")
 
                 if emp_id:  # רק אם זוהה מספר עובד
-                    parsed_payslips.append(parsed_data)
+                    if self._apply_account_tables(result, accounts):
+                        ai_needed = False
+                    extracted.append(result)
+                    if ai_needed:
+                        needs_ai.append(result)
+
+            # ימי מחלה עם AI - בקשה אחת לכל קבוצת תלושים
+            self._apply_ai_sick_days(needs_ai)
+
+            parsed_payslips = [self._normalize_to_system_format(result) for result in extracted]
 
             return {
                 "multiple_payslips": True,
@@ -379,7 +678,7 @@ class HebrewPayslipPDFParser:
         else:
             # תלוש יחיד
             print(f"[PDF DEBUG] Single payslip detected")
-            parsed_data = self._parse_text(text)
+            parsed_data = self._parse_text(text, accounts)
             parsed_data["raw_text"] = text[:1000]  # רק חלק מהטקסט
 
             # Debug: הדפס מה נמצא
@@ -395,92 +694,127 @@ class HebrewPayslipPDFParser:
         פצל טקסט למספר תלושים לפי מספר עובד.
         צריך לוודא שכל תלוש כולל גם את כל הקונטקסט - כולל שורות לפני "מספר העובד"
         """
-        import re
+        markers = self._find_payslip_markers(text)
 
-        # חפש את כל המקומות שבהם מופיע "מספר העובד"
-        # הטקסט כבר תוקן ב-RTL אז נחפש בסדר רגיל
-        pattern = r'מספר העובד:\s*(\d{4,})'
+        if len(markers) <= 1:
+            return [text]  # תלוש יחיד או אין תלושים
 
-        matches = list(re.finditer(pattern, text))
+        return list(self._iter_payslips(text, markers))
 
-        if len(matches) <= 1:
-            return [text]  # תלוש יחיד או אין תלושים
+    def _find_payslip_markers(self, text: str) -> list:
+        """
+        מצא את כל המקומות שבהם מופיע "מספר העובד" - כל אחד מתחיל תלוש חדש
+        """
+        # הטקסט כבר תוקן ב-RTL אז נחפש בסדר רגיל
+        return list(PAYSLIP_MARKER_PATTERN.finditer(text))
+
+    def _iter_payslips(self, text: str, markers: list) -> Iterator[str]:
+        """
+        מחזיר את התלושים אחד אחד (lazy) - זמן ריצה לינארי באורך הטקסט.
 
-        print(f"[PDF DEBUG] Found {len(matches)} employee IDs: {[m.group(1) for m in matches]}")
+        מיקומי תחילת השורות מחושבים פעם אחת, ומספר השורה של כל "מספר העובד"
+        נמצא בחיפוש בינארי (במקום text[:pos].count('\n') לכל התאמה).
+        """
+        print(f"[PDF DEBUG] Found {len(markers)} employee IDs: {[m.group(1) for m in markers]}")
 
         # פצל את הטקסט לפי המיקומים של מספרי העובדים
         # אבל נתחיל מהשורה "פרטים אישיים" שלפני כל תלוש
         lines = text.split('\n')
-        payslips = []
 
-        for i, match in enumerate(matches):
-            # מצא את מיקום ההתחלה של התלוש הזה בשורות
-            match_pos = match.start()
+        # line_starts[k] = המיקום שבו מתחילה שורה k+1 בטקסט
+        line_starts = list(accumulate(len(line) + 1 for line in lines[:-1]))
 
-            # מצא את השורה שמכילה "מספר העובד"
-            current_text = text[:match_pos]
-            current_line_num = current_text.count('\n')
+        # מספר השורה = כמה שורות התחילו עד המיקום
+        line_numbers = [bisect_right(line_starts, m.start()) for m in markers]
 
+        for i, current_line_num in enumerate(line_numbers):
             # התחל מ-5 שורות לפני (כדי לתפוס "פרטים אישיים" ושורות קודמות)
             start_line = max(0, current_line_num - 5)
 
             # הסוף הוא 5 שורות לפני התלוש הבא, או סוף הקובץ
-            if i + 1 < len(matches):
-                next_match_pos = matches[i + 1].start()
-                next_text = text[:next_match_pos]
-                next_line_num = next_text.count('\n')
-                end_line = max(0, next_line_num - 5)
+            if i + 1 < len(line_numbers):
+                end_line = max(0, line_numbers[i + 1] - 5)
             else:
                 end_line = len(lines)
 
-            payslip_lines = lines[start_line:end_line]
-            payslip_text = '\n'.join(payslip_lines)
-            payslips.append(payslip_text)
+            yield '\n'.join(lines[start_line:end_line])
 
-        return payslips
-
-    def _parse_text(self, text: str) -> Dict[str, Any]:
+    def _parse_text(self, text: str, accounts: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         נתח טקסט של תלוש - משתמש גם בסוכן AI לחילוץ נתונים מורכבים
         """
-        result = {}
-
-        # חלץ כל שדה עם patterns רגילים
-        for field, patterns in self.patterns.items():
-            value = self._extract_field(text, patterns, field_name=field)
-            if value:
-                result[field] = value
-                # DEBUG: הדפס את הערך שנמצא
-                if field == "gross_salary":
-                    print(f"[DEBUG] Found gross_salary: {value}")
+        result, sick_days_source = self._extract_fields(text)
+        ai_needed = self._ai_sick_days_needed(result, sick_days_source)
 
-        # תמיד השתמש ב-AI לימי מחלה כי הפורמט מורכב
-        # גם אם נמצא משהו עם patterns - נדרוס עם AI
-        sick_days = self._extract_sick_days_with_ai(text)
-        if sick_days:
-            result['sick_days'] = str(sick_days)
-            print(f"[AI-Parser] Found sick_days with AI: {sick_days}")
+        if self._apply_account_tables(result, accounts):
+            ai_needed = False
 
-        # שמור את הטקסט המקורי המלא - Analyzer צריך אותו!
-        result['_original_text'] = text
+        if ai_needed:
+            self._apply_ai_sick_days([result])
 
         # נרמל לפורמט של המערכת
         normalized = self._normalize_to_system_format(result)
 
         return normalized
 
-    def _extract_field(self, text: str, patterns: list, field_name: str = None) -> Optional[str]:
+    def _extract_fields(self, text: str) -> Tuple[Dict[str, Any], Optional[str]]:
         """
-        חלץ שדה לפי רשימת patterns
+        חלץ את השדות הגולמיים של תלוש (ללא AI).
+        מחזיר גם את ה-pattern שמצא את ימי המחלה (None אם לא נמצאו) - לפיו מחליטים על AI.
         """
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            if match:
-                value = match.group(1).strip()
-                # נקה רווחים מיותרים
-                value = re.sub(r'\s+', ' ', value)
-                return value
-        return None
+        # טבלת התשלומים במעבר אחד - שדות לפי קוד (004, 063, 078...) לא צריכים regex
+        line_items = parse_line_items(text)
+        item_fields = line_item_fields(line_items)
+
+        # חלץ את שאר השדות עם ה-patterns המקומפלים - שדה שנמצא בטבלה לא נבדק, גם לא ב-patterns שנלמדו
+        sources = {}
+        result = self.extractor.extract(text, sources, skip=set(item_fields))
+        result.update(item_fields)
+        result['line_items'] = line_items
+        result['_sources'] = {field: SOURCE_LINE_ITEMS for field in item_fields}
+        if "gross_salary" in result:
+            print(f"[DEBUG] Found gross_salary: {result['gross_salary']}")
+
+        # שמור את הטקסט המקורי המלא - Analyzer צריך אותו!
+        result['_original_text'] = text
+
+        return result, sources.get("sick_days")
+
+    def _ai_sick_days_needed(self, result: Dict[str, Any], sick_days_source: Optional[str]) -> bool:
+        """
+        AI לימי מחלה רק אם ה-patterns לא מצאו ערך אמין
+        """
+        return self.sick_days_ai is not None and (
+            "sick_days" not in result
+            or sick_days_source in LOW_CONFIDENCE_SICK_DAYS_PATTERNS
+        )
+
+    def _apply_account_tables(self, result: Dict[str, Any], accounts: Optional[Dict[str, Any]]) -> bool:
+        """
+        החלף את ערכי חשבון חופשה/מחלה בערכים מהטבלאות (אם נקראו מה-PDF).
+        מחזיר True אם ימי המחלה נמצאו בטבלה - ואז אין צורך ב-AI.
+        """
+        tables = (accounts or {}).get(result.get('employee_id'))
+        if not tables:
+            return False
+
+        for field in apply_account_tables(result, tables):
+            result['_sources'][field] = SOURCE_TABLE
+        return "current_balance" in tables.get("sick_account", {})
+
+    def _apply_ai_sick_days(self, results: List[Dict[str, Any]]) -> None:
+        """
+        השלם ימי מחלה עם AI לרשימת תלושים (שדות גולמיים) - בקבוצות ועם מטמון
+        """
+        if not results or self.sick_days_ai is None:
+            return
+
+        values = self.sick_days_ai.extract([result['_original_text'] for result in results])
+        for result, sick_days in zip(results, values):
+            if sick_days:
+                result['sick_days'] = str(sick_days)
+                result['_sources']['sick_days'] = SOURCE_AI
+                print(f"[AI-Parser] Found sick_days with AI: {sick_days}")
 
     def _to_float(self, value: Optional[str]) -> Optional[float]:
         """
@@ -499,7 +833,9 @@ class HebrewPayslipPDFParser:
         """
         המר לפורמט של המערכת - כולל את כל השדות שחולצו
         """
-        return {
+        line_items = data.pop("line_items", [])
+
+        normalized = {
             "employee": {
                 "name": data.get("employee_name"),
                 "id": data.get("employee_id"),
@@ -583,77 +919,107 @@ class HebrewPayslipPDFParser:
                 "gift_value": self._to_float(data.get("gift_value")),
                 "severance_extra": self._to_float(data.get("severance_extra"))
             },
+            # כל שורות טבלת התשלומים (קוד, תיאור, כמות, תעריף, סכום)
+            "line_items": line_items,
             "hours_breakdown": {
                 "regular_hours": self._to_float(data.get("regular_hours")),
                 # Parser לא מסכם - רק מחזיר null
-                # Analyzer יחלץ ויסכם את כל שעות 150% ו-125% מ-raw_data
+                # Analyzer יסכם את השעות לפי תעריף (100/125/150/175/200%, שבת) מ-line_items
                 "hours_150": None,
                 "hours_125": None
             },
             "raw_data": data  # כל הנתונים הגולמיים כולל _original_text
         }
 
-    def _extract_sick_days_with_ai(self, text: str) -> Optional[float]:
-        """
-        משתמש בסוכן AI לחילוץ ימי מחלה מהתלוש
-        """
-        try:
-            import os
-            from anthropic import Anthropic
+        # שדות שנלמדו מפידבק - לפי הקטגוריה שלהם (כמו /api/feedback/new-field)
+        for field, category in self.learned_fields.items():
+            if data.get(field) is not None:
+                section = normalized.get(category)
+                if not isinstance(section, dict):
+                    section = normalized[category] = {}
+                section.setdefault(field, data[field])
+
+        return normalized
+
 
-            # Check if API key exists
-            api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not api_key:
-                print("[AI-Parser] No ANTHROPIC_API_KEY found, skipping AI extraction")
-                return None
+# ===== פונקציות לתהליכי העבודה (חייבות להיות ברמת המודול כדי לעבור pickle) =====
 
-            client = Anthropic(api_key=api_key)
+_worker_parser: Optional[HebrewPayslipPDFParser] = None
 
-            # בנה prompt לסוכן
-            prompt = f"""אתה parser חכם לתלושי שכר בעברית.
 
-קרא את התלוש הבא ומצא את הערך של "ימי מחלה" או "יתרה חדשה" בסעיף "חשבון מחלה".
+def _init_parse_worker(patterns: Dict[str, List[str]]) -> None:
+    """
+    אתחול תהליך עבודה - parser אחד לכל תהליך, עם אותם patterns של התהליך הראשי
+    (כולל patterns שנלמדו בזמן ריצה)
+    """
+    global _worker_parser
+    _worker_parser = HebrewPayslipPDFParser(workers=1, ai_sick_days=False)
+    _worker_parser.patterns = patterns
+    _worker_parser.refresh_patterns()
 
-חפש בסעיף "חשבון מחלה" את השדות הבאים:
-1. יתרה קודמת
-2. צבירה (ח.ז.צ)
-3. יתרה חדשה
 
-המספר הכי רלוונטי הוא "יתרה חדשה".
+def _parse_segment(text: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    חלץ שדות של תלוש בודד בתהליך עבודה (ה-AI רץ אחר כך בתהליך הראשי, בקבוצות)
+    """
+    return _worker_parser._extract_fields(text)
+
 
-טקסט התלוש:
-{text[:2000]}
+def _extract_page_range(pdf_path: str, start: int = 0, end: Optional[int] = None,
+                        heartbeat: Optional[Heartbeat] = None) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    חלץ טקסט (אחרי תיקון RTL) מעמודים [start, end) עם pdfplumber (ברירת מחדל - כל הקובץ).
+    לכל עמוד מוחזרים גם מספרי העובדים שבו וטבלאות חשבון חופשה/מחלה.
+    heartbeat (רק בתהליך הראשי) נקרא אחרי כל עמוד.
+    """
+    page_numbers = list(range(start + 1, end + 1)) if end is not None else None
 
-תשובה: החזר **רק** את המספר של ימי המחלה (יתרה חדשה), בלי שום טקסט נוסף.
-אם לא מצאת - החזר "null".
+    text = ""
+    pages = []
+    with pdfplumber.open(pdf_path, pages=page_numbers) as pdf:
+        for page in pdf.pages:
+            if heartbeat is not None:
+                heartbeat()
 
-דוגמה: אם יתרת ימי המחלה החדשה היא 75.52, החזר רק: 75.52"""
+            page_text = page.extract_text()
+            if not page_text:
+                pages.append({"employee_ids": [], "accounts": {}})
+                continue
 
-            # Call Claude
-            response = client.messages.create(
-                model="claude-3-5-haiku-20241022",  # Haiku 3.5 - fast and cheap for parsing
-                max_tokens=50,
-                temperature=0,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
+            # תיקון RTL עובד שורה-שורה, אז אפשר להפעיל אותו על כל עמוד בנפרד
+            page_text = fix_rtl_text(page_text)
+            text += page_text + "\n"
 
-            # Parse response
-            answer = response.content[0].text.strip()
-            print(f"[AI-Parser] Claude response for sick_days: {answer}")
+            accounts = {}
+            if any(section in page_text for section in SECTIONS):
+                accounts = extract_account_tables(page.extract_words())
 
-            # Try to convert to float
-            if answer and answer.lower() not in ['null', 'none', 'לא נמצא']:
-                try:
-                    return float(answer.replace(',', ''))
-                except ValueError:
-                    print(f"[AI-Parser] Could not convert '{answer}' to float")
-                    return None
+            pages.append({
+                "employee_ids": PAYSLIP_MARKER_PATTERN.findall(page_text),
+                "accounts": accounts
+            })
+    return text, pages
 
-            return None
 
-        except Exception as e:
-            print(f"[AI-Parser] Error extracting sick_days with AI: {e}")
-            return None
+def _accounts_by_employee(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    שייך את טבלאות החשבון של כל עמוד למספר העובד שלו.
+    עמוד בלי מספר עובד הוא המשך של התלוש מהעמוד הקודם;
+    עמוד עם כמה עובדים לא משויך (אי אפשר לדעת איזו טבלה של מי).
+    """
+    accounts = {}
+    employee_id = None
+
+    for page in pages:
+        ids = set(page["employee_ids"])
+        if len(ids) == 1:
+            employee_id = ids.pop()
+        elif len(ids) > 1:
+            employee_id = None
+
+        if employee_id and page["accounts"]:
+            employee_accounts = accounts.setdefault(employee_id, {})
+            for section, rows in page["accounts"].items():
+                employee_accounts.setdefault(section, {}).update(rows)
+
+    return accounts
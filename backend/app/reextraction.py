@@ -0,0 +1,283 @@
+"""
+Re-extraction - חילוץ מחדש של שדות שנלמדו על תלושים קיימים
+
+כש-FieldLearner / ParserImprover שומרים patterns חדשים, רק השדות שה-patterns שלהם
+השתנו מאז העבודה האחרונה מחולצים מחדש - מהטקסט השמור (Payslip.original_text),
+בקבוצות, בלי להריץ שוב את parse_pdf. רק המפתחות של השדות האלה מתעדכנים ב-parsed_data,
+ואחריהם העמודות ששוכפלו ממנו ושורות התשלום (אותו מיפוי כמו בהעלאה - payslip_columns).
+
+החילוץ הוא רק עם ה-patterns שנלמדו (המובנים כבר רצו בהעלאה), ושדה שהערך שלו הגיע
+מטבלאות החשבון, מ-AI או מטבלת התשלומים לא נדרס.
+
+הרצה ידנית (מתיקיית backend):
+    python -m app.reextraction
+"""
+import copy
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+
+from app.account_tables import RAW_FIELDS
+from app.database import SessionLocal, Payslip, ReextractionJob
+from app.field_extractor import FieldExtractor
+from app.ingestion import payslip_columns
+from app.learned_patterns import load_learned_patterns, pattern_version
+from app.line_items import line_item_fields
+from app.pdf_parser import SOURCE_AI, SOURCE_LINE_ITEMS, SOURCE_TABLE
+
+BATCH_SIZE = 200
+
+# מקורות אמינים יותר מ-regex - חילוץ-מחדש לא דורס אותם
+PROTECTED_SOURCES = {SOURCE_TABLE, SOURCE_AI, SOURCE_LINE_ITEMS}
+
+# השדות הגולמיים שטבלאות החשבון / AI יכולים לכתוב
+ACCOUNT_FIELDS = {field for fields in RAW_FIELDS.values() for field in fields.values()}
+
+# עבודה אחת בכל פעם בתהליך
+_job_lock = threading.Lock()
+
+
+def _set_path(data: Dict[str, Any], path: List[str], value: Any) -> None:
+    for key in path[:-1]:
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+        data = data[key]
+    data[path[-1]] = value
+
+
+def _leaf_paths(data: Dict[str, Any], prefix: Optional[List[str]] = None):
+    """
+    כל המסלולים בפורמט המערכת שקיבלו ערך (לא None)
+    """
+    for key, value in data.items():
+        path = (prefix or []) + [key]
+        if isinstance(value, dict):
+            yield from _leaf_paths(value, path)
+        elif value is not None and value != []:
+            yield path, value
+
+
+class Reextractor:
+    """
+    מחלץ מחדש שדות בודדים מהטקסט השמור ומעדכן רק אותם ב-parsed_data
+    """
+
+    def __init__(self, pdf_parser=None):
+        if pdf_parser is None:
+            from app.pdf_parser import HebrewPayslipPDFParser
+            pdf_parser = HebrewPayslipPDFParser(ai_sick_days=False)
+        self.parser = pdf_parser
+        self._account_extractor: Optional[FieldExtractor] = None
+
+    def build_extractor(self, fields: List[str], learned: Dict[str, Dict[str, Any]]) -> FieldExtractor:
+        """
+        רק ה-patterns שנלמדו לשדות שהשתנו - ה-patterns המובנים כבר רצו בהעלאה,
+        והרצה חוזרת שלהם רק הייתה דורסת ערכים שהגיעו ממקור טוב יותר
+        """
+        return FieldExtractor({field: learned[field]["patterns"] for field in fields})
+
+    def protected_fields(self, parsed_data: Dict[str, Any], original_text: str) -> Set[str]:
+        """
+        שדות שהערך השמור שלהם הגיע מטבלאות החשבון, מ-AI או מטבלת התשלומים
+        """
+        raw_data = parsed_data.get("raw_data")
+        if not isinstance(raw_data, dict):
+            return set()
+
+        sources = raw_data.get("_sources")
+        if isinstance(sources, dict):
+            return {field for field, source in sources.items() if source in PROTECTED_SOURCES}
+
+        # תלושים מלפני שהמקור נשמר: שדות טבלת התשלומים לפי השורות השמורות, ושדות
+        # חשבון חופשה/מחלה שה-patterns המובנים לא מחזירים את הערך השמור שלהם (טבלה / AI)
+        protected = set(line_item_fields(parsed_data.get("line_items") or []))
+        stored = {field: raw_data[field] for field in ACCOUNT_FIELDS if raw_data.get(field) is not None}
+        if stored:
+            if self._account_extractor is None:
+                self._account_extractor = FieldExtractor({
+                    field: self.parser.patterns[field] for field in ACCOUNT_FIELDS if field in self.parser.patterns
+                })
+            builtin = self._account_extractor.extract(original_text)
+            protected.update(field for field, value in stored.items() if builtin.get(field) != value)
+        return protected
+
+    def apply(self, parsed_data: Dict[str, Any], field: str, value: str, category: Optional[str]) -> bool:
+        """
+        עדכן שדה אחד ב-parsed_data. מחזיר True אם משהו השתנה.
+
+        שדה מובנה של ה-parser - נכתב ל-raw_data ולמקומות שלו בפורמט המערכת;
+        שדה חדש - ל-parsed_data[category][field] (כמו /api/feedback/new-field)
+        """
+        changed = False
+
+        if field in self.parser.patterns:
+            raw_data = parsed_data.get("raw_data")
+            if isinstance(raw_data, dict) and raw_data.get(field) != value:
+                raw_data[field] = value
+                changed = True
+
+            normalized = self.parser._normalize_to_system_format({field: value})
+            normalized.pop("raw_data", None)
+            for path, normalized_value in _leaf_paths(normalized):
+                current = parsed_data
+                for key in path:
+                    current = current.get(key) if isinstance(current, dict) else None
+                if current != normalized_value:
+                    _set_path(parsed_data, path, normalized_value)
+                    changed = True
+        else:
+            section = parsed_data.get(category or "learned_fields")
+            if not isinstance(section, dict):
+                section = parsed_data[category or "learned_fields"] = {}
+            if section.get(field) != value:
+                section[field] = value
+                changed = True
+
+        return changed
+
+    def reextract(self, db, payslip: Payslip, extractor: FieldExtractor,
+                  learned: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        חלץ מחדש את השדות של תלוש אחד ועדכן את parsed_data, העמודות ששוכפלו ממנו ושורות התשלום.
+        מחזיר True אם התלוש עודכן.
+        """
+        original_text = payslip.original_text
+        if not original_text:
+            return False
+
+        parsed_data = copy.deepcopy(dict(payslip.parsed_data or {}))
+        protected = self.protected_fields(parsed_data, original_text)
+        changed = False
+        for field, value in extractor.extract(original_text, skip=protected).items():
+            if self.apply(parsed_data, field, value, learned[field]["category"]):
+                changed = True
+        if not changed:
+            return False
+
+        columns = payslip_columns(parsed_data)
+        key = (columns["employee_id"], columns["period_key"])
+        if all(key) and key != (payslip.employee_id, payslip.period_key):
+            # העובד/התקופה השתנו לתלוש שכבר קיים - לא מעדכנים (האינדקס הייחודי)
+            taken = db.query(Payslip.id).filter(
+                Payslip.employee_id == key[0],
+                Payslip.period_key == key[1],
+                Payslip.id != payslip.id
+            ).first()
+            if taken is not None:
+                print(f"[Reextract] Payslip {payslip.id}: {key} already exists as payslip {taken.id}, skipping")
+                return False
+
+        payslip.parsed_data = parsed_data
+        for column, value in columns.items():
+            setattr(payslip, column, value)
+        payslip.set_line_items(parsed_data.get("line_items"))
+        return True
+
+    def run(self, batch_size: int = BATCH_SIZE) -> Dict[str, Any]:
+        """
+        הרץ (או המשך) עבודת חילוץ-מחדש לשדות שה-patterns שלהם השתנו
+        """
+        if not _job_lock.acquire(blocking=False):
+            return {"status": "already_running"}
+
+        db = SessionLocal()
+        job = None
+        try:
+            learned = load_learned_patterns(db)
+            versions = {field: pattern_version(data["patterns"]) for field, data in learned.items()}
+
+            job = db.query(ReextractionJob).filter(
+                ReextractionJob.status.in_(["running", "failed"])
+            ).order_by(ReextractionJob.id.desc()).first()
+
+            if job and job.field_versions != versions:
+                # ה-patterns השתנו שוב - מתחילים עבודה חדשה (שכוללת גם את השדות של הישנה)
+                job.status = "superseded"
+                db.commit()
+                job = None
+
+            if job is None:
+                last_done = db.query(ReextractionJob).filter(
+                    ReextractionJob.status == "done"
+                ).order_by(ReextractionJob.id.desc()).first()
+                previous = (last_done.field_versions or {}) if last_done else {}
+
+                fields = sorted(f for f, version in versions.items() if previous.get(f) != version)
+                if not fields:
+                    return {"status": "up_to_date"}
+
+                job = ReextractionJob(fields=fields, field_versions=versions, status="running")
+                db.add(job)
+                db.commit()
+            else:
+                print(f"[Reextract] Resuming job {job.id} after payslip {job.last_payslip_id}")
+                job.status = "running"
+                db.commit()
+
+            fields = [f for f in job.fields if f in learned]
+            extractor = self.build_extractor(fields, learned)
+            print(f"[Reextract] Job {job.id}: re-extracting {fields}")
+
+            while True:
+                payslips = db.query(Payslip).filter(
+                    Payslip.id > (job.last_payslip_id or 0)
+                ).order_by(Payslip.id).limit(batch_size).all()
+
+                if not payslips:
+                    break
+
+                for payslip in payslips:
+                    if self.reextract(db, payslip, extractor, learned):
+                        job.updated = (job.updated or 0) + 1
+                    job.processed = (job.processed or 0) + 1
+
+                # checkpoint - באותה טרנזקציה עם העדכונים
+                job.last_payslip_id = payslips[-1].id
+                db.commit()
+
+            job.status = "done"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            print(f"[Reextract] Job {job.id} done: {job.processed} processed, {job.updated} updated")
+
+            return job_status(job)
+
+        except Exception as e:
+            print(f"[Reextract] Error: {e}")
+            db.rollback()
+            if job is not None and job.id:
+                job.status = "failed"
+                job.error = str(e)
+                db.commit()
+            return {"status": "failed", "error": str(e)}
+        finally:
+            db.close()
+            _job_lock.release()
+
+
+def job_status(job: Optional[ReextractionJob]) -> Dict[str, Any]:
+    if job is None:
+        return {"status": "none"}
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "fields": job.fields,
+        "last_payslip_id": job.last_payslip_id,
+        "processed": job.processed,
+        "updated": job.updated,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+def run_reextraction(pdf_parser=None, batch_size: int = BATCH_SIZE) -> Dict[str, Any]:
+    """
+    נקודת כניסה לעבודת רקע (BackgroundTasks / סקריפט)
+    """
+    return Reextractor(pdf_parser).run(batch_size)
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_reextraction(), ensure_ascii=False, indent=2))
@@ -0,0 +1,152 @@
+"""
+Parser Benchmark - מדידת מהירות ה-parser לפי שלבים על תלושים סינתטיים
+
+הרצה:
+    python benchmarks/parser_benchmark.py --slips 1,10,100,1000 --output results.json
+
+לכל גודל קובץ נמדד זמן כל שלב (הטוב מבין --repeat הרצות):
+extract (PDF -> טקסט, כולל RTL), rtl_fix, split, regex, analyze_hours ו-parse (הכל יחד, ללא PDF).
+התוצאה היא JSON - כדי להשוות בין commits.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.analyzer import analyze_hours
+from app.pdf_parser import HebrewPayslipPDFParser, fix_rtl_text
+from payslip_generator import generate_pdf, generate_raw_text
+
+DEFAULT_SLIPS = [1, 10, 100, 1000]
+
+
+def _timed(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    הרץ func כמה פעמים (בלי הדפסות ה-debug) - מחזיר את הזמן הטוב ביותר ואת התוצאה
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"seconds": round(best, 6), "result": result}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def benchmark(slips: int, repeat: int = 3, with_pdf: bool = True, seed: int = 0) -> Dict[str, Any]:
+    """
+    מדוד את כל השלבים עבור קובץ אחד עם slips תלושים
+    """
+    parser = HebrewPayslipPDFParser(cache=None, ai_sick_days=False)
+    raw_text = generate_raw_text(slips, seed)
+
+    stages = {}
+
+    if with_pdf:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = str(Path(tmp_dir) / f"payslips_{slips}.pdf")
+            if generate_pdf(pdf_path, slips, seed):
+                stages["extract"] = _timed(lambda: parser.extract_text(pdf_path), repeat)["seconds"]
+
+    rtl = _timed(lambda: fix_rtl_text(raw_text), repeat)
+    text = rtl["result"]
+    stages["rtl_fix"] = rtl["seconds"]
+
+    split = _timed(lambda: parser._split_payslips(text), repeat)
+    segments = split["result"]
+    stages["split"] = split["seconds"]
+
+    stages["regex"] = _timed(
+        lambda: [parser._extract_fields(segment) for segment in segments], repeat
+    )["seconds"]
+
+    stages["analyze_hours"] = _timed(
+        lambda: [analyze_hours({}, segment) for segment in segments], repeat
+    )["seconds"]
+
+    parse = _timed(lambda: parser.parse_extracted_text(text), repeat)
+    stages["parse"] = parse["seconds"]
+
+    parsed = parse["result"]
+    parsed_count = parsed.get("count", 1) if parsed.get("multiple_payslips") else 1
+    # זמן כולל של קובץ: extract כבר כולל את תיקון ה-RTL, ו-parse כולל את split+regex
+    pipeline = ["extract" if "extract" in stages else "rtl_fix", "split", "regex", "analyze_hours"]
+    total = sum(stages[stage] for stage in pipeline)
+
+    return {
+        "slips": slips,
+        "parsed_slips": parsed_count,
+        "text_chars": len(raw_text),
+        "stages": stages,
+        "total_seconds": round(total, 6),
+        "slips_per_second": round(slips / total, 1) if total else None
+    }
+
+
+def run(slip_counts: List[int], repeat: int = 3, with_pdf: bool = True, seed: int = 0) -> Dict[str, Any]:
+    results = []
+    for slips in slip_counts:
+        print(f"[Benchmark] {slips} slips...", file=sys.stderr)
+        results.append(benchmark(slips, repeat, with_pdf, seed))
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed
+        },
+        "results": results
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Payslip parser throughput benchmark")
+    arg_parser.add_argument("--slips", default=",".join(str(n) for n in DEFAULT_SLIPS),
+                            help="comma separated slip counts per PDF (1-1000)")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--no-pdf", action="store_true", help="skip PDF generation and the extract stage")
+    arg_parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = arg_parser.parse_args()
+
+    slip_counts = [int(n) for n in args.slips.split(",") if n.strip()]
+    report = run(slip_counts, args.repeat, not args.no_pdf, args.seed)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(f"[Benchmark] Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
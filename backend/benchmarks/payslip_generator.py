@@ -0,0 +1,182 @@
+"""
+Payslip Generator - יצירת תלושי שכר סינתטיים בעברית לבדיקות ביצועים
+
+הטקסט נוצר בסדר לוגי (כמו אחרי fix_rtl_text) ומומר לסדר ויזואלי הפוך -
+כמו שהוא יוצא מ-PDF של ספק השכר - כך שכל השלבים של ה-parser עובדים עליו.
+"""
+import os
+import random
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.pdf_parser import fix_rtl_text
+
+FIRST_NAMES = ["דולב", "נועה", "יוסי", "מיכל", "אבי", "שירה", "רון", "תמר", "עומר", "הילה"]
+LAST_NAMES = ["סלע", "כהן", "לוי", "מזרחי", "פרץ", "ביטון", "אברהם", "דהן", "אגמון", "שפירא"]
+DEPARTMENTS = ["במרכנים", "מטבח", "הנהלה", "אחזקה", "מלצרות"]
+
+# פונטים עם אותיות עבריות (ל-PDF) - הראשון שקיים נבחר
+FONT_PATHS = [
+    os.getenv("BENCHMARK_FONT_PATH", ""),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+]
+
+LINE_HEIGHT = 14
+
+# טבלאות חשבון חופשה ומחלה - 5 השורות האחרונות של כל אחת (כותרת + 4 שורות)
+ACCOUNT_TABLE_LINES = 5
+# מיקום הטבלאות כשהן זו לצד זו - חופשה מימין, מחלה משמאל
+SIDE_BY_SIDE_X = {"vacation": 300, "sick": 40}
+
+
+def generate_payslip(index: int, rnd: random.Random, month: int = 10, year: int = 2025) -> str:
+    """
+    צור טקסט של תלוש אחד בסדר לוגי, עם התוויות שה-patterns של HebrewPayslipPDFParser מזהים
+    """
+    employee_id = 1000 + index
+    name = f"{rnd.choice(LAST_NAMES)} {rnd.choice(FIRST_NAMES)}"
+    department = rnd.choice(DEPARTMENTS)
+
+    hours_100 = round(rnd.uniform(20, 180), 2)
+    hours_125 = round(rnd.uniform(0, 12), 2)
+    hours_150 = round(rnd.uniform(0, 30), 2)
+    rate = round(rnd.uniform(32, 60), 2)
+
+    base_wage = round(hours_100 * rate, 2)
+    pay_125 = round(hours_125 * rate * 1.25, 2)
+    pay_150 = round(hours_150 * rate * 1.5, 2)
+    travel = round(rnd.randint(10, 26) * 11.8, 2)
+    premium = float(rnd.randint(0, 2000))
+    gross = round(base_wage + pay_125 + pay_150 + travel + premium, 2)
+
+    tax = round(gross * 0.08, 2)
+    national_insurance = round(gross * 0.035, 2)
+    health = round(gross * 0.031, 2)
+    net = round(gross - tax - national_insurance - health, 2)
+    final_payment = round(net - rnd.randint(0, 200), 2)
+
+    vacation_previous = round(rnd.uniform(0, 60), 2)
+    vacation_accrued = round(rnd.uniform(0.5, 2), 2)
+    sick_previous = round(rnd.uniform(0, 90), 2)
+    sick_accrued = 1.5
+
+    lines = [
+        f"תלוש שכר לחודש {month:02d}/{year}",
+        'חברה : 123 - מסעדות הדגמה בע"מ',
+        "כתובת: רחוב הרצל 1 תל אביב מספר תאגיד 51234",
+        "תיק ניכויים: 912345678",
+        "פרטים אישיים",
+        f"מספר העובד: {employee_id:04d}",
+        f"{name} מחלקה: {index % 7 + 1:03d} {department}",
+        f"מספר זהות: {rnd.randint(10 ** 8, 10 ** 9 - 1)}",
+        "בסיס השכר: שעתי",
+        "ותק: 01.02.20",
+        "תחילת עבודה: 01/02/2020",
+        "תשלומים",
+        f"004 נסיעות {travel / 11.8:.2f} 11.80 {travel:.2f}",
+        f"020 פרמיה 1.00 {premium:.2f}",
+        f"063 שכר בר {hours_100:.2f} {rate:.2f} {base_wage:.2f}",
+        f"077 ש 521% דיווח {hours_125:.2f} {rate * 1.25:.2f} {pay_125:.2f}",
+        f"078 ש %051שבת {hours_150:.2f} {rate * 1.5:.2f} {pay_150:.2f}",
+        f'כ"הס תשלומים {gross:.2f}',
+        "ניכויים",
+        f"מס הכנסה {tax:.2f}",
+        f"ב.לאומי {national_insurance:.2f}",
+        f"ביטוח רפוא {health:.2f}",
+        f"שכר נטו {net:.2f}",
+        f"לתשלום {final_payment:.2f}",
+        "נתונים נוספים",
+        f"ימי עבודה {rnd.randint(10, 26)}",
+        f'ע"ש בחברה {hours_100 + hours_125 + hours_150:.1f}',
+        "חשבון חופשה",
+        f"יתרה קודמת {vacation_previous:.2f}",
+        f"צבירה ח.ז. {vacation_accrued:.2f}",
+        "ניצול ח.ז. 0.00",
+        f"יתרה חדשה {vacation_previous + vacation_accrued:.2f}",
+        "חשבון מחלה",
+        f"יתרה קודמת {sick_previous:.2f}",
+        f"צבירה {sick_accrued:.2f}",
+        "ניצול 0.00",
+        f"יתרה חדשה {sick_previous + sick_accrued:.2f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def generate_payslips(count: int, seed: int = 0) -> List[str]:
+    """
+    צור count תלושים (טקסט לוגי) - אותו seed נותן אותם תלושים
+    """
+    rnd = random.Random(seed)
+    return [generate_payslip(i, rnd) for i in range(count)]
+
+
+def to_visual(text: str) -> str:
+    """
+    המר טקסט לוגי לסדר ויזואלי הפוך (כמו שמגיע מה-PDF).
+    fix_rtl_text הופך את עצמו בשורות שהוא מתקן, אז אותה פונקציה משמשת לשני הכיוונים.
+    """
+    return fix_rtl_text(text)
+
+
+def generate_raw_text(count: int, seed: int = 0) -> str:
+    """
+    טקסט גולמי של קובץ עם count תלושים - לפני תיקון RTL
+    """
+    return "".join(to_visual(payslip) for payslip in generate_payslips(count, seed))
+
+
+def find_font() -> Optional[str]:
+    for path in FONT_PATHS:
+        if path and Path(path).exists():
+            return path
+    return None
+
+
+def generate_pdf(path: str, count: int, seed: int = 0, side_by_side: bool = False) -> bool:
+    """
+    צור PDF עם count תלושים (עמוד לכל תלוש), שורות בסדר ויזואלי הפוך.
+    side_by_side - טבלאות חשבון חופשה ומחלה באותן שורות, זו לצד זו (במקום אחת מתחת לשנייה).
+    מחזיר False אם reportlab או פונט עברי לא זמינים.
+    """
+    try:
+        from reportlab.pdfgen import canvas
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+    except ImportError:
+        print("[Benchmark] reportlab not installed - skipping PDF generation")
+        return False
+
+    font_path = find_font()
+    if not font_path:
+        print("[Benchmark] No Hebrew font found (set BENCHMARK_FONT_PATH) - skipping PDF generation")
+        return False
+
+    pdfmetrics.registerFont(TTFont("Hebrew", font_path))
+
+    pdf = canvas.Canvas(path)
+    for payslip in generate_payslips(count, seed):
+        pdf.setFont("Hebrew", 9)
+        y = 800
+        lines = payslip.rstrip("\n").split("\n")
+        tables = []
+        if side_by_side:
+            lines, tables = lines[:-2 * ACCOUNT_TABLE_LINES], lines[-2 * ACCOUNT_TABLE_LINES:]
+
+        for line in lines:
+            pdf.drawString(40, y, to_visual(line))
+            y -= LINE_HEIGHT
+
+        for vacation_line, sick_line in zip(tables[:ACCOUNT_TABLE_LINES], tables[ACCOUNT_TABLE_LINES:]):
+            pdf.drawString(SIDE_BY_SIDE_X["vacation"], y, to_visual(vacation_line))
+            pdf.drawString(SIDE_BY_SIDE_X["sick"], y, to_visual(sick_line))
+            y -= LINE_HEIGHT
+        pdf.showPage()
+    pdf.save()
+    return True
@@ -0,0 +1,86 @@
+"""
+File Store Migration Script
+מעביר קבצי PDF שהועלו לפני מאגר הקבצים (uploads/<שם הקובץ>) למאגר לפי hash התוכן,
+ומעדכן את file_path בתלושים ובעבודות ההעלאה שמצביעים עליהם.
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.database import init_db, get_db, engine
+from app.file_store import FileStore
+from sqlalchemy import text
+
+UPLOAD_DIR = Path("/app/uploads")
+
+
+def run_migration():
+    """הרצת migration"""
+    print("🔄 Starting file store migration...")
+
+    # Step 1: Create new columns
+    print("\n📊 Step 1: Creating tables and columns...")
+    try:
+        init_db()
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS file_hash VARCHAR"))
+            conn.commit()
+        print("✓ Tables and columns created/verified")
+    except Exception as e:
+        print(f"❌ Error creating tables: {e}")
+        return False
+
+    # Step 2: Move old uploads into the store
+    print("\n🔄 Step 2: Moving uploaded PDFs into the file store...")
+
+    file_store = FileStore(UPLOAD_DIR)
+    db = next(get_db())
+    try:
+        old_paths = [row.file_path for row in db.execute(text("""
+            SELECT DISTINCT file_path FROM payslips WHERE file_path IS NOT NULL
+            UNION
+            SELECT DISTINCT file_path FROM ingestion_jobs
+        """))]
+        old_paths = [path for path in old_paths if not file_store.contains(path)]
+        print(f"Found {len(old_paths)} files outside the store")
+
+        moved = 0
+        missing = 0
+        for old_path in old_paths:
+            if not Path(old_path).exists():
+                missing += 1
+                continue
+
+            # העתקה, ומחיקת הקובץ הישן רק אחרי שה-DB עודכן
+            file_hash, new_path = file_store.save_file(Path(old_path))
+            params = {"old_path": old_path, "new_path": str(new_path), "file_hash": file_hash}
+            db.execute(text("UPDATE payslips SET file_path = :new_path WHERE file_path = :old_path"), params)
+            db.execute(text("""
+                UPDATE ingestion_jobs SET file_path = :new_path, file_hash = :file_hash
+                WHERE file_path = :old_path
+            """), params)
+            db.commit()
+            Path(old_path).unlink()
+
+            moved += 1
+            if moved % 100 == 0:
+                print(f"  ✓ Moved {moved}/{len(old_paths)}")
+
+        print(f"✓ Moved {moved} files ({missing} missing on disk, left as is)")
+
+    except Exception as e:
+        print(f"❌ Error moving files: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+    print("\n✅ Migration completed successfully!")
+    return True
+
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,78 @@
+"""
+JSONB Migration Script
+ממיר את payslips.parsed_data מ-JSON ל-JSONB ויוצר את האינדקסים שהשאילתות עליו משתמשות בהם:
+GIN על כל parsed_data, ואינדקסי ביטוי על המחלקה והשכר לתשלום (התקופה - period_key, migrate_period_key.py).
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.database import init_db, engine, Payslip
+from sqlalchemy import text
+
+JSONB_INDEXES = (
+    "ix_payslips_parsed_data",
+    "ix_payslips_department",
+    "ix_payslips_final_payment",
+)
+
+
+def run_migration():
+    """הרצת migration"""
+    print("🔄 Starting JSONB migration...")
+
+    if engine.dialect.name != "postgresql":
+        print("⚠️  JSONB is PostgreSQL only - nothing to do")
+        return True
+
+    # Step 1: Create new tables
+    print("\n📊 Step 1: Creating tables...")
+    try:
+        init_db()
+        print("✓ Tables created/verified")
+    except Exception as e:
+        print(f"❌ Error creating tables: {e}")
+        return False
+
+    # Step 2: Convert parsed_data to JSONB
+    print("\n🔄 Step 2: Converting parsed_data to JSONB...")
+    with engine.connect() as conn:
+        try:
+            column_type = conn.execute(text("""
+                SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'payslips' AND column_name = 'parsed_data'
+            """)).scalar()
+
+            if column_type == "jsonb":
+                print("✓ parsed_data is already JSONB")
+            else:
+                conn.execute(text("ALTER TABLE payslips ALTER COLUMN parsed_data TYPE JSONB USING parsed_data::jsonb"))
+                conn.commit()
+                print("✓ parsed_data converted to JSONB")
+        except Exception as e:
+            print(f"❌ Error converting parsed_data: {e}")
+            return False
+
+    # Step 3: Create the indexes (same definitions as in database.py)
+    print("\n📊 Step 3: Creating JSONB indexes...")
+    indexes = {index.name: index for index in Payslip.__table__.indexes}
+    with engine.connect() as conn:
+        try:
+            for name in JSONB_INDEXES:
+                indexes[name].create(bind=conn, checkfirst=True)
+                print(f"  ✓ {name}")
+            conn.execute(text("ANALYZE payslips"))
+            conn.commit()
+        except Exception as e:
+            print(f"❌ Error creating indexes: {e}")
+            return False
+
+    print("\n✅ Migration completed successfully!")
+    return True
+
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
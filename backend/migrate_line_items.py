@@ -0,0 +1,110 @@
+"""
+Line Items Migration Script
+ממלא את טבלת payslip_line_items עבור תלושים קיימים
+(מ-parsed_data["line_items"], או מהטקסט המקורי בתלושים שנשמרו לפני שהיה line_items).
+שורות שנשמרו עם year/month כטקסט עוברות ל-period_key מהתלוש (אחרי migrate_period_key.py).
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.database import init_db, get_db, engine, Payslip, PayslipLineItem, bulk_insert_line_items, line_item_values
+from app.line_items import parse_line_items
+from sqlalchemy import text
+
+BATCH_SIZE = 200
+
+
+def run_migration():
+    """הרצת migration"""
+    print("🔄 Starting line items migration...")
+
+    # Step 1: Create payslip_line_items table if not exists
+    print("\n📊 Step 1: Creating payslip_line_items table...")
+    try:
+        init_db()
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE payslip_line_items ADD COLUMN IF NOT EXISTS period_key INTEGER"))
+            conn.commit()
+        print("✓ payslip_line_items table created/verified")
+    except Exception as e:
+        print(f"❌ Error creating tables: {e}")
+        return False
+
+    # Step 2: period_key (and employee_id) from the payslip, instead of the copied year/month strings
+    print("\n🔄 Step 2: Moving existing line items to period_key...")
+    indexes = {index.name: index for index in PayslipLineItem.__table__.indexes}
+    with engine.connect() as conn:
+        try:
+            result = conn.execute(text("""
+                UPDATE payslip_line_items SET
+                    period_key = (SELECT period_key FROM payslips WHERE payslips.id = payslip_line_items.payslip_id),
+                    employee_id = (SELECT employee_id FROM payslips WHERE payslips.id = payslip_line_items.payslip_id)
+                WHERE period_key IS NULL
+            """))
+            print(f"✓ Updated {result.rowcount} line items")
+
+            indexes["ix_payslip_line_items_employee_period_key"].create(bind=conn, checkfirst=True)
+            conn.execute(text("DROP INDEX IF EXISTS ix_payslip_line_items_employee_period"))
+            conn.execute(text("ALTER TABLE payslip_line_items DROP COLUMN IF EXISTS year"))
+            conn.execute(text("ALTER TABLE payslip_line_items DROP COLUMN IF EXISTS month"))
+            conn.commit()
+            print("✓ ix_payslip_line_items_employee_period_key created, year/month columns dropped")
+        except Exception as e:
+            print(f"❌ Error moving line items to period_key: {e}")
+            return False
+
+    # Step 3: Fill line items for payslips that have none
+    print("\n🔄 Step 3: Filling line items for existing payslips...")
+
+    db = next(get_db())
+    try:
+        filled_count = 0
+        last_id = 0
+        has_items = db.query(PayslipLineItem.payslip_id)
+
+        while True:
+            payslips = db.query(Payslip).filter(
+                Payslip.id > last_id,
+                ~Payslip.id.in_(has_items)
+            ).order_by(Payslip.id).limit(BATCH_SIZE).all()
+
+            if not payslips:
+                break
+
+            rows = []
+            for payslip in payslips:
+                items = (payslip.parsed_data or {}).get("line_items")
+                if items is None:
+                    items = parse_line_items(payslip.original_text)
+                if items:
+                    rows.extend(
+                        {"payslip_id": payslip.id, **values}
+                        for values in line_item_values(items, payslip.employee_id, payslip.period_key)
+                    )
+                    filled_count += 1
+
+            # INSERT אחד מרובה שורות לכל הקבוצה
+            bulk_insert_line_items(db, rows)
+            db.commit()
+            last_id = payslips[-1].id
+            print(f"  ✓ Processed up to payslip {last_id} ({filled_count} filled)")
+
+        print(f"✅ Filled line items for {filled_count} payslips")
+
+    except Exception as e:
+        print(f"❌ Error filling line items: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+    print("\n✅ Migration completed successfully!")
+    return True
+
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
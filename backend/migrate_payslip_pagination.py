@@ -0,0 +1,54 @@
+"""
+Payslip Pagination Migration Script
+יוצר את האינדקס (upload_date, id) על payslips - לדפדוף keyset ב-/api/payslips,
+ואת העמודה updated_at (עם אינדקס) - הגרסה של ספירת התלושים במטמון.
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.database import init_db, engine
+from sqlalchemy import text
+
+
+def run_migration():
+    """הרצת migration"""
+    print("🔄 Starting payslip pagination migration...")
+
+    # Step 1: Create new tables / columns
+    print("\n📊 Step 1: Creating tables and columns...")
+    try:
+        init_db()
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE payslips ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP"))
+            conn.execute(text("UPDATE payslips SET updated_at = upload_date WHERE updated_at IS NULL"))
+            conn.commit()
+        print("✓ Tables and columns created/verified")
+    except Exception as e:
+        print(f"❌ Error creating tables: {e}")
+        return False
+
+    # Step 2: Create the keyset and count version indexes
+    print("\n📊 Step 2: Creating indexes...")
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_payslips_upload_date_id
+                ON payslips (upload_date, id)
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_payslips_updated_at ON payslips (updated_at)"))
+            conn.commit()
+            print("✓ Indexes ix_payslips_upload_date_id, ix_payslips_updated_at created/verified")
+        except Exception as e:
+            print(f"❌ Error creating index: {e}")
+            return False
+
+    print("\n✅ Migration completed successfully!")
+    return True
+
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
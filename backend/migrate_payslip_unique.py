@@ -0,0 +1,94 @@
+"""
+Payslip Unique Key Migration Script
+מוסיף אינדקס ייחודי על (employee_id, period_key) בטבלת payslips.
+כפילויות קיימות (מהעלאות מקבילות, או "01" ו-"1" לאותו חודש) נמחקות קודם -
+נשאר התלוש הראשון שנשמר, כמו בבדיקת הכפילויות בהעלאה.
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.database import init_db, get_db, engine
+from app.ingestion import delete_payslips
+from migrate_period_key import backfill_period_key
+from sqlalchemy import text
+
+BATCH_SIZE = 500
+
+
+def run_migration():
+    """הרצת migration"""
+    print("🔄 Starting payslip unique key migration...")
+
+    # Step 1: Create new tables / columns
+    print("\n📊 Step 1: Creating tables and columns...")
+    try:
+        init_db()
+        with engine.connect() as conn:
+            # ingestion_jobs נוצרה לפני שהיו לה העמודות האלה
+            conn.execute(text("ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS batch_id VARCHAR"))
+            conn.execute(text("ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS on_duplicate VARCHAR"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ingestion_jobs_batch_id ON ingestion_jobs (batch_id)"))
+            conn.execute(text("ALTER TABLE payslips ADD COLUMN IF NOT EXISTS period_key INTEGER"))
+            conn.commit()
+        print("✓ Tables and columns created/verified")
+    except Exception as e:
+        print(f"❌ Error creating tables: {e}")
+        return False
+
+    # Step 2: Backfill period_key + remove duplicate payslips (keep the first one saved)
+    print("\n🔄 Step 2: Removing duplicate payslips...")
+
+    db = next(get_db())
+    try:
+        backfill_period_key(db)
+
+        duplicate_ids = [row.id for row in db.execute(text("""
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY employee_id, period_key ORDER BY id
+                ) AS row_number
+                FROM payslips
+                WHERE employee_id IS NOT NULL AND period_key IS NOT NULL
+            ) ranked
+            WHERE row_number > 1
+        """))]
+        print(f"Found {len(duplicate_ids)} duplicate payslips")
+
+        for start in range(0, len(duplicate_ids), BATCH_SIZE):
+            batch = duplicate_ids[start:start + BATCH_SIZE]
+            delete_payslips(db, batch)
+            db.commit()
+            print(f"  ✓ Deleted {start + len(batch)}/{len(duplicate_ids)}")
+
+    except Exception as e:
+        print(f"❌ Error removing duplicates: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+    # Step 3: Create the unique index (replaces the old one on the string year/month)
+    print("\n📊 Step 3: Creating unique index...")
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("DROP INDEX IF EXISTS uq_payslips_employee_period"))
+            conn.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_payslips_employee_period_key
+                ON payslips (employee_id, period_key)
+            """))
+            conn.commit()
+            print("✓ Unique index uq_payslips_employee_period_key created/verified")
+        except Exception as e:
+            print(f"❌ Error creating unique index: {e}")
+            return False
+
+    print("\n✅ Migration completed successfully!")
+    return True
+
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,99 @@
+"""
+Period Key Migration Script
+מוסיף את העמודה period_key (year * 100 + month) לטבלת payslips, ממלא אותה מהתלושים הקיימים
+ויוצר את האינדקסים עליה.
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.database import init_db, get_db, engine, Payslip, period_key
+from sqlalchemy import text
+
+PERIOD_KEY_INDEXES = (
+    "ix_payslips_period_key",
+    "ix_payslips_employee_period_key",
+    "ix_payslips_department_period_key",
+)
+
+
+def backfill_period_key(db) -> None:
+    """
+    מלא period_key בתלושים שאין להם - UPDATE אחד לכל צירוף (year, month) שונה
+    """
+    periods = db.execute(text("""
+        SELECT DISTINCT year, month FROM payslips
+        WHERE period_key IS NULL AND year IS NOT NULL AND month IS NOT NULL
+    """)).all()
+    print(f"Found {len(periods)} periods to backfill")
+
+    skipped = 0
+    for year, month in periods:
+        key = period_key(year, month)
+        if key is None:
+            skipped += 1
+            continue
+        db.execute(text("""
+            UPDATE payslips SET period_key = :key
+            WHERE year = :year AND month = :month AND period_key IS NULL
+        """), {"key": key, "year": year, "month": month})
+        db.commit()
+        print(f"  ✓ {month}/{year} -> {key}")
+
+    if skipped:
+        print(f"⚠️  Skipped {skipped} periods that are not a valid month/year")
+
+
+def run_migration():
+    """הרצת migration"""
+    print("🔄 Starting period key migration...")
+
+    # Step 1: Create new columns
+    print("\n📊 Step 1: Creating tables and columns...")
+    try:
+        init_db()
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE payslips ADD COLUMN IF NOT EXISTS period_key INTEGER"))
+            conn.commit()
+        print("✓ Tables and columns created/verified")
+    except Exception as e:
+        print(f"❌ Error creating tables: {e}")
+        return False
+
+    # Step 2: Backfill period_key
+    print("\n🔄 Step 2: Backfilling period_key...")
+
+    db = next(get_db())
+    try:
+        backfill_period_key(db)
+    except Exception as e:
+        print(f"❌ Error backfilling period_key: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+    # Step 3: Create the indexes (same definitions as in database.py)
+    print("\n📊 Step 3: Creating period key indexes...")
+    indexes = {index.name: index for index in Payslip.__table__.indexes}
+    with engine.connect() as conn:
+        try:
+            for name in PERIOD_KEY_INDEXES:
+                indexes[name].create(bind=conn, checkfirst=True)
+                print(f"  ✓ {name}")
+            # אינדקס התקופה על parsed_data (migrate_jsonb.py) - הוחלף ב-period_key
+            conn.execute(text("DROP INDEX IF EXISTS ix_payslips_period"))
+            conn.commit()
+        except Exception as e:
+            print(f"❌ Error creating indexes: {e}")
+            return False
+
+    print("\n✅ Migration completed successfully!")
+    return True
+
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,88 @@
+"""
+Raw Text Migration Script
+מעביר את _original_text מתוך parsed_data לטבלת payslip_texts (דחוס ב-zlib)
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy.orm import undefer_group
+from sqlalchemy.orm.attributes import flag_modified
+
+from app.database import init_db, get_db, pop_original_text, Payslip, PayslipText
+
+BATCH_SIZE = 200
+
+
+def run_migration():
+    """הרצת migration"""
+    print("🔄 Starting raw text migration...")
+
+    # Step 1: Create payslip_texts table if not exists
+    print("\n📊 Step 1: Creating payslip_texts table...")
+    try:
+        init_db()
+        print("✓ payslip_texts table created/verified")
+    except Exception as e:
+        print(f"❌ Error creating tables: {e}")
+        return False
+
+    # Step 2: Move _original_text out of parsed_data
+    print("\n🔄 Step 2: Moving original text out of parsed_data...")
+
+    db = next(get_db())
+    try:
+        moved_count = 0
+        last_id = 0
+
+        while True:
+            payslips = db.query(Payslip).options(undefer_group("details")).filter(
+                Payslip.id > last_id
+            ).order_by(Payslip.id).limit(BATCH_SIZE).all()
+
+            if not payslips:
+                break
+
+            for payslip in payslips:
+                if not payslip.parsed_data:
+                    continue
+
+                original_text = pop_original_text(payslip.parsed_data)
+                if not original_text:
+                    continue
+
+                # parsed_data הוא MutableDict - שינוי בתוך raw_data לא מזוהה לבד
+                payslip.parsed_data.changed()
+
+                # בתלושים מקובץ מרובה-תלושים גם report מכיל עותק של parsed_data
+                report = payslip.report or {}
+                if isinstance(report.get("parsed_data"), dict):
+                    pop_original_text(report["parsed_data"])
+                    flag_modified(payslip, "report")
+
+                if payslip.text_record is None:
+                    payslip.text_record = PayslipText.from_text(original_text)
+                moved_count += 1
+
+            db.commit()
+            last_id = payslips[-1].id
+            print(f"  ✓ Processed up to payslip {last_id} ({moved_count} moved)")
+
+        print(f"✅ Moved original text of {moved_count} payslips")
+
+    except Exception as e:
+        print(f"❌ Error moving original text: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+    print("\n✅ Migration completed successfully!")
+    return True
+
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
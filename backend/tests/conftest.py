@@ -0,0 +1,46 @@
+"""
+הגדרות משותפות לבדיקות - DB של sqlite זמני, בלי AI ובלי מטמון פענוח משותף.
+משתני הסביבה נקבעים לפני שמודול כלשהו מ-app נטען (database.py יוצר את ה-engine ב-import).
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+_TMP_DIR = tempfile.mkdtemp(prefix="payslip-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR}/test.db"
+os.environ["PARSE_CACHE_DIR"] = f"{_TMP_DIR}/parse_cache"
+os.environ["PDF_PARSER_AI_SICK_DAYS"] = "0"
+os.environ["LEARNED_PATTERNS_TTL"] = "0"
+
+sys.path.insert(0, str(BACKEND_DIR))
+# מחולל התלושים הסינתטיים (benchmarks/payslip_generator.py)
+sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+
+
+@pytest.fixture
+def db():
+    """
+    session על DB ריק - הטבלאות נוצרות מחדש לכל בדיקה
+    """
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def fixture_pdf():
+    def _path(name: str) -> str:
+        return str(FIXTURES_DIR / name)
+    return _path
@@ -0,0 +1,26 @@
+"""
+יצירת קבצי ה-PDF לבדיקות (דורש reportlab ופונט עברי) - הקבצים עצמם נשמרים ב-git
+
+הרצה:
+    python tests/fixtures/make_fixtures.py
+"""
+import sys
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).parent
+sys.path.insert(0, str(FIXTURES_DIR.parent.parent))
+sys.path.insert(0, str(FIXTURES_DIR.parent.parent / "benchmarks"))
+
+from payslip_generator import generate_pdf
+
+
+def main():
+    # 3 תלושים, טבלאות חופשה ומחלה אחת מתחת לשנייה
+    generate_pdf(str(FIXTURES_DIR / "payslips_stacked.pdf"), 3)
+    # אותם 3 תלושים, טבלאות חופשה ומחלה זו לצד זו
+    generate_pdf(str(FIXTURES_DIR / "payslips_side_by_side.pdf"), 3, side_by_side=True)
+    print("✓ Fixtures written to", FIXTURES_DIR)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+בדיקות לקריאת טבלאות חשבון חופשה/מחלה לפי מיקום המילים (app.account_tables)
+"""
+import pdfplumber
+import pytest
+
+from app.account_tables import apply_account_tables, extract_account_tables
+from app.pdf_parser import HebrewPayslipPDFParser
+
+CHAR_WIDTH = 5
+
+
+def _words(top, *items):
+    """
+    מילים של שורה אחת - items: (x0, טקסט), כל מילה בטקסט ברוחב CHAR_WIDTH לתו
+    """
+    words = []
+    for x0, text in items:
+        for token in text.split():
+            words.append({"text": token, "x0": x0, "x1": x0 + CHAR_WIDTH * len(token), "top": top})
+            x0 += CHAR_WIDTH * (len(token) + 1)
+    return words
+
+
+def _table(x0, top, header, values):
+    """
+    טבלה בסדר לוגי: כותרת, ומתחתיה שורות "מספר תווית" (המספר משמאל לתווית, כמו ב-RTL)
+    """
+    words = _words(top, (x0, header))
+    labels = ("יתרה קודמת", "צבירה", "ניצול", "יתרה חדשה")
+    for row, (label, value) in enumerate(zip(labels, values), 1):
+        words += _words(top + 14 * row, (x0 - 30, value), (x0, label))
+    return words
+
+
+EXPECTED_VACATION = {"previous_balance": "12.50", "accrued": "1.75", "used": "0.00", "current_balance": "14.25"}
+EXPECTED_SICK = {"previous_balance": "30.00", "accrued": "1.50", "used": "2.00", "current_balance": "29.50"}
+
+
+def test_stacked_tables():
+    words = (
+        _table(300, 100, "חשבון חופשה", ["12.50", "1.75", "0.00", "14.25"])
+        + _table(300, 200, "חשבון מחלה", ["30.00", "1.50", "2.00", "29.50"])
+    )
+
+    assert extract_account_tables(words) == {"vacation_account": EXPECTED_VACATION, "sick_account": EXPECTED_SICK}
+
+
+def test_side_by_side_tables():
+    words = (
+        _table(300, 100, "חשבון חופשה", ["12.50", "1.75", "0.00", "14.25"])
+        + _table(80, 100, "חשבון מחלה", ["30.00", "1.50", "2.00", "29.50"])
+    )
+
+    assert extract_account_tables(words) == {"vacation_account": EXPECTED_VACATION, "sick_account": EXPECTED_SICK}
+
+
+def test_side_by_side_band_stops_at_neighbour():
+    # הטבלאות קרובות (פחות מ-COLUMN_MARGIN) והמספרים של המחלה מימין לתוויות - קרובים לטבלת החופשה
+    words = _words(100, (60, "חשבון מחלה"), (200, "חשבון חופשה"))
+    words += _words(114, (60, "יתרה קודמת"), (125, "30.00"), (165, "12.50"), (200, "יתרה קודמת"))
+    words += _words(128, (60, "יתרה חדשה"), (125, "29.50"), (165, "14.25"), (200, "יתרה חדשה"))
+
+    tables = extract_account_tables(words)
+
+    assert tables["sick_account"] == {"previous_balance": "30.00", "current_balance": "29.50"}
+    assert tables["vacation_account"] == {"previous_balance": "12.50", "current_balance": "14.25"}
+
+
+def test_visual_order_headers():
+    # עברית שחולצה הפוכה - כל מילה הפוכה והמילים בסדר ויזואלי
+    words = _words(100, (80, "הלחמ ןובשח"), (300, "השפוח ןובשח"))
+    words += _words(114, (50, "30.00"), (80, "תמדוק הרתי"), (270, "12.50"), (300, "תמדוק הרתי"))
+
+    assert extract_account_tables(words) == {
+        "sick_account": {"previous_balance": "30.00"},
+        "vacation_account": {"previous_balance": "12.50"},
+    }
+
+
+def test_apply_account_tables_overrides_raw_fields():
+    result = {"vacation_days": "1.00", "sick_days": "2.00"}
+    apply_account_tables(result, {"vacation_account": EXPECTED_VACATION, "sick_account": {"current_balance": "29.50"}})
+
+    assert result["vacation_days"] == "14.25"
+    assert result["previous_vacation_balance"] == "12.50"
+    assert result["sick_days"] == "29.50"
+
+
+@pytest.mark.parametrize("name", ["payslips_stacked.pdf", "payslips_side_by_side.pdf"])
+def test_fixture_pdf_tables(fixture_pdf, name):
+    with pdfplumber.open(fixture_pdf(name)) as pdf:
+        tables = extract_account_tables(pdf.pages[0].extract_words())
+
+    assert tables == {
+        "vacation_account": {"previous_balance": "21.48", "accrued": "1.84", "used": "0.00", "current_balance": "23.32"},
+        "sick_account": {"previous_balance": "19.66", "accrued": "1.50", "used": "0.00", "current_balance": "21.16"},
+    }
+
+
+def test_layouts_parse_to_same_balances(fixture_pdf):
+    parser = HebrewPayslipPDFParser(workers=1, cache=None, ai_sick_days=False)
+    stacked = parser.parse_pdf(fixture_pdf("payslips_stacked.pdf"))
+    side_by_side = parser.parse_pdf(fixture_pdf("payslips_side_by_side.pdf"))
+
+    def balances(result):
+        return [(ps["employee"]["id"], ps["vacation_days"], ps["sick_days"]) for ps in result["payslips"]]
+
+    assert balances(side_by_side) == balances(stacked)
+    assert len(balances(stacked)) == 3
+
+
+def test_parsed_payslips_record_table_sources(fixture_pdf):
+    parser = HebrewPayslipPDFParser(workers=1, cache=None, ai_sick_days=False)
+    result = parser.parse_pdf(fixture_pdf("payslips_stacked.pdf"))
+
+    sources = result["payslips"][0]["raw_data"]["_sources"]
+    assert {field: sources[field] for field in ("vacation_days", "sick_days", "sick_used")} == {
+        "vacation_days": "table", "sick_days": "table", "sick_used": "table"
+    }
+    assert "line_items" in sources.values()
@@ -0,0 +1,71 @@
+"""
+בדיקות למנוע חילוץ השדות המקומפל (app.field_extractor)
+"""
+import re
+
+import pytest
+from payslip_generator import generate_payslips
+
+from app.field_extractor import DEFAULT_FLAGS, FieldExtractor, literal_anchor
+from app.pdf_parser import HebrewPayslipPDFParser
+
+
+def _reference_extract(patterns, text):
+    """
+    החילוץ הישן: re.search לכל pattern לפי הסדר, בלי קימפול ובלי סינון לפי עוגנים
+    """
+    result = {}
+    for field, field_patterns in patterns.items():
+        for pattern in field_patterns:
+            match = re.search(pattern, text, DEFAULT_FLAGS)
+            if match:
+                value = re.sub(r'\s+', ' ', match.group(1).strip())
+                if value:
+                    result[field] = value
+                break
+    return result
+
+
+@pytest.mark.parametrize("pattern, anchor", [
+    (r"שכר נטו\s+([\d,]+\.\d{2})", "שכר נטו"),
+    (r"מספר העובד:\s*(\d{4,})", "מספר העובד:"),
+    (r"ת\.?ז\.?[:\s]+(\d{9})", "ת"),
+    (r"/(\d{4})", "/"),
+    # אותיות לועזיות עם IGNORECASE - לא עוגן בטוח
+    (r"([A-Z]+(?:\s+[A-Z]+){0,3})\s+מחלקה:", "מחלקה:"),
+    (r"Total:\s+(\d+)", None),
+    (r"(\d+)", None),
+    (r"(", None),
+])
+def test_literal_anchor(pattern, anchor):
+    assert literal_anchor(pattern) == anchor
+
+
+def test_anchor_must_appear_in_every_match():
+    for pattern in ["שכר נטו\\s+(\\d+)", "ימי עבודה\\s+(\\d+)", "לחודש\\s+(\\d{1,2})/\\d{4}"]:
+        anchor = literal_anchor(pattern)
+        for match in re.finditer(pattern, "שכר נטו 5000\nימי עבודה 21\nלחודש 10/2025", DEFAULT_FLAGS):
+            assert anchor in match.group(0)
+
+
+def test_extract_matches_reference_on_generated_payslips():
+    patterns = HebrewPayslipPDFParser(workers=1, cache=None, ai_sick_days=False).patterns
+    extractor = FieldExtractor(patterns)
+
+    for text in generate_payslips(20, seed=7) + ["", "מספר העובד: 1234", "PAYSLIP 10/2025"]:
+        assert extractor.extract(text) == _reference_extract(patterns, text)
+
+
+def test_priority_order_and_sources():
+    patterns = {
+        "net_salary": [r"שכר נטו\s+([\d.]+)", r"נטו[:\s]+([\d.]+)"],
+        "bonus": [r"בונוס\s+(\d+)"],
+    }
+    extractor = FieldExtractor(patterns)
+    sources = {}
+
+    result = extractor.extract("נטו: 10\nשכר נטו 5000.50", sources)
+
+    assert result == {"net_salary": "5000.50"}
+    assert sources == {"net_salary": patterns["net_salary"][0]}
+    assert extractor.extract("נטו: 10", skip={"net_salary"}) == {}
@@ -0,0 +1,58 @@
+"""
+בדיקות למאגר הקבצים לפי תוכן (app.file_store)
+"""
+import hashlib
+import io
+
+from app.file_store import FileStore
+
+
+def test_save_returns_digest_and_sharded_path(tmp_path):
+    store = FileStore(tmp_path)
+    content = b"%PDF-1.4 payslip"
+
+    digest, path = store.save(io.BytesIO(content))
+
+    assert digest == hashlib.sha256(content).hexdigest()
+    assert path == tmp_path / digest[:2] / digest[2:4] / f"{digest}.pdf"
+    assert path.read_bytes() == content
+    assert list(store.tmp_dir.iterdir()) == []
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = FileStore(tmp_path)
+
+    first = store.save(io.BytesIO(b"same"))
+    second = store.save(io.BytesIO(b"same"))
+    other = store.save(io.BytesIO(b"other"))
+
+    assert first == second
+    assert other[1] != first[1]
+    assert len(list(tmp_path.glob("*/*/*.pdf"))) == 2
+    assert list(store.tmp_dir.iterdir()) == []
+
+
+def test_save_file_copy_and_move(tmp_path):
+    store = FileStore(tmp_path / "store")
+    source = tmp_path / "old_upload.pdf"
+    source.write_bytes(b"legacy")
+
+    digest, path = store.save_file(source)
+    assert source.exists()
+    assert path.read_bytes() == b"legacy"
+
+    # אותו תוכן כבר במאגר - ההעברה רק מוחקת את המקור
+    assert store.save_file(source, move=True) == (digest, path)
+    assert not source.exists()
+    assert path.exists()
+
+
+def test_digest_of_only_for_store_paths(tmp_path):
+    store = FileStore(tmp_path)
+    digest, path = store.save(io.BytesIO(b"content"))
+
+    assert store.digest_of(str(path)) == digest
+    assert store.contains(str(path))
+    # קובץ בשם של hash שלא נמצא במקום שלו במאגר
+    assert store.digest_of(str(tmp_path / f"{digest}.pdf")) is None
+    assert not store.contains(str(tmp_path / "upload.pdf"))
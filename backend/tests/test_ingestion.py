@@ -0,0 +1,71 @@
+"""
+בדיקות לשמירת תלושים ומדיניות הכפילויות (app.ingestion)
+"""
+import pytest
+
+from app.database import Payslip, PayslipLineItem
+from app.ingestion import IngestionError, ingest_pdf, payslip_key, save_payslips
+
+
+def _payslip(month="01", year="2024", employee_id="123456789", net=5000.0):
+    return {
+        "employee": {"id": employee_id, "name": "ישראל ישראלי", "department": "מטבח"},
+        "period": {"month": month, "year": year},
+        "salary": {"base": 6000.0, "gross": 6500.0, "net": net, "final_payment": net},
+        "line_items": [{"code": "0100", "description": "שכר יסוד", "quantity": 1, "rate": 6000.0, "amount": 6000.0}],
+    }
+
+
+def _entry(ps, filename="test.pdf"):
+    return {"ps": ps, "filename": filename, "file_path": f"/tmp/{filename}", "original_text": ""}
+
+
+class _StubParser:
+    def __init__(self, result):
+        self.result = result
+
+    def parse_pdf(self, file_path, file_hash=None, heartbeat=None):
+        return dict(self.result)
+
+
+def test_payslip_key_normalizes_month():
+    assert payslip_key(_payslip(month="01")) == payslip_key(_payslip(month="1")) == ("123456789", 202401)
+    assert payslip_key(_payslip(month="13")) is None
+    assert payslip_key(_payslip(employee_id=None)) is None
+
+
+def test_skip_treats_zero_padded_month_as_duplicate(db):
+    [(status, first_id)] = save_payslips(db, [_entry(_payslip(month="01"))], "skip")
+    assert status == "saved"
+
+    [(status, payslip_id)] = save_payslips(db, [_entry(_payslip(month="1"))], "skip")
+    assert (status, payslip_id) == ("duplicate", None)
+    assert [row.id for row in db.query(Payslip.id)] == [first_id]
+
+
+def test_replace_swaps_payslip_and_line_items(db):
+    save_payslips(db, [_entry(_payslip(month="01", net=5000.0))], "replace")
+    [(status, new_id)] = save_payslips(db, [_entry(_payslip(month="1", net=5200.0))], "replace")
+
+    assert status == "replaced"
+    rows = db.query(Payslip.id, Payslip.net_salary).all()
+    assert [(row.id, row.net_salary) for row in rows] == [(new_id, 5200.0)]
+    assert {item.payslip_id for item in db.query(PayslipLineItem)} == {new_id}
+
+
+def test_duplicates_within_one_file_keep_the_first(db):
+    results = save_payslips(db, [_entry(_payslip(month="01"), "a.pdf"), _entry(_payslip(month="1"), "b.pdf")], "skip")
+
+    assert [status for status, _ in results] == ["saved", "duplicate"]
+    assert db.query(Payslip).count() == 1
+
+
+def test_single_payslip_duplicate_raises_409(db):
+    parser = _StubParser(_payslip(month="01"))
+    assert ingest_pdf(db, parser, "/tmp/test.pdf", "test.pdf", on_duplicate="skip")["success"]
+
+    parser = _StubParser(_payslip(month="1"))
+    with pytest.raises(IngestionError) as error:
+        ingest_pdf(db, parser, "/tmp/test.pdf", "test.pdf", on_duplicate="skip")
+    assert error.value.status_code == 409
+    assert db.query(Payslip).count() == 1
@@ -0,0 +1,167 @@
+"""
+בדיקות לתור עבודות ההעלאה (app.ingestion_worker) - תפיסה, החזרה לתור, heartbeat והתקדמות
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import ingestion, ingestion_worker
+from app.database import IngestionJob, Payslip, SessionLocal
+from app.ingestion_worker import batch_status, claim_next, enqueue, enqueue_many, process_job
+
+
+def _payslip(employee_id):
+    return {
+        "employee": {"id": employee_id, "name": "ישראל ישראלי", "department": "מטבח"},
+        "period": {"month": "3", "year": "2024"},
+        "salary": {"net": 5000.0},
+    }
+
+
+class _StubParser:
+    """
+    parse_pdf שמחזיר תוצאה קבועה, ואפשר להריץ משהו "באמצע הפענוח"
+    """
+
+    def __init__(self, result, during_parse=None):
+        self.result = result
+        self.during_parse = during_parse
+
+    def parse_pdf(self, file_path, file_hash=None, heartbeat=None):
+        if self.during_parse is not None:
+            self.during_parse(heartbeat)
+        return dict(self.result)
+
+
+def _backdate(job_id, seconds):
+    db = SessionLocal()
+    try:
+        db.query(IngestionJob).filter(IngestionJob.id == job_id).update(
+            {"updated_at": datetime.utcnow() - timedelta(seconds=seconds)}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _job(job_id):
+    db = SessionLocal()
+    try:
+        return db.get(IngestionJob, job_id)
+    finally:
+        db.close()
+
+
+def test_claim_takes_each_job_once(db):
+    first = enqueue(db, "/tmp/a.pdf", "a.pdf")
+    second = enqueue(db, "/tmp/b.pdf", "b.pdf")
+
+    claimed = [claim_next(db, "w1"), claim_next(db, "w2"), claim_next(db, "w3")]
+
+    assert [job.id if job else None for job in claimed] == [first.id, second.id, None]
+    assert (claimed[0].status, claimed[0].worker_id, claimed[0].attempts) == ("parsing", "w1", 1)
+
+
+def test_stale_job_is_requeued_then_failed(db, monkeypatch):
+    monkeypatch.setattr(ingestion_worker, "INGESTION_MAX_ATTEMPTS", 2)
+    job = enqueue(db, "/tmp/a.pdf", "a.pdf")
+    claim_next(db, "w1")
+
+    # heartbeat טרי - העבודה לא נתפסת שוב
+    assert claim_next(db, "w2") is None
+
+    _backdate(job.id, ingestion_worker.INGESTION_JOB_TIMEOUT + 60)
+    reclaimed = claim_next(db, "w2")
+    assert (reclaimed.id, reclaimed.worker_id, reclaimed.attempts) == (job.id, "w2", 2)
+
+    _backdate(job.id, ingestion_worker.INGESTION_JOB_TIMEOUT + 60)
+    assert claim_next(db, "w3") is None
+    assert (_job(job.id).status, _job(job.id).error) == ("failed", "Worker timed out")
+
+
+def test_heartbeat_during_parse_keeps_job_claimed(db, monkeypatch):
+    monkeypatch.setattr(ingestion_worker, "HEARTBEAT_INTERVAL", 0)
+    job = enqueue(db, "/tmp/a.pdf", "a.pdf")
+    claimed = claim_next(db, "w1")
+    seen = {}
+
+    def long_parse(heartbeat):
+        # הפענוח רץ יותר מ-INGESTION_JOB_TIMEOUT, אבל שולח heartbeat לאורך הדרך
+        _backdate(job.id, ingestion_worker.INGESTION_JOB_TIMEOUT + 60)
+        heartbeat()
+        other = SessionLocal()
+        try:
+            seen["claimed"] = claim_next(other, "w2")
+        finally:
+            other.close()
+
+    process_job(db, claimed, _StubParser(_payslip("123456"), long_parse))
+
+    assert seen["claimed"] is None
+    assert _job(job.id).status == "done"
+    assert _job(job.id).attempts == 1
+
+
+def test_progress_entries_only_after_commit(db, monkeypatch):
+    def failing_insert(*args, **kwargs):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(ingestion, "bulk_insert_payslips", failing_insert)
+    job = enqueue(db, "/tmp/a.pdf", "a.pdf")
+    claimed = claim_next(db, "w1")
+    result = {"multiple_payslips": True, "count": 2, "payslips": [_payslip("1111"), _payslip("2222")]}
+
+    process_job(db, claimed, _StubParser(result))
+
+    finished = _job(job.id)
+    assert finished.status == "failed"
+    assert (finished.payslips, finished.saved_payslips, finished.processed_payslips) == ([], 0, 0)
+    assert db.query(Payslip).count() == 0
+
+
+def test_process_job_records_saved_and_skipped(db):
+    result = {"multiple_payslips": True, "count": 2, "payslips": [_payslip("1111"), _payslip("1111")]}
+    job = enqueue(db, "/tmp/a.pdf", "a.pdf")
+
+    process_job(db, claim_next(db, "w1"), _StubParser(result))
+
+    finished = _job(job.id)
+    assert (finished.status, finished.saved_payslips, finished.skipped_payslips) == ("done", 1, 1)
+    assert [entry["status"] for entry in finished.payslips] == ["saved", "duplicate"]
+
+
+def test_single_payslip_duplicate_in_batch_is_skipped_not_failed(db):
+    ingestion.save_payslips(db, [{"ps": _payslip("1111"), "filename": "old.pdf", "file_path": "/tmp/old.pdf",
+                                  "original_text": ""}], "skip")
+    jobs = enqueue_many(db, [("a.pdf", "/tmp/a.pdf", None), ("b.pdf", "/tmp/b.pdf", None)], batch_id="b1")
+
+    process_job(db, claim_next(db, "w1"), _StubParser(_payslip("1111")))
+    process_job(db, claim_next(db, "w1"), _StubParser(_payslip("2222")))
+
+    duplicate = _job(jobs[0].id)
+    assert (duplicate.status, duplicate.error, duplicate.skipped_payslips) == ("done", None, 1)
+    assert duplicate.result["skip_reason"] == "duplicate"
+
+    status = batch_status("b1", [_job(job.id) for job in jobs])
+    assert (status["status"], status["failed_files"], status["skipped_files"]) == ("done", 0, 1)
+    assert status["files"][0]["skip_reason"] == "duplicate"
+    assert "נכשלו" not in status["result"]["message"]
+    assert "1 תלושים כבר היו במערכת" in status["result"]["message"]
+    assert status["result"]["count"] == 1
+
+
+def test_batch_of_only_duplicates_reports_duplicates(db):
+    ingestion.save_payslips(db, [{"ps": _payslip("1111"), "filename": "old.pdf", "file_path": "/tmp/old.pdf",
+                                  "original_text": ""}], "skip")
+    [job] = enqueue_many(db, [("a.pdf", "/tmp/a.pdf", None)], batch_id="b2")
+
+    process_job(db, claim_next(db, "w1"), _StubParser(_payslip("1111")))
+
+    status = batch_status("b2", [_job(job.id)])
+    assert status["result"]["error"] == "duplicates"
+    assert status["result"]["success"] is False
+
+
+@pytest.fixture(autouse=True)
+def _no_progress_throttle(monkeypatch):
+    monkeypatch.setattr(ingestion_worker, "PROGRESS_INTERVAL", 0)
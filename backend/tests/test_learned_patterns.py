@@ -0,0 +1,152 @@
+"""
+בדיקות לטעינת ה-patterns שנלמדו ולמטמון שלהם (app.learned_patterns)
+"""
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app.database import SessionLocal
+from app.learned_patterns import LearnedPatternCache, load_learned_patterns, pattern_version
+from app.pdf_parser import HebrewPayslipPDFParser
+
+TIP_PATTERN = r"טיפ\s+([\d.]+)"
+
+
+@pytest.fixture
+def pattern_db(db):
+    """
+    הטבלאות של FieldLearner / ParserImprover (לא חלק מ-Base) - רק העמודות שנקראות
+    """
+    db.execute(text("DROP TABLE IF EXISTS parsing_patterns"))
+    db.execute(text("DROP TABLE IF EXISTS field_definitions"))
+    db.execute(text("""
+        CREATE TABLE parsing_patterns (
+            id INTEGER PRIMARY KEY,
+            pattern_type VARCHAR(50) NOT NULL,
+            pattern_regex TEXT NOT NULL,
+            field_name VARCHAR(100),
+            confidence_score FLOAT DEFAULT 0.5,
+            active BOOLEAN DEFAULT TRUE
+        )
+    """))
+    db.execute(text("""
+        CREATE TABLE field_definitions (
+            id INTEGER PRIMARY KEY,
+            field_name VARCHAR(100) UNIQUE NOT NULL,
+            field_category VARCHAR(50),
+            extraction_patterns JSON,
+            active BOOLEAN DEFAULT FALSE
+        )
+    """))
+    db.commit()
+    return db
+
+
+def _add_pattern(db, field, regex, confidence=0.5, active=True):
+    db.execute(text("""
+        INSERT INTO parsing_patterns (pattern_type, pattern_regex, field_name, confidence_score, active)
+        VALUES ('field_extraction', :regex, :field, :confidence, :active)
+    """), {"regex": regex, "field": field, "confidence": confidence, "active": active})
+    db.commit()
+
+
+def _add_field(db, field, category, patterns, active=True):
+    db.execute(text("""
+        INSERT INTO field_definitions (field_name, field_category, extraction_patterns, active)
+        VALUES (:field, :category, :patterns, :active)
+    """), {"field": field, "category": category, "patterns": json.dumps(patterns), "active": active})
+    db.commit()
+
+
+def test_load_learned_patterns(pattern_db):
+    _add_pattern(pattern_db, "net_salary", r"נטו\s+(\d+)", confidence=0.4)
+    _add_pattern(pattern_db, "net_salary", r"נטו לתשלום\s+(\d+)", confidence=0.9)
+    _add_pattern(pattern_db, "net_salary", r"נטו (", confidence=1.0)
+    _add_pattern(pattern_db, "gross_salary", r"ברוטו\s+(\d+)", active=False)
+    _add_field(pattern_db, "tip_amount", "additions", [
+        {"regex": r"טיפים\s+([\d.]+)", "confidence": 0.3},
+        {"regex": TIP_PATTERN, "confidence": 0.8},
+    ])
+    _add_field(pattern_db, "draft_field", None, [r"טיוטה\s+(\d+)"], active=False)
+
+    learned = load_learned_patterns(pattern_db)
+
+    assert learned == {
+        # לפי confidence, בלי regex שלא מתקמפל ובלי patterns לא פעילים
+        "net_salary": {"patterns": [r"נטו לתשלום\s+(\d+)", r"נטו\s+(\d+)"], "category": None},
+        "tip_amount": {"patterns": [TIP_PATTERN, r"טיפים\s+([\d.]+)"], "category": "additions"},
+    }
+
+
+def test_cache_reloads_only_after_invalidate(pattern_db):
+    cache = LearnedPatternCache(SessionLocal, ttl=0)
+    empty_version = cache.current_version()
+    assert empty_version == pattern_version({})
+
+    _add_field(pattern_db, "tip_amount", "additions", [TIP_PATTERN])
+    assert cache.current_version() == empty_version
+
+    cache.invalidate()
+    assert cache.current_version() != empty_version
+    assert cache.new_fields({"net_salary": []}) == {"tip_amount": "additions"}
+
+
+def test_cache_keeps_patterns_when_tables_are_missing(db):
+    db.execute(text("DROP TABLE IF EXISTS parsing_patterns"))
+    db.commit()
+
+    cache = LearnedPatternCache(SessionLocal, ttl=0)
+
+    assert cache.current_version() == pattern_version({})
+    assert cache.learned == {}
+
+
+def test_merge_puts_learned_patterns_first(pattern_db):
+    _add_pattern(pattern_db, "net_salary", r"נטו\s+(\d+)")
+    _add_pattern(pattern_db, "gross_salary", r"ברוטו\s+(\d+)")
+    _add_field(pattern_db, "tip_amount", None, [TIP_PATTERN])
+    cache = LearnedPatternCache(SessionLocal, ttl=0)
+    cache.current_version()
+
+    merged = cache.merge({
+        "net_salary": [r"שכר נטו\s+(\d+)"],
+        "gross_salary": [r"סה\"כ\s+(\d+)", r"ברוטו\s+(\d+)"],
+    })
+
+    assert merged == {
+        "net_salary": [r"נטו\s+(\d+)", r"שכר נטו\s+(\d+)"],
+        # pattern שכבר קיים לא מוכפל
+        "gross_salary": [r"סה\"כ\s+(\d+)", r"ברוטו\s+(\d+)"],
+        "tip_amount": [TIP_PATTERN],
+    }
+    assert cache.new_fields({"net_salary": [], "gross_salary": []}) == {"tip_amount": "learned_fields"}
+
+
+def test_parser_picks_up_learned_field_after_invalidate(pattern_db):
+    cache = LearnedPatternCache(SessionLocal, ttl=0)
+    parser = HebrewPayslipPDFParser(workers=1, cache=None, ai_sick_days=False, learned_patterns=cache)
+    payslip_text = "מספר העובד: 123456\nלחודש 03/2024\nטיפ 250.5\n"
+
+    assert "tips" not in parser.parse_extracted_text(payslip_text)
+
+    _add_field(pattern_db, "tip_amount", "tips", [TIP_PATTERN])
+    cache.invalidate()
+    result = parser.parse_extracted_text(payslip_text)
+
+    assert result["tips"] == {"tip_amount": "250.5"}
+    assert parser.version.endswith(pattern_version(parser.active_patterns))
+
+
+def test_payment_table_takes_precedence_over_learned_patterns(pattern_db, capsys):
+    _add_pattern(pattern_db, "premium", r"פרמיה מיוחדת\s+([\d.]+)")
+    cache = LearnedPatternCache(SessionLocal, ttl=0)
+    parser = HebrewPayslipPDFParser(workers=1, cache=None, ai_sick_days=False, learned_patterns=cache)
+    header = "מספר העובד: 123456\nלחודש 03/2024\nפרמיה מיוחדת 77.0\n"
+
+    with_row = parser.parse_extracted_text(header + "תשלומים\n020 פרמיה 1.00 1234.00\nניכויים\n")
+    without_row = parser.parse_extracted_text(header)
+
+    assert "['premium']" in capsys.readouterr().out
+    assert with_row["raw_data"]["premium"] == "1234.0"
+    assert without_row["raw_data"]["premium"] == "77.0"
@@ -0,0 +1,105 @@
+"""
+בדיקות לפענוח טבלת התשלומים (app.line_items) ולשמירת השורות ב-payslip_line_items
+"""
+from app.database import PayslipLineItem
+from app.ingestion import save_payslips
+from app.line_items import hours_by_rate, line_item_fields, parse_line_items
+
+PAYMENT_TABLE = """\
+תשלומים
+063 שכר בר 42.68 38.00 1621.84
+020 פרמיה 1.00 1234.00
+089 פיצוי נוסף 120.50
+077 ש 125% דיווח 4.00 47.50 190.00
+078 ש %051שבת 6.00 57.00 342.00
+999 שורה בלי סכום
+כ"הס תשלומים 3508.34
+"""
+
+
+def test_parse_line_items():
+    items = parse_line_items(PAYMENT_TABLE)
+
+    assert [item["code"] for item in items] == ["063", "020", "089", "077", "078"]
+    assert items[0] == {"code": "063", "description": "שכר בר", "quantity": 42.68, "rate": 38.0, "amount": 1621.84}
+    assert items[1] == {"code": "020", "description": "פרמיה", "quantity": 1.0, "rate": None, "amount": 1234.0}
+    assert items[2] == {"code": "089", "description": "פיצוי נוסף", "quantity": None, "rate": None, "amount": 120.5}
+
+
+def test_rows_outside_the_payment_table_are_ignored():
+    text = (
+        "123 רחוב הרצל 1\n"
+        + PAYMENT_TABLE
+        + "ניכויים\n"
+        + "002 מס הכנסה 553.41\n"
+        + "נתונים נוספים\n"
+        + "019 ימי עבודה 19\n"
+    )
+
+    assert [item["code"] for item in parse_line_items(text)] == ["063", "020", "089", "077", "078"]
+    # בלי כותרת "תשלומים" - אין טבלה
+    assert parse_line_items("063 שכר בר 42.68 38.00 1621.84\n") == []
+
+
+def test_every_payment_table_is_read():
+    second = PAYMENT_TABLE.replace("063 שכר בר", "064 שכר בר")
+
+    codes = [item["code"] for item in parse_line_items(PAYMENT_TABLE + "ניכויים\n" + second)]
+
+    assert codes.count("063") == 1 and codes.count("064") == 1
+    assert len(codes) == 10
+
+
+def test_payment_fields_take_the_amount_column():
+    # שורה עם כמות, תעריף וסכום - השדה הוא הסכום (המספר האחרון), לא התעריף
+    text = "תשלומים\n015 יתרת תשר 2.00 300.00 600.00\n020 פרמיה 1.00 50.00 1234.00\nניכויים\n"
+
+    fields = line_item_fields(parse_line_items(text))
+
+    assert (fields["tishrey_bonus"], fields["premium"]) == ("600.0", "1234.0")
+
+
+def test_line_item_fields():
+    fields = line_item_fields(parse_line_items(PAYMENT_TABLE))
+
+    assert fields["base_wage"] == "1621.84"
+    assert fields["regular_hours"] == "42.68"
+    assert fields["premium"] == "1234.0"
+    assert fields["saturday_150"] == "342.0"
+
+
+def test_hours_by_rate():
+    hours = hours_by_rate(parse_line_items(PAYMENT_TABLE))
+
+    assert hours["hours_125"] == 4.0
+    assert hours["hours_150"] == 6.0
+    assert hours["saturday_hours_150"] == 6.0
+    assert hours["hours_100"] is None
+
+
+def _entry(month, net=5000.0):
+    ps = {
+        "employee": {"id": "123456", "name": "ישראל ישראלי"},
+        "period": {"month": month, "year": "2024"},
+        "salary": {"net": net},
+        "line_items": parse_line_items(PAYMENT_TABLE),
+    }
+    return {"ps": ps, "filename": "a.pdf", "file_path": "/tmp/a.pdf", "original_text": ""}
+
+
+def test_saved_line_items_carry_period_key(db):
+    [(_, payslip_id)] = save_payslips(db, [_entry("01")], "skip")
+
+    rows = db.query(PayslipLineItem).all()
+    assert len(rows) == 5
+    assert {(row.payslip_id, row.employee_id, row.period_key) for row in rows} == {(payslip_id, "123456", 202401)}
+
+
+def test_replaced_payslip_line_items_follow_the_new_payslip(db):
+    save_payslips(db, [_entry("01")], "replace")
+    [(status, payslip_id)] = save_payslips(db, [_entry("1", net=5100.0)], "replace")
+
+    assert status == "replaced"
+    rows = db.query(PayslipLineItem).all()
+    assert len(rows) == 5
+    assert {(row.payslip_id, row.period_key) for row in rows} == {(payslip_id, 202401)}
@@ -0,0 +1,74 @@
+"""
+בדיקות מטמון הפענוח (app.parse_cache) ושמירת תוצאות ב-parse_pdf
+"""
+import pytest
+
+from app.parse_cache import ParseCache, file_sha256
+from app.pdf_parser import HebrewPayslipPDFParser
+
+# תלוש בלי "חשבון מחלה" - ימי המחלה צריכים AI
+PAYSLIP_TEXT = "מספר העובד: 123456\nתלוש שכר לחודש 03/2024\nנטו לתשלום 5,000.00\n"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParseCache(tmp_path / "cache")
+
+
+def test_round_trip(cache):
+    cache.put_text("ab" * 32, "1", "טקסט")
+    cache.put_layout("ab" * 32, "1", {"123": {"sick_account": {"current_balance": 4.5}}})
+    cache.put_result("ab" * 32, "1", {"count": 2})
+
+    assert cache.get_text("ab" * 32, "1") == "טקסט"
+    assert cache.get_layout("ab" * 32, "1") == {"123": {"sick_account": {"current_balance": 4.5}}}
+    assert cache.get_result("ab" * 32, "1") == {"count": 2}
+    assert cache.get_result("ab" * 32, "2") is None
+    assert cache.get_text("cd" * 32, "1") is None
+
+
+def test_file_sha256_matches_content(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"%PDF-1.4 test")
+    assert file_sha256(str(path), chunk_size=4) == file_sha256(str(path))
+    assert len(file_sha256(str(path))) == 64
+
+
+class _FakeClient:
+    pass
+
+
+def _parser(cache, monkeypatch, answers):
+    parser = HebrewPayslipPDFParser(workers=1, cache=cache, ai_sick_days=True)
+    monkeypatch.setattr(parser, "extract_layers", lambda path, pdf_hash=None, heartbeat=None: (PAYSLIP_TEXT, {}))
+    monkeypatch.setattr(parser.sick_days_ai, "_ask", lambda client, snippets: answers)
+    return parser
+
+
+def test_result_not_cached_without_ai_client(cache, monkeypatch):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    parser = _parser(cache, monkeypatch, [7.5])
+
+    result = parser.parse_pdf("/tmp/missing.pdf", "ab" * 32)
+
+    assert result["employee"]["id"] == "123456"
+    assert cache.get_result("ab" * 32, parser.version) is None
+
+
+def test_result_not_cached_when_ai_request_fails(cache, monkeypatch):
+    parser = _parser(cache, monkeypatch, None)
+    monkeypatch.setattr(parser.sick_days_ai, "_get_client", lambda: _FakeClient())
+
+    parser.parse_pdf("/tmp/missing.pdf", "ab" * 32)
+
+    assert cache.get_result("ab" * 32, parser.version) is None
+
+
+def test_result_cached_when_ai_answers(cache, monkeypatch):
+    parser = _parser(cache, monkeypatch, [7.5])
+    monkeypatch.setattr(parser.sick_days_ai, "_get_client", lambda: _FakeClient())
+
+    result = parser.parse_pdf("/tmp/missing.pdf", "ab" * 32)
+
+    assert cache.get_result("ab" * 32, parser.version) == result
+    assert result["sick_days"] == 7.5
@@ -0,0 +1,100 @@
+"""
+בדיקות לדפדוף keyset ולמטמון ספירת התלושים (app.payslip_pagination)
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import tuple_
+
+from app.database import Payslip, get_async_session_factory
+from app.ingestion import save_payslips
+from app.payslip_pagination import PayslipCountCache, decode_cursor, encode_cursor
+
+
+def _entry(employee_id, month="3", department="מטבח"):
+    ps = {
+        "employee": {"id": employee_id, "name": "ישראל ישראלי", "department": department},
+        "period": {"month": month, "year": "2024"},
+        "salary": {"net": 5000.0},
+    }
+    return {"ps": ps, "filename": "a.pdf", "file_path": "/tmp/a.pdf", "original_text": ""}
+
+
+def _seed(db, count):
+    save_payslips(db, [_entry(str(1000 + i)) for i in range(count)], "skip")
+    # כמה תלושים עם אותו upload_date - ה-id מכריע
+    same_time = datetime(2024, 4, 1)
+    for payslip in db.query(Payslip).order_by(Payslip.id):
+        payslip.upload_date = same_time if payslip.id % 3 == 0 else same_time + timedelta(minutes=payslip.id)
+    db.commit()
+
+
+def _run(coroutine_factory):
+    async def main():
+        async with get_async_session_factory()() as session:
+            return await coroutine_factory(session)
+    return asyncio.run(main())
+
+
+def test_cursor_round_trip(db):
+    _seed(db, 1)
+    payslip = db.query(Payslip).first()
+
+    assert decode_cursor(encode_cursor(payslip)) == (payslip.upload_date, payslip.id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "eyJ4IjogMX0"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_keyset_pages_cover_every_payslip_once(db):
+    _seed(db, 10)
+    expected = [p.id for p in db.query(Payslip).order_by(Payslip.upload_date.desc(), Payslip.id.desc())]
+
+    # אותה שאילתה כמו ב-/api/payslips
+    seen = []
+    cursor = None
+    while True:
+        query = db.query(Payslip).order_by(Payslip.upload_date.desc(), Payslip.id.desc())
+        if cursor:
+            query = query.filter(tuple_(Payslip.upload_date, Payslip.id) < decode_cursor(cursor))
+        page = query.limit(4 + 1).all()
+        has_more = len(page) > 4
+        page = page[:4]
+        seen.extend(p.id for p in page)
+        if not has_more:
+            break
+        cursor = encode_cursor(page[-1])
+
+    assert seen == expected
+
+
+def test_count_cache_sees_inserts_and_department_changes(db):
+    _seed(db, 3)
+    cache = PayslipCountCache(ttl=3600)
+    kitchen = [Payslip.department == "מטבח"]
+
+    assert _run(lambda session: cache.total(session, "kitchen", kitchen)) == 3
+
+    # החלפת מחלקה (חילוץ-מחדש) - בלי תלוש חדש, ה-MAX(id) לא משתנה
+    payslip = db.query(Payslip).order_by(Payslip.id).first()
+    payslip.department = "הנהלה"
+    db.commit()
+    assert _run(lambda session: cache.total(session, "kitchen", kitchen)) == 2
+
+    save_payslips(db, [_entry("2000")], "skip")
+    assert _run(lambda session: cache.total(session, "kitchen", kitchen)) == 3
+
+
+def test_count_cache_reuses_count_while_unchanged(db):
+    _seed(db, 2)
+    cache = PayslipCountCache(ttl=3600)
+    assert _run(lambda session: cache.total(session, "all", [])) == 2
+
+    # ספירה שמורה - הגרסה זהה, גם אם הערך השמור "שגוי"
+    version, counted_at, _ = cache._counts["all"]
+    cache._counts["all"] = (version, counted_at, 99)
+    assert _run(lambda session: cache.total(session, "all", [])) == 99
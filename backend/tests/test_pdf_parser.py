@@ -0,0 +1,211 @@
+"""
+בדיקות HebrewPayslipPDFParser - חילוץ טקסט וטבלאות החשבון
+"""
+import re
+
+import pdfplumber
+import pytest
+from payslip_generator import generate_raw_text
+
+import app.pdf_parser as pdf_parser
+from app.pdf_parser import HebrewPayslipPDFParser, fix_rtl_text
+
+
+def _parse(pdf_path, fast, monkeypatch):
+    monkeypatch.setattr(pdf_parser, "FAST_EXTRACT", fast)
+    parser = HebrewPayslipPDFParser(cache=None, ai_sick_days=False)
+    return parser.extract_layers(pdf_path), parser.parse_pdf(pdf_path)
+
+
+def _balances(result):
+    return [
+        (ps["employee"]["id"], ps["vacation_days"], ps["sick_days"],
+         ps.get("vacation_account"), ps.get("sick_account"))
+        for ps in result["payslips"]
+    ]
+
+
+def test_fast_extract_keeps_account_tables(fixture_pdf, monkeypatch):
+    pdf_path = fixture_pdf("payslips_stacked.pdf")
+
+    (_, slow_accounts), slow_result = _parse(pdf_path, False, monkeypatch)
+
+    # שכבת טקסט נקייה של PyPDF2 (אותו טקסט לכל עמוד) שמתקבלת - pdfplumber משמש רק לטבלאות
+    with pdfplumber.open(pdf_path) as pdf:
+        clean_pages = [fix_rtl_text(page.extract_text() or "") for page in pdf.pages]
+    monkeypatch.setattr(HebrewPayslipPDFParser, "_extract_with_pypdf2", lambda self, path: clean_pages)
+    monkeypatch.setattr(pdf_parser, "score_text_layer", lambda pages: 1.0)
+    monkeypatch.setattr(
+        HebrewPayslipPDFParser, "_extract_with_pdfplumber",
+        lambda self, *args: pytest.fail("fast path escalated to full pdfplumber extraction")
+    )
+    (_, fast_accounts), fast_result = _parse(pdf_path, True, monkeypatch)
+
+    assert slow_accounts
+    assert fast_accounts == slow_accounts
+    assert _balances(fast_result) == _balances(slow_result)
+
+
+def test_account_layout_skipped_without_tables(fixture_pdf):
+    parser = HebrewPayslipPDFParser(cache=None, ai_sick_days=False)
+    assert parser._extract_account_layout(fixture_pdf("payslips_stacked.pdf"), ["", "no tables here"]) == {}
+
+
+# זוגות (שורה מה-PDF, תוצאה) שחושבו עם המימוש הקודם של fix_rtl_text (לפני הקימפול מראש
+# והעבודה לפי עמוד) - המימוש הנוכחי חייב להחזיר בדיוק את אותו טקסט
+RTL_GOLDEN = [
+    ('10/2025 שדוחל רכש שולת', 'תלוש שכר לחודש 10/2025'),
+    ('מ"עב המגדה תודעסמ - 123 : הרבח', 'חברה : 123 - מסעדות הדגמה בע"מ'),
+    ('1000 :דבועה רפסמ', 'מספר העובד: 1000'),
+    ('םינכרמב 001 :הקלחמ ןור םהרבא', 'אברהם רון מחלקה: 001 במרכנים'),
+    ('ZHAO LI :הקלחמ', 'מחלקה: LI ZHAO'),
+    ('01/02/2020 :הדובע תליחת', 'תחילת עבודה: 01/02/2020'),
+    ('3314.15 53.95 61.43 רב רכש 063', '063 שכר בר 61.43 53.95 3314.15'),
+    ('983.24 80.93 12.15 תבש150% ש 078', '078 ש %051שבת 12.15 80.93 983.24'),
+    ('6917.66 םימולשת סה"כ', 'כ"הס תשלומים 6917.66'),
+    ('242.12 ימואל.ב', 'ב.לאומי 242.12'),
+    ('1.84 .ז.ח הריבצ', 'צבירה ח.ז. 1.84'),
+    ('004 נסיעות 19.00 11.80 224.20', '004 נסיעות 19.00 11.80 224.20'),
+    ('לתשלום 5785.68', 'לתשלום 5785.68'),
+    ('תשלומים', 'תשלומים'),
+    ('הלחמ', 'הלחמ'),
+    (':םש', 'שם:'),
+    ('גוס: A', 'A :סוג'),
+    ('Total: 100', 'Total: 100'),
+    ('PAYSLIP 2025', 'PAYSLIP 2025'),
+    ('12345', '12345'),
+    ('', ''),
+    ('   ', '   '),
+    ('  הלחמ   ןובשח  ', 'חשבון מחלה'),
+    ('הלחמ\tןובשח', 'חשבון מחלה'),
+    ('ב"ת 5', '5 ת"ב'),
+]
+
+
+@pytest.mark.parametrize("line, expected", RTL_GOLDEN)
+def test_fix_rtl_text_golden(line, expected):
+    assert fix_rtl_text(line) == expected
+
+
+def test_fix_rtl_text_is_line_by_line():
+    text = '1000 :דבועה רפסמ\n\nתשלומים\n21.16 השדח הרתי\n'
+
+    assert fix_rtl_text(text) == 'מספר העובד: 1000\n\nתשלומים\nיתרה חדשה 21.16\n'
+    assert fix_rtl_text(text) == "\n".join(fix_rtl_text(line) for line in text.split("\n"))
+
+
+def _reference_split(text):
+    """
+    הפיצול הקודם: text[:pos].count('\\n') לכל "מספר העובד" (ריבועי באורך הטקסט)
+    """
+    matches = list(re.finditer(r'מספר העובד:\s*(\d{4,})', text))
+    if len(matches) <= 1:
+        return [text]
+
+    lines = text.split('\n')
+    payslips = []
+    for i, match in enumerate(matches):
+        start_line = max(0, text[:match.start()].count('\n') - 5)
+        if i + 1 < len(matches):
+            end_line = max(0, text[:matches[i + 1].start()].count('\n') - 5)
+        else:
+            end_line = len(lines)
+        payslips.append('\n'.join(lines[start_line:end_line]))
+    return payslips
+
+
+@pytest.mark.parametrize("text", [
+    fix_rtl_text(generate_raw_text(12, seed=3)),
+    # תלושים צפופים - פחות מ-5 שורות בין "מספר העובד" אחד לבא
+    "מספר העובד: 1001\nא\nמספר העובד: 1002\nמספר העובד: 1003\n",
+    "מספר העובד: 1001\nתלוש יחיד",
+    "",
+])
+def test_split_matches_reference(text):
+    parser = HebrewPayslipPDFParser(workers=1, cache=None, ai_sick_days=False)
+    assert parser._split_payslips(text) == _reference_split(text)
+
+
+def test_parallel_parsing_matches_serial():
+    text = fix_rtl_text(generate_raw_text(pdf_parser.PARALLEL_MIN_PAYSLIPS + 4, seed=5))
+    beats = []
+
+    serial = HebrewPayslipPDFParser(workers=1, cache=None, ai_sick_days=False).parse_extracted_text(text)
+    parallel = HebrewPayslipPDFParser(workers=2, cache=None, ai_sick_days=False).parse_extracted_text(
+        text, heartbeat=lambda: beats.append(1)
+    )
+
+    assert serial["count"] == pdf_parser.PARALLEL_MIN_PAYSLIPS + 4
+    assert parallel == serial
+    assert len(beats) == serial["count"]
+
+
+def test_parallel_page_extraction_matches_serial(fixture_pdf, monkeypatch):
+    monkeypatch.setattr(pdf_parser, "PARALLEL_MIN_PAGES", 1)
+    pdf_path = fixture_pdf("payslips_side_by_side.pdf")
+
+    serial = HebrewPayslipPDFParser(workers=1, cache=None, ai_sick_days=False)._extract_with_pdfplumber(pdf_path)
+    parallel = HebrewPayslipPDFParser(workers=2, cache=None, ai_sick_days=False)._extract_with_pdfplumber(pdf_path)
+
+    assert parallel == serial
+    assert len(serial[1]) == 3
+
+
+class _FakeClient:
+    pass
+
+
+def _ai_parser(monkeypatch, workers, calls):
+    """
+    parser עם AI לימי מחלה - _ask מוחלף ורושם כל בקשה.
+    התשובה לכל קטע: מספר העובד / 1000 אם הוא בקטע, אחרת אורך הקטע / 100
+    """
+    parser = HebrewPayslipPDFParser(workers=workers, cache=None, ai_sick_days=True)
+    monkeypatch.setattr(parser.sick_days_ai, "_get_client", lambda: _FakeClient())
+
+    def ask(client, snippets):
+        calls.append(len(snippets))
+        answers = []
+        for snippet in snippets:
+            employee = re.search(r"מספר העובד: (\d+)", snippet)
+            answers.append(int(employee.group(1)) / 1000 if employee else len(snippet) / 100)
+        return answers
+
+    monkeypatch.setattr(parser.sick_days_ai, "_ask", ask)
+    return parser
+
+
+def _no_sick_table_text(count):
+    # בלי "חשבון מחלה" - ימי המחלה של כל התלושים צריכים AI
+    return "".join(
+        f"פרטים אישיים\nמספר העובד: {1000 + i}\nתלוש שכר לחודש 03/2024\nנטו לתשלום 5,000.00\n\n\n\n\n"
+        for i in range(count)
+    )
+
+
+def test_parallel_parsing_uses_ai_sick_days_fallback(monkeypatch):
+    count = pdf_parser.PARALLEL_MIN_PAYSLIPS + 4
+    calls = []
+    parser = _ai_parser(monkeypatch, 2, calls)
+
+    result = parser.parse_extracted_text(_no_sick_table_text(count))
+
+    assert calls == [count]
+    assert [ps["sick_days"] for ps in result["payslips"]] == [(1000 + i) / 1000 for i in range(count)]
+    assert parser.sick_days_ai.failures == 0
+    assert {ps["raw_data"]["_sources"]["sick_days"] for ps in result["payslips"]} == {"ai"}
+
+
+@pytest.mark.parametrize("text", [
+    fix_rtl_text(generate_raw_text(pdf_parser.PARALLEL_MIN_PAYSLIPS + 4, seed=5)),
+    _no_sick_table_text(pdf_parser.PARALLEL_MIN_PAYSLIPS + 4),
+])
+def test_parallel_parsing_matches_serial_with_ai_sick_days(text, monkeypatch):
+    serial_calls, parallel_calls = [], []
+
+    serial = _ai_parser(monkeypatch, 1, serial_calls).parse_extracted_text(text)
+    parallel = _ai_parser(monkeypatch, 2, parallel_calls).parse_extracted_text(text)
+
+    assert serial["count"] == pdf_parser.PARALLEL_MIN_PAYSLIPS + 4
+    assert parallel_calls == serial_calls
+    assert parallel == serial
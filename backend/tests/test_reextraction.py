@@ -0,0 +1,128 @@
+"""
+בדיקות לחילוץ-מחדש של שדות שנלמדו על תלושים קיימים (app.reextraction)
+"""
+import pytest
+
+from app import reextraction
+from app.database import Payslip, PayslipLineItem, SessionLocal
+from app.ingestion import save_payslips
+from app.pdf_parser import HebrewPayslipPDFParser
+from app.reextraction import Reextractor
+
+ORIGINAL_TEXT = "מספר העובד: 123456\nלחודש 03/2024\nמחלה מעודכן 12.5\nחודש מתוקן 4\n"
+
+LEARNED = {
+    "sick_days": {"patterns": [r"מחלה מעודכן\s+([\d.]+)"], "category": None},
+    "month": {"patterns": [r"חודש מתוקן\s+(\d{1,2})"], "category": None},
+}
+
+
+def _payslip(employee_id="123456", month="3", sources=None):
+    raw_data = {"sick_days": "3.0", "month": month}
+    if sources is not None:
+        raw_data["_sources"] = sources
+    return {
+        "employee": {"id": employee_id, "name": "ישראל ישראלי", "department": "מטבח"},
+        "period": {"month": month, "year": "2024"},
+        "salary": {"net": 5000.0},
+        "sick_days": 3.0,
+        "line_items": [{"code": "0100", "description": "שכר יסוד", "quantity": 1, "rate": 6000.0, "amount": 6000.0}],
+        "raw_data": raw_data,
+    }
+
+
+@pytest.fixture
+def reextractor(monkeypatch):
+    monkeypatch.setattr(reextraction, "load_learned_patterns", lambda db: LEARNED)
+    return Reextractor(HebrewPayslipPDFParser(workers=1, cache=None, ai_sick_days=False))
+
+
+def _save(db, ps, original_text=ORIGINAL_TEXT):
+    [(status, payslip_id)] = save_payslips(db, [{
+        "ps": ps, "filename": "a.pdf", "file_path": "/tmp/a.pdf", "original_text": original_text
+    }], "skip")
+    assert status == "saved"
+    return payslip_id
+
+
+def test_reextraction_refreshes_denormalized_columns(db, reextractor):
+    payslip_id = _save(db, _payslip(sources={}))
+
+    status = reextractor.run()
+
+    assert (status["status"], status["processed"], status["updated"]) == ("done", 1, 1)
+    check = SessionLocal()
+    try:
+        payslip = check.get(Payslip, payslip_id)
+        assert payslip.parsed_data["sick_days"] == 12.5
+        assert payslip.parsed_data["period"] == {"month": "4", "year": "2024"}
+        assert (payslip.sick_days, payslip.month, payslip.period_key) == (12.5, "4", 202404)
+        assert [item.code for item in payslip.line_items] == ["0100"]
+        assert {item.period_key for item in payslip.line_items} == {202404}
+    finally:
+        check.close()
+
+
+def test_reextraction_skips_period_that_already_exists(db, reextractor):
+    payslip_id = _save(db, _payslip(month="3", sources={}))
+    _save(db, _payslip(month="4"), original_text="")
+
+    status = reextractor.run()
+
+    assert status["updated"] == 0
+    check = SessionLocal()
+    try:
+        payslip = check.get(Payslip, payslip_id)
+        assert (payslip.sick_days, payslip.period_key) == (3.0, 202403)
+        assert check.query(PayslipLineItem).count() == 2
+    finally:
+        check.close()
+
+
+def test_second_run_is_up_to_date(db, reextractor):
+    _save(db, _payslip())
+    reextractor.run()
+
+    assert reextractor.run() == {"status": "up_to_date"}
+
+
+def _stored(payslip_id):
+    check = SessionLocal()
+    try:
+        payslip = check.get(Payslip, payslip_id)
+        return payslip.sick_days, payslip.period_key
+    finally:
+        check.close()
+
+
+def test_reextraction_keeps_table_and_ai_values(db, reextractor):
+    table_id = _save(db, _payslip(employee_id="111111", sources={"sick_days": "table"}))
+    ai_id = _save(db, _payslip(employee_id="222222", sources={"sick_days": "ai"}))
+
+    reextractor.run()
+
+    # ימי המחלה נשארים, החודש (שנמצא ב-regex) מתעדכן
+    assert _stored(table_id) == (3.0, 202404)
+    assert _stored(ai_id) == (3.0, 202404)
+
+
+def test_reextraction_of_payslip_without_sources(db, reextractor):
+    # הערך השמור לא מתקבל מה-patterns המובנים - הגיע מטבלה / AI
+    kept_id = _save(db, _payslip(employee_id="111111"))
+    # הערך השמור הוא מה-pattern המובן - ה-pattern שנלמד מחליף אותו
+    regex_id = _save(db, _payslip(employee_id="222222"), original_text="מחלה: 3.0\n" + ORIGINAL_TEXT)
+
+    reextractor.run()
+
+    assert _stored(kept_id) == (3.0, 202404)
+    assert _stored(regex_id) == (12.5, 202404)
+
+
+def test_reextraction_ignores_builtin_patterns(db, reextractor):
+    # רק ה-pattern המובן (בעל הביטחון הנמוך) מוצא ימי מחלה - לא מחלצים איתו מחדש
+    payslip_id = _save(db, _payslip(sources={}), original_text="מספר העובד: 123456\nמחלה: 9.0\n")
+
+    status = reextractor.run()
+
+    assert status["updated"] == 0
+    assert _stored(payslip_id) == (3.0, 202403)
@@ -173,11 +173,12 @@ function switchTab(tabName) {
 function handleMultipleFiles(files) {
     if (!files || files.length === 0) return;
 
-    // Filter only PDF files
-    const pdfFiles = Array.from(files).filter(file => file.type === 'application/pdf');
+    // Filter only PDF files and ZIP archives of PDFs
+    const pdfFiles = Array.from(files).filter(file =>
+        file.type === 'application/pdf' || file.name.toLowerCase().endsWith('.zip'));
 
     if (pdfFiles.length === 0) {
-        showNotification('אנא בחר קבצי PDF בלבד', 'error');
+        showNotification('אנא בחר קבצי PDF או ZIP בלבד', 'error');
         return;
     }
 
@@ -258,7 +259,14 @@ async function uploadFile() {
             return;
         }
 
-        const data = await response.json();
+        const job = await response.json();
+        console.log('Upload queued as job:', job.job_id);
+        const data = await waitForUploadJob(job.job_id, (status) => {
+            if (status.total_payslips) {
+                document.getElementById('loading').querySelector('p').textContent =
+                    `מעבד ${status.processed_payslips}/${status.total_payslips} תלושים...`;
+            }
+        });
         console.log('Upload response:', data);
 
         if (data.success) {
@@ -290,10 +298,31 @@ async function uploadFile() {
         showNotification(`שגיאה בהעלאת הקובץ: ${error.message}`, 'error');
     } finally {
         document.getElementById('loading').style.display = 'none';
+        document.getElementById('loading').querySelector('p').textContent = 'מנתח תלוש...';
         document.getElementById('uploadBtn').disabled = false;
     }
 }
 
+// Poll an upload job until the worker finishes - returns the upload result
+async function waitForUploadJob(jobId, onProgress = null) {
+    while (true) {
+        const response = await fetch(`${API_URL}/api/upload/jobs/${jobId}`);
+        const status = await response.json();
+
+        if (!response.ok) {
+            return { success: false, message: status.detail || `שגיאה בשרת: ${response.status}` };
+        }
+        if (onProgress) {
+            onProgress(status);
+        }
+        if (status.status === 'done' || status.status === 'failed') {
+            return status.result || { success: false, message: status.error };
+        }
+
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 // Upload Multiple Files
 async function uploadMultipleFiles() {
     if (selectedFiles.length === 0) return;
@@ -306,56 +335,60 @@ async function uploadMultipleFiles() {
     progressDiv.style.display = 'block';
     uploadBtn.disabled = true;
 
-    let completed = 0;
-    let successful = 0;
-    let failed = 0;
     const total = selectedFiles.length;
 
     try {
-        // Upload files in parallel (max 3 at a time)
-        const batchSize = 3;
-        for (let i = 0; i < total; i += batchSize) {
-            const batch = selectedFiles.slice(i, i + batchSize);
+        // One bulk request for all files (PDFs and/or ZIP archives) - the server queues each PDF
+        const formData = new FormData();
+        selectedFiles.forEach(file => formData.append('files', file));
+
+        progressText.textContent = `מעלה ${total} קבצים...`;
+        const response = await fetch(`${API_URL}/api/upload/bulk`, {
+            method: 'POST',
+            body: formData
+        });
+        const batch = await response.json();
 
-            await Promise.all(batch.map(async (file) => {
-                try {
-                    const formData = new FormData();
-                    formData.append('file', file);
+        if (!response.ok) {
+            showNotification(batch.detail || `שגיאה בשרת: ${response.status}`, 'error');
+            return;
+        }
 
-                    const response = await fetch(`${API_URL}/api/upload`, {
-                        method: 'POST',
-                        body: formData
-                    });
+        batch.rejected.forEach(file => console.warn(`Skipped ${file.filename}: ${file.reason}`));
 
-                    const data = await response.json();
+        // Poll the batch until every file was parsed
+        let status;
+        while (true) {
+            const statusResponse = await fetch(`${API_URL}${batch.status_url}`);
+            status = await statusResponse.json();
+            if (!statusResponse.ok) {
+                showNotification(status.detail || `שגיאה בשרת: ${statusResponse.status}`, 'error');
+                return;
+            }
 
-                    if (response.ok && data.success) {
-                        successful++;
-                    } else {
-                        failed++;
-                        console.error(`Failed to upload ${file.name}:`, data.message);
-                    }
-                } catch (error) {
-                    failed++;
-                    console.error(`Error uploading ${file.name}:`, error);
-                }
+            const progress = (status.finished_files / status.total_files) * 100;
+            progressBar.style.width = `${progress}%`;
+            progressText.textContent = `מעבד ${status.finished_files}/${status.total_files} קבצים (${status.processed_payslips} תלושים)...`;
 
-                completed++;
-                const progress = (completed / total) * 100;
-                progressBar.style.width = `${progress}%`;
-                progressText.textContent = `מעלה ${completed}/${total} קבצים...`;
-            }));
+            if (status.status === 'done') break;
+            await new Promise(resolve => setTimeout(resolve, 1000));
         }
 
+        const data = status.result;
+        status.files.filter(file => file.status === 'failed')
+            .forEach(file => console.error(`Failed to upload ${file.filename}:`, file.error));
+
         // Show final result
-        if (successful > 0) {
-            showNotification(`הועלו בהצלחה ${successful} מתוך ${total} תלושים`, 'success');
+        if (data.success) {
+            showNotification(data.message, 'success');
+            displayMultipleResults(data);
             loadPayslips();
             loadAllPayslipsForResults();
-        }
-
-        if (failed > 0) {
-            showNotification(`${failed} תלושים נכשלו`, 'error');
+        } else if (data.error === 'duplicates') {
+            showNotification(data.message, 'warning');
+            displayDuplicatesMessage(data);
+        } else {
+            showNotification(data.message || 'שגיאה בניתוח התלושים', 'error');
         }
 
         // Clear selection
@@ -878,7 +911,7 @@ async function submitCorrection(button) {
 // Load Payslips
 async function loadPayslips() {
     try {
-        const response = await fetch(`${API_URL}/api/payslips?limit=10`);
+        const response = await fetch(`${API_URL}/api/payslips?limit=10&fields=id,employee_name,employee_id,period`);
         const data = await response.json();
 
         if (data.payslips) {
@@ -2128,7 +2161,9 @@ let allPayslipsData = [];
 
 async function loadAllPayslipsForResults() {
     try {
-        const response = await fetch(`${API_URL}/api/payslips?limit=100`);
+        // parsed_data לא חוזר כברירת מחדל - הטבלה צריכה ממנו את פירוט השעות והפרמיות
+        const fields = 'id,employee_name,employee_id,period,final_payment,vacation_days,parsed_data';
+        const response = await fetch(`${API_URL}/api/payslips?limit=100&fields=${fields}`);
         const data = await response.json();
 
         if (data.payslips) {
@@ -2274,8 +2309,16 @@ function applyMonthFilter() {
                 }
             }
 
-            return period === selectedMonth;
+            return normalizePeriod(period) === normalizePeriod(selectedMonth);
         });
         displayPayslipsResults(filtered);
     }
 }
+
+// "3/2025" ו-"03/2025" הם אותו חודש - השוואה לפי מספרים
+function normalizePeriod(period) {
+    if (!period) return null;
+    const [month, year] = String(period).split('/').map(part => parseInt(part, 10));
+    if (!month || !year) return period;
+    return `${month}/${year}`;
+}
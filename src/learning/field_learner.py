@@ -12,8 +12,10 @@ class FieldLearner:
     לומד שדות חדשים מתיקוני משתמשים ומשפר דפוסי חילוץ
     """
 
-    def __init__(self, db_session):
+    def __init__(self, db_session, pattern_cache=None):
         self.db = db_session
+        # מטמון ה-patterns של ה-parser - מסומן כלא תקף אחרי כל שמירה
+        self.pattern_cache = pattern_cache
         self.confidence_threshold = 0.7
         self.hebrew_translations = {
             "bonus": ["בונוס", "פרמיה", "מענק"],
@@ -97,6 +99,9 @@ class FieldLearner:
 
             db.commit()
 
+            if self.pattern_cache is not None:
+                self.pattern_cache.invalidate()
+
             # רשום בהיסטוריית למידה
             db.execute("""
                 INSERT INTO learning_history (learning_type, after_state, triggered_by)
@@ -61,9 +61,15 @@ class ParserImprover:
                     patterns_added += 1
 
             # עדכן את הדפוסים של ה-Parser (אם הוא נטען)
-            if hasattr(self.parser, 'patterns') and field_name in self.parser.patterns:
+            if getattr(self.parser, 'learned_patterns', None) is not None:
+                # ה-parser טוען את הדפוסים מה-DB - רק לסמן שהשתנו
+                if patterns_added:
+                    self.parser.learned_patterns.invalidate()
+            elif hasattr(self.parser, 'patterns') and field_name in self.parser.patterns:
                 if new_pattern and new_pattern['regex']:
                     self.parser.patterns[field_name].insert(0, new_pattern['regex'])
+                    if hasattr(self.parser, 'refresh_patterns'):
+                        self.parser.refresh_patterns()
 
             # רשום את הלמידה
             db.execute("""